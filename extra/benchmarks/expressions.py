@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""Measure the number of expression evaluations per second, with and without compiling expressions into synchronous
+callables.
+
+Usage: expressions.py [expression] [num_evals]
+"""
+
+import asyncio
+import sys
+import time
+
+from unittest import mock
+
+from qtoggleserver.core import expressions as core_expressions
+from qtoggleserver.core import ports as core_ports
+from qtoggleserver.core.typing import NullablePortValue
+
+
+class BenchmarkPort(core_ports.Port):
+    TYPE = core_ports.TYPE_NUMBER
+    WRITABLE = True
+
+    async def read_value(self) -> NullablePortValue:
+        return None
+
+
+async def measure(sexpression: str, num_evals: int) -> float:
+    expression = core_expressions.parse(None, sexpression, core_expressions.Role.VALUE)
+    context = core_expressions.EvalContext(port_values={"a": 3, "b": 4}, now_ms=int(time.time() * 1000))
+
+    start = time.perf_counter()
+    for _ in range(num_evals):
+        await expression.eval(context)
+
+    return num_evals / (time.perf_counter() - start)
+
+
+async def run(sexpression: str, num_evals: int) -> None:
+    ports = [BenchmarkPort("a"), BenchmarkPort("b")]
+    for port in ports:
+        core_ports._ports_by_id[port.get_id()] = port
+        await port.enable()
+
+    with mock.patch.object(core_expressions.Expression, "compile", return_value=None):
+        before = await measure(sexpression, num_evals)
+    after = await measure(sexpression, num_evals)
+
+    print(f"expression: {sexpression}")
+    print(f"async: {before:.0f} evals/s, compiled: {after:.0f} evals/s ({after / before:.1f}x)")
+
+    for port in ports:
+        await port.cleanup()
+        core_ports._ports_by_id.pop(port.get_id())
+
+
+def main() -> None:
+    sexpression = sys.argv[1] if len(sys.argv) > 1 else "ADD($a, MUL($b, 2))"
+    num_evals = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+
+    asyncio.run(run(sexpression, num_evals))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+"""Measure the CPU time consumed by a number of idle ports.
+
+Usage: idle_ports.py [num_ports] [duration_seconds]
+"""
+
+import asyncio
+import sys
+import time
+
+from qtoggleserver.core import ports as core_ports
+from qtoggleserver.core.typing import NullablePortValue
+
+
+class IdlePort(core_ports.Port):
+    TYPE = core_ports.TYPE_NUMBER
+    WRITABLE = True
+
+    async def read_value(self) -> NullablePortValue:
+        return None
+
+
+async def run(num_ports: int, duration: float) -> None:
+    ports = [IdlePort(f"idle{i}") for i in range(num_ports)]
+
+    await asyncio.sleep(0.5)  # let all write loops settle
+
+    start_cpu = time.process_time()
+    start_wall = time.monotonic()
+    await asyncio.sleep(duration)
+    cpu = time.process_time() - start_cpu
+    wall = time.monotonic() - start_wall
+
+    print(f"ports: {num_ports}, wall time: {wall:.2f}s, CPU time: {cpu:.3f}s ({cpu / wall * 100:.1f}% CPU)")
+
+    for port in ports:
+        await port.cleanup()
+
+
+def main() -> None:
+    num_ports = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    asyncio.run(run(num_ports, duration))
+
+
+if __name__ == "__main__":
+    main()
@@ -37,12 +37,23 @@ class core:
         set_cmd: str | None = None
 
     tick_interval: int = 50
+    scheduler: bool = False
     persist_interval: int = 2000
+    port_read_concurrency: int = 32
+    port_read_timeout: int = 5000
     event_queue_size: int = 1024
     max_client_time_skew: int = 300
     backup_support: bool = True
     history_support: bool = True
     history_janitor_interval: int = 3600
+    history_buffer_size: int = 100
+    history_buffer_age: int = 5000
+    history_recent_samples: int = 1024
+    history_cache_size: int = 100000
+    history_rollups: bool = False
+    history_rollup_1m_retention: int = 30 * 86400
+    history_rollup_1h_retention: int = 365 * 86400
+    history_rollup_1d_retention: int = 0
     listen_support: bool = True
     sequences_support: bool = True
     tls_support: bool = True
@@ -144,11 +155,17 @@ class slaves:
 
 class webhooks:
     enabled: bool = False
+    concurrency: int = 1
+    batch_size: int = 1
+    batch_window: int = 0
+    retry_backoff: int = 500
+    retry_backoff_max: int = 30000
 
 
 class reverse:
     enabled: bool = False
     retry_interval: int = 5
+    concurrency: int = 1
 
 
 event_handlers: list[dict[str, _Any]] = []
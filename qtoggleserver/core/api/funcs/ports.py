@@ -5,7 +5,7 @@ import time
 from collections.abc import Callable
 from typing import Any, cast
 
-from qtoggleserver import slaves
+from qtoggleserver import persist, slaves
 from qtoggleserver.conf import settings
 from qtoggleserver.core import api as core_api
 from qtoggleserver.core import events as core_events
@@ -496,6 +496,21 @@ async def get_port_history(request: core_api.APIRequest, port_id: str) -> Generi
         if limit < 1 or limit > 10000:
             raise core_api.APIError(400, "invalid-field", field="limit")
 
+    bucket_str = query.get("bucket")
+    bucket = None
+    if bucket_str is not None:
+        try:
+            bucket = int(bucket_str)
+        except ValueError:
+            raise core_api.APIError(400, "invalid-field", field="bucket") from None
+
+        if bucket < 1:
+            raise core_api.APIError(400, "invalid-field", field="bucket")
+
+    agg = query.get("agg", "avg")
+    if agg not in persist.SAMPLE_AGGREGATIONS:
+        raise core_api.APIError(400, "invalid-field", field="agg")
+
     timestamps = None
     if timestamps_str is not None:
         timestamps = timestamps_str.split(",")
@@ -510,6 +525,9 @@ async def get_port_history(request: core_api.APIRequest, port_id: str) -> Generi
     if timestamps is not None:
         samples = await core_history.get_samples_by_timestamp(port, timestamps)
         samples = list(samples)
+    elif bucket is not None:
+        samples = await core_history.get_samples_buckets(port, from_timestamp, to_timestamp, bucket, agg, limit)
+        samples = [{"timestamp": s[0], "value": s[1]} for s in samples]
     else:
         samples = await core_history.get_samples_slice(port, from_timestamp, to_timestamp, limit)
         samples = [{"timestamp": s[0], "value": s[1]} for s in samples]
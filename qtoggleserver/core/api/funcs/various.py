@@ -17,6 +17,7 @@ from qtoggleserver.core import vports as core_vports
 from qtoggleserver.core import webhooks as core_webhooks
 from qtoggleserver.core.api import schema as core_api_schema
 from qtoggleserver.core.typing import GenericJSONDict, GenericJSONList
+from qtoggleserver.utils import json as json_utils
 
 
 @core_api.api_call(core_api.ACCESS_LEVEL_NONE)
@@ -25,22 +26,12 @@ async def get_access(request: core_api.APIRequest) -> dict[str, str]:
 
 
 @core_api.api_call(core_api.ACCESS_LEVEL_VIEWONLY)
-async def get_listen(request: core_api.APIRequest) -> GenericJSONList:
+async def get_listen(request: core_api.APIRequest) -> json_utils.Encoded | GenericJSONList:
     session_id = request.headers.get("Session-Id")
     if not session_id:
         raise core_api.APIError(400, "missing-header", header="Session-Id")
 
-    timeout = request.query.get("timeout")
-    if timeout is not None:
-        try:
-            timeout = int(timeout)
-        except ValueError:
-            raise core_api.APIError(400, "invalid-field", field="timeout") from None
-
-        if timeout < 1 or timeout > 3600:
-            raise core_api.APIError(400, "invalid-field", field="timeout")
-    else:
-        timeout = 60  # default
+    timeout = _get_int_query_arg(request, "timeout", 1, 3600, 60)
 
     session = core_sessions.get(session_id)
     try:
@@ -50,7 +41,39 @@ async def get_listen(request: core_api.APIRequest) -> GenericJSONList:
         session.cancel()
         return []
 
-    return [await e.to_json() for e in events]
+    # Events are encoded once and their encoded JSON is shared by all sessions
+    return json_utils.join_encoded([await e.to_json_fragment() for e in events])
+
+
+@core_api.api_call(core_api.ACCESS_LEVEL_VIEWONLY)
+async def get_listen_ws(request: core_api.APIRequest) -> tuple[core_sessions.Session, int, int]:
+    """Validate a request for streaming events over a WebSocket connection. Return the session, the keep-alive
+    interval, in seconds, and the batching window, in milliseconds."""
+
+    session_id = request.headers.get("Session-Id")
+    if not session_id:
+        raise core_api.APIError(400, "missing-header", header="Session-Id")
+
+    timeout = _get_int_query_arg(request, "timeout", 1, 3600, 60)
+    batch = _get_int_query_arg(request, "batch", 0, 10000, 0)
+
+    return core_sessions.get(session_id), timeout, batch
+
+
+def _get_int_query_arg(request: core_api.APIRequest, name: str, min_value: int, max_value: int, default: int) -> int:
+    value = request.query.get(name)
+    if value is None:
+        return default
+
+    try:
+        value = int(value)
+    except ValueError:
+        raise core_api.APIError(400, "invalid-field", field=name) from None
+
+    if value < min_value or value > max_value:
+        raise core_api.APIError(400, "invalid-field", field=name)
+
+    return value
 
 
 @core_api.api_call(core_api.ACCESS_LEVEL_ADMIN)
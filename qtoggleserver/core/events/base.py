@@ -2,9 +2,12 @@ import abc
 import logging
 import time
 
+from collections.abc import Hashable
+
 from qtoggleserver import system
 from qtoggleserver.core import api as core_api
 from qtoggleserver.core.typing import GenericJSONDict
+from qtoggleserver.utils import json as json_utils
 from qtoggleserver.utils import logging as logging_utils
 
 
@@ -25,6 +28,7 @@ class Event(metaclass=abc.ABCMeta):
 
         self._timestamp: float = timestamp
         self._params: GenericJSONDict | None = None
+        self._json_fragment: str | None = None
 
     def __str__(self) -> str:
         return f"{self._type} event"
@@ -35,6 +39,15 @@ class Event(metaclass=abc.ABCMeta):
             "params": self.get_params(),
         }
 
+    async def to_json_fragment(self) -> str:
+        """Return the encoded JSON representation of the event. It is encoded only once and then shared by all
+        consumers of the event, such as listening sessions."""
+
+        if self._json_fragment is None:
+            self._json_fragment = json_utils.dumps(await self.to_json())
+
+        return self._json_fragment
+
     async def init_params(self) -> None:
         self._params = await self.make_params()
 
@@ -53,8 +66,15 @@ class Event(metaclass=abc.ABCMeta):
     def get_timestamp(self) -> float:
         return self._timestamp
 
+    def get_dedup_key(self) -> Hashable | None:
+        """Return a key identifying the events that this event supersedes in queues, or `None` if it doesn't supersede
+        any other events."""
+
+        return None
+
     def is_duplicate(self, event: Event) -> bool:
-        return False
+        key = self.get_dedup_key()
+        return key is not None and key == event.get_dedup_key()
 
 
 class Handler(logging_utils.LoggableMixin, metaclass=abc.ABCMeta):
@@ -1,3 +1,5 @@
+from collections.abc import Hashable
+
 from qtoggleserver.core import api as core_api
 from qtoggleserver.core.device import attrs as core_device_attrs
 from qtoggleserver.core.typing import Attributes, GenericJSONDict
@@ -17,13 +19,13 @@ class DeviceUpdate(DeviceEvent):
     async def make_params(self) -> GenericJSONDict:
         return await self.get_attrs()
 
-    def is_duplicate(self, event: Event) -> bool:
-        return isinstance(event, self.__class__)
+    def get_dedup_key(self) -> Hashable | None:
+        return self._type
 
 
 class FullUpdate(DeviceEvent):
     REQUIRED_ACCESS = core_api.ACCESS_LEVEL_VIEWONLY
     TYPE = "full-update"
 
-    def is_duplicate(self, event: Event) -> bool:
-        return isinstance(event, self.__class__)
+    def get_dedup_key(self) -> Hashable | None:
+        return self._type
@@ -1,3 +1,4 @@
+from collections.abc import Hashable
 from typing import TYPE_CHECKING
 
 from qtoggleserver.core import api as core_api
@@ -46,8 +47,8 @@ class PortUpdate(PortEvent):
     async def make_params(self) -> GenericJSONDict:
         return await self.get_port().to_json()
 
-    def is_duplicate(self, event: Event) -> bool:
-        return isinstance(event, self.__class__) and event.get_port() == self.get_port()
+    def get_dedup_key(self) -> Hashable | None:
+        return self._type, self.get_port().get_id()
 
 
 class ValueChange(PortEvent):
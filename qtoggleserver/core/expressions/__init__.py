@@ -1,3 +1,5 @@
+from collections import OrderedDict
+
 from .base import (
     DEP_ASAP,
     DEP_DAY,
@@ -6,6 +8,7 @@ from .base import (
     DEP_MONTH,
     DEP_SECOND,
     DEP_YEAR,
+    CompiledExpression,
     EvalContext,
     EvalResult,
     Expression,
@@ -23,6 +26,7 @@ __all__ = [
     "DEP_MONTH",
     "DEP_SECOND",
     "DEP_YEAR",
+    "CompiledExpression",
     "EvalContext",
     "EvalResult",
     "Expression",
@@ -32,6 +36,7 @@ __all__ = [
     "arithmetic",
     "bitwise",
     "branching",
+    "clear_parse_cache",
     "comparison",
     "date",
     "logic",
@@ -47,8 +52,33 @@ __all__ = [
 # A time jump of more than one day will prevent the evaluation of expressions such as time-processing
 TIME_JUMP_THRESHOLD = 86_400_000
 
+PARSE_CACHE_SIZE = 1024
+
+_parse_cache: OrderedDict[tuple[str | None, str, Role], Expression] = OrderedDict()
+
 
 def parse(self_port_id: str | None, sexpression: str, role: Role, pos: int = 1) -> Expression:
+    """Parse `sexpression` into a new expression. Parsed expressions are cached, so that parsing the same expression
+    again only needs to clone its stateful parts."""
+
+    key = (self_port_id, sexpression, role)
+    expression = _parse_cache.get(key)
+    if expression is None:
+        expression = _parse(self_port_id, sexpression, role, pos)
+        _parse_cache[key] = expression
+        if len(_parse_cache) > PARSE_CACHE_SIZE:
+            _parse_cache.popitem(last=False)
+    else:
+        _parse_cache.move_to_end(key)
+
+    return expression.clone()
+
+
+def clear_parse_cache() -> None:
+    _parse_cache.clear()
+
+
+def _parse(self_port_id: str | None, sexpression: str, role: Role, pos: int = 1) -> Expression:
     stripped = sexpression.lstrip()
     pos += len(sexpression) - len(stripped)
     sexpression = stripped.rstrip()
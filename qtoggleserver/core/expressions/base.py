@@ -1,5 +1,7 @@
 import abc
+import copy
 
+from collections.abc import Callable
 from enum import IntEnum
 from typing import TypeAlias
 
@@ -16,6 +18,8 @@ DEP_DAY = "day"
 DEP_MONTH = "month"
 DEP_YEAR = "year"
 
+_NOT_COMPILED = object()
+
 
 class Role(IntEnum):
     """Available expression roles."""
@@ -31,16 +35,23 @@ class Expression(metaclass=abc.ABCMeta):
         self.role: Role = role
         self._asap_eval_paused_until_ms: int = 0
         self._cached_deps: set[str] | None = None
+        self._compiled: CompiledExpression | None | object = _NOT_COMPILED
 
     def pause_asap_eval(self, pause_until_ms: int = 0) -> None:
         self._asap_eval_paused_until_ms = pause_until_ms or int(1e13)
 
     def is_asap_eval_paused(self, now_ms: int) -> bool:
-        return now_ms < self._asap_eval_paused_until_ms
+        return now_ms < self.get_asap_eval_paused_until_ms()
+
+    def get_asap_eval_paused_until_ms(self) -> int:
+        return self._asap_eval_paused_until_ms
 
     async def eval(self, context: EvalContext) -> EvalResult:
         self._asap_eval_paused_until_ms = 0
         try:
+            compiled = self.compile()
+            if compiled is not None:
+                return compiled(context)
             return await self._eval(context)
         except ExpressionEvalException:
             # Pause expression evaluation for 1 second, as it's very unlikely that the expression become available or
@@ -52,6 +63,38 @@ class Expression(metaclass=abc.ABCMeta):
     async def _eval(self, context: EvalContext) -> EvalResult:
         raise NotImplementedError()
 
+    def compile(self) -> CompiledExpression | None:
+        """
+        Return a synchronous callable that evaluates this expression, or `None` if the expression (or any of its
+        sub-expressions) can only be evaluated asynchronously. The result is computed once and cached.
+        """
+
+        compiled = self._compiled
+        if compiled is _NOT_COMPILED:
+            self._compiled = compiled = self._compile()
+        return compiled
+
+    def _compile(self) -> CompiledExpression | None:
+        return None
+
+    def clone(self) -> Expression:
+        """
+        Return a copy of this expression that can be evaluated independently of the original one. Stateless
+        sub-expressions may be shared between the copies.
+        """
+
+        clone = copy.copy(self)
+        clone._asap_eval_paused_until_ms = 0
+        clone._cached_deps = None
+        clone._compiled = _NOT_COMPILED
+        return clone
+
+    def is_stateless(self) -> bool:
+        """Tell if evaluating this expression leaves no state behind, so that it can be shared by multiple
+        expressions."""
+
+        return True
+
     def get_deps(self) -> set[str]:
         """
         Return a set with all dependencies of this expression.
@@ -94,3 +137,4 @@ class EvalContext:
 
 
 EvalResult: TypeAlias = int | float | str
+CompiledExpression: TypeAlias = Callable[[EvalContext], EvalResult]
@@ -3,7 +3,7 @@ from __future__ import annotations
 import abc
 import re
 
-from .base import EvalContext, EvalResult, Expression, Role
+from .base import CompiledExpression, EvalContext, EvalResult, Expression, Role
 from .exceptions import DeviceAttrUnavailable, MissingAttrPrefix, TransformNotSupported, UnexpectedCharacter
 
 
@@ -56,6 +56,12 @@ class DeviceAttr(DeviceExpression):
         return {f"#{self.device_name or ''}:"}
 
     async def _eval(self, context: EvalContext) -> EvalResult:
+        return self._eval_sync(context)
+
+    def _compile(self) -> CompiledExpression | None:
+        return self._eval_sync
+
+    def _eval_sync(self, context: EvalContext) -> EvalResult:
         key = f"{self.device_name}:{self.attr_name or ''}" if self.device_name else self.attr_name
         value = context.device_attrs.get(key)
         if value is None:
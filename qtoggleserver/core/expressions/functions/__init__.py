@@ -4,8 +4,8 @@ import re
 
 from collections.abc import Callable
 
-from .. import DEP_ASAP, exceptions, parse
-from ..base import EvalContext, EvalResult, Expression, Role
+from .. import DEP_ASAP, _parse, exceptions
+from ..base import CompiledExpression, EvalContext, EvalResult, Expression, Role
 from ..devices import DeviceAttr
 from ..literalvalues import LiteralValue
 from ..ports import PortAttr, PortValue
@@ -13,6 +13,9 @@ from ..ports import PortAttr, PortValue
 
 FUNCTIONS = {}
 
+_DELIMITERS_RE = re.compile(r"[(),]")
+_INVALID_NAME_CHAR_RE = re.compile(r"[^a-zA-Z0-9_]")
+
 
 def function(name: str) -> Callable:
     def decorator(func_class: type) -> type:
@@ -47,6 +50,13 @@ class Function(Expression, metaclass=abc.ABCMeta):
 
         return s
 
+    def clone(self) -> Function:
+        return self.__class__([arg if arg.is_stateless() else arg.clone() for arg in self.args], self.role)
+
+    def is_stateless(self) -> bool:
+        # Compiled functions are pure, but asap functions still keep their own eval pause
+        return self.compile() is not None and DEP_ASAP not in self.get_deps()
+
     def _get_deps(self) -> set[str]:
         deps = set(self.DEPS)
         for arg in self.args:
@@ -54,13 +64,10 @@ class Function(Expression, metaclass=abc.ABCMeta):
 
         return deps
 
-    def is_asap_eval_paused(self, now_ms: int) -> bool:
-        return now_ms < self._get_min_asap_eval_paused_until_ms()
-
-    def _get_min_asap_eval_paused_until_ms(self) -> int:
+    def get_asap_eval_paused_until_ms(self) -> int:
         result = self._asap_eval_paused_until_ms if DEP_ASAP in self.DEPS else int(1e13)
         for arg in self._function_args:
-            child = arg._get_min_asap_eval_paused_until_ms()
+            child = arg.get_asap_eval_paused_until_ms()
             if child < result:
                 result = child
         return result
@@ -68,6 +75,33 @@ class Function(Expression, metaclass=abc.ABCMeta):
     async def eval_args(self, context: EvalContext) -> list[EvalResult]:
         return list(await asyncio.gather(*(a.eval(context) for a in self.args)))
 
+    def _compile(self) -> CompiledExpression | None:
+        compiled_args = []
+        for arg in self.args:
+            compiled_arg = arg.compile()
+            if compiled_arg is None:
+                return None
+            compiled_args.append(compiled_arg)
+
+        compiled = self._compile_with_args(compiled_args)
+        if compiled is None or DEP_ASAP not in self.DEPS:
+            return compiled
+
+        # Compiled sub-expressions bypass `eval()`, so the asap pause bookkeeping must be done here, for functions
+        # whose pause state is actually looked at.
+        def compiled_asap(context: EvalContext) -> EvalResult:
+            self._asap_eval_paused_until_ms = 0
+            try:
+                return compiled(context)
+            except exceptions.ExpressionEvalException:
+                self.pause_asap_eval(context.now_ms + 1000)
+                raise
+
+        return compiled_asap
+
+    def _compile_with_args(self, args: list[CompiledExpression]) -> CompiledExpression | None:
+        return None
+
     @classmethod
     def validate_arg_kinds(cls, args: list[Expression], pos_list: list[int]) -> None:
         for i, arg in enumerate(args):
@@ -81,83 +115,167 @@ class Function(Expression, metaclass=abc.ABCMeta):
 
     @staticmethod
     def parse(self_port_id: str | None, sexpression: str, role: Role, pos: int) -> Expression:
-        # Remove leading whitespace
-        while sexpression and sexpression[0].isspace():
-            sexpression = sexpression[1:]
-            pos += 1
-
-        # Remove trailing whitespace
-        while sexpression and sexpression[-1].isspace():
-            sexpression = sexpression[:-1]
-
-        p_start = None
-        p_end = None
-        p_last_comma = None
-        level = 0
-        sargs = []
-        for i, c in enumerate(sexpression):
-            if c == "(":
-                if p_start is None:
-                    p_start = i
-                elif level == 0:
-                    raise exceptions.UnexpectedCharacter(c, pos + i)
-
-                level += 1
-            elif c == ")":
-                if level == 0:
-                    raise exceptions.UnbalancedParentheses(pos + i)
-                elif level == 1:
-                    if p_end is None:
-                        p_end = i
-                    else:
-                        raise exceptions.UnbalancedParentheses(pos + i)
-
-                level -= 1
-            elif (c == ",") and (level == 1):
-                sarg = sexpression[(p_last_comma or p_start) + 1 : i]
-                spos = (p_last_comma or p_start) + 1
-                if not sarg.strip():
-                    raise exceptions.UnexpectedCharacter(c, pos + spos + len(sarg))
-
-                sargs.append((sarg, spos))
-                p_last_comma = i
-            elif (p_start is not None) and (level == 0) and not c.isspace():
-                raise exceptions.UnexpectedCharacter(c, pos + i)
-
-        if (p_start is None) or (p_end is None) or (p_start > p_end) or (level != 0):
-            raise exceptions.UnexpectedEnd()
-
-        if p_end - p_start > 1:
-            sarg = sexpression[(p_last_comma or p_start) + 1 : p_end]
-            spos = (p_last_comma or p_start) + 1
-            if not sarg.strip():
-                raise exceptions.UnexpectedCharacter(")", pos + spos + len(sarg))
-
-            sargs.append((sarg, spos))
-
-        func_name = sexpression[:p_start].strip()
-        m = re.search(r"[^a-zA-Z0-9_]", func_name)
-        if m:
-            p = m.start()
-            raise exceptions.UnexpectedCharacter(func_name[p], p + pos)
-
-        func_class = FUNCTIONS.get(func_name)
-        if func_class is None:
-            raise exceptions.UnknownFunction(func_name, pos)
-
-        if not func_class.ENABLED or callable(func_class.ENABLED) and not func_class.ENABLED():
-            raise exceptions.UnknownFunction(func_name, pos)
-
-        if role in (Role.TRANSFORM_READ, Role.TRANSFORM_WRITE) and not func_class.TRANSFORM_OK:
-            raise exceptions.UnknownFunction(func_name, pos)
-
-        if func_class.MIN_ARGS is not None and len(sargs) < func_class.MIN_ARGS:
-            raise exceptions.InvalidNumberOfArguments(func_name, pos)
-
-        if func_class.MAX_ARGS is not None and len(sargs) > func_class.MAX_ARGS:
-            raise exceptions.InvalidNumberOfArguments(func_name, pos)
-
-        args = [parse(self_port_id, sarg, role, pos + spos) for (sarg, spos) in sargs]
-        func_class.validate_arg_kinds(args, [pos + spos + 1 for (_, spos) in sargs])
-
-        return func_class(args, role)
+        return _build(self_port_id, sexpression, role, pos, _scan(sexpression, pos))
+
+
+class SyncFunction(Function, metaclass=abc.ABCMeta):
+    """A function that doesn't need to await anything besides its arguments, and can therefore be compiled into a
+    synchronous callable, as long as its arguments can."""
+
+    async def _eval(self, context: EvalContext) -> EvalResult:
+        return self._eval_values(context, await self.eval_args(context))
+
+    def _compile_with_args(self, args: list[CompiledExpression]) -> CompiledExpression | None:
+        eval_values = self._eval_values
+        return lambda context: eval_values(context, [arg(context) for arg in args])
+
+    @abc.abstractmethod
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
+        raise NotImplementedError()
+
+
+class _Call:
+    """A function call found while scanning an expression string."""
+
+    def __init__(self, start: int, depth: int, paren: int = -1) -> None:
+        self.start: int = start  # where the function name starts, including leading whitespace
+        self.depth: int = depth  # parentheses nesting depth right outside of the call
+        self.paren: int = paren  # index of the opening parenthesis
+        self.close: int = -1  # index of the closing parenthesis
+        self.arg_start: int = paren + 1
+        self.arg_call: _Call | None = None  # call found in the current argument
+        self.args: list[tuple[int, int, _Call | None]] = []
+        self.error: exceptions.ExpressionParseError | None = None  # first error found while scanning the call
+        self.last_arg_error: exceptions.ExpressionParseError | None = None
+
+
+def _scan(sexpression: str, pos: int) -> _Call:
+    """Find all function calls in `sexpression`, in a single pass over its delimiters, with `pos` being the position
+    of its first character.
+
+    Errors are not raised right away but recorded on the call they belong to, so that they are reported in the same
+    order as if each call was scanned separately, from the outermost one inwards."""
+
+    top = _Call(0, 0)
+    stack = [top]
+    depth = 0
+    prev_end = 0
+
+    for m in _DELIMITERS_RE.finditer(sexpression):
+        p = m.start()
+        c = m.group()
+        call = stack[-1]
+        _scan_text(call, sexpression, pos, prev_end, p, depth)
+        prev_end = p + 1
+
+        # A comma or closing parenthesis right outside a call belongs to its parent
+        if depth == call.depth and c != "(" and call is not top:
+            stack.pop()
+            call = stack[-1]
+
+        level = depth - call.depth
+        depth += 1 if c == "(" else -1 if c == ")" else 0
+
+        if call.error is not None:
+            pass
+        elif c == "(":
+            if call.paren < 0:
+                call.paren = p
+                call.arg_start = p + 1
+            elif level == 0:
+                call.error = exceptions.UnexpectedCharacter(c, pos + p)
+            else:
+                call.arg_call = _Call(call.arg_start, depth - 1, p)
+                stack.append(call.arg_call)
+        elif c == ")":
+            if level == 0:
+                call.error = exceptions.UnbalancedParentheses(pos + p)
+            else:
+                call.close = p
+                if p > call.paren + 1:
+                    call.last_arg_error = _end_arg(call, sexpression, pos, p, c)
+        elif level == 1:
+            call.error = _end_arg(call, sexpression, pos, p, c)
+        elif call.close >= 0:
+            call.error = exceptions.UnexpectedCharacter(c, pos + p)
+
+        if top.error is not None:
+            raise top.error
+
+    _scan_text(stack[-1], sexpression, pos, prev_end, len(sexpression), depth)
+    if top.error is not None:
+        raise top.error
+
+    return top
+
+
+def _scan_text(call: _Call, sexpression: str, pos: int, start: int, end: int, depth: int) -> None:
+    # Only whitespace is allowed after a call's closing parenthesis
+    if call.error is not None or call.close < 0 or depth != call.depth:
+        return
+
+    for i in range(start, end):
+        if not sexpression[i].isspace():
+            call.error = exceptions.UnexpectedCharacter(sexpression[i], pos + i)
+            return
+
+
+def _end_arg(call: _Call, sexpression: str, pos: int, p: int, c: str) -> exceptions.ExpressionParseError | None:
+    error = None
+    if call.arg_call is None and not sexpression[call.arg_start : p].strip():
+        error = exceptions.UnexpectedCharacter(c, pos + p)
+
+    call.args.append((call.arg_start, p, call.arg_call))
+    call.arg_start = p + 1
+    call.arg_call = None
+
+    return error
+
+
+def _build(self_port_id: str | None, sexpression: str, role: Role, pos: int, call: _Call) -> Expression:
+    if call.error is not None:
+        raise call.error
+
+    if call.close < 0:
+        raise exceptions.UnexpectedEnd()
+
+    if call.last_arg_error is not None:
+        raise call.last_arg_error
+
+    name = sexpression[call.start : call.paren]
+    stripped = name.lstrip()
+    pos_name = pos + call.start + len(name) - len(stripped)
+    func_name = stripped.rstrip()
+
+    m = _INVALID_NAME_CHAR_RE.search(func_name)
+    if m:
+        p = m.start()
+        raise exceptions.UnexpectedCharacter(func_name[p], pos_name + p)
+
+    func_class = FUNCTIONS.get(func_name)
+    if func_class is None:
+        raise exceptions.UnknownFunction(func_name, pos_name)
+
+    if not func_class.ENABLED or callable(func_class.ENABLED) and not func_class.ENABLED():
+        raise exceptions.UnknownFunction(func_name, pos_name)
+
+    if role in (Role.TRANSFORM_READ, Role.TRANSFORM_WRITE) and not func_class.TRANSFORM_OK:
+        raise exceptions.UnknownFunction(func_name, pos_name)
+
+    if func_class.MIN_ARGS is not None and len(call.args) < func_class.MIN_ARGS:
+        raise exceptions.InvalidNumberOfArguments(func_name, pos_name)
+
+    if func_class.MAX_ARGS is not None and len(call.args) > func_class.MAX_ARGS:
+        raise exceptions.InvalidNumberOfArguments(func_name, pos_name)
+
+    args = []
+    for start, end, arg_call in call.args:
+        # Port and device expressions never contain function calls, even if they contain parentheses
+        if arg_call is None or sexpression[start:end].lstrip()[0] in "$@#":
+            args.append(_parse(self_port_id, sexpression[start:end], role, pos + start))
+        else:
+            args.append(_build(self_port_id, sexpression, role, pos, arg_call))
+
+    func_class.validate_arg_kinds(args, [pos + start + 1 for start, _, _ in call.args])
+
+    return func_class(args, role)
@@ -1,16 +1,14 @@
 from ..base import EvalContext, EvalResult
-from . import Function, function
+from . import SyncFunction, function
 
 
 @function("MIN")
-class MinFunction(Function):
+class MinFunction(SyncFunction):
     MIN_ARGS = 2
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
-        eval_args = await self.eval_args(context)
-
-        m = eval_args[0]
-        for e in eval_args[1:]:
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
+        m = values[0]
+        for e in values[1:]:
             if e < m:
                 m = e
 
@@ -18,14 +16,12 @@ class MinFunction(Function):
 
 
 @function("MAX")
-class MaxFunction(Function):
+class MaxFunction(SyncFunction):
     MIN_ARGS = 2
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
-        eval_args = await self.eval_args(context)
-
-        m = eval_args[0]
-        for e in eval_args[1:]:
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
+        m = values[0]
+        for e in values[1:]:
             if e > m:
                 m = e
 
@@ -33,10 +29,8 @@ class MaxFunction(Function):
 
 
 @function("AVG")
-class AvgFunction(Function):
+class AvgFunction(SyncFunction):
     MIN_ARGS = 2
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
-        eval_args = await self.eval_args(context)
-
-        return sum(eval_args) / len(eval_args)
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
+        return sum(values) / len(values)
@@ -1,68 +1,61 @@
 from ..base import EvalContext, EvalResult
 from ..exceptions import ExpressionArithmeticError
-from . import Function, function
+from . import SyncFunction, function
 
 
 @function("ADD")
-class AddFunction(Function):
+class AddFunction(SyncFunction):
     MIN_ARGS = 2
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
-        return sum(await self.eval_args(context))
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
+        return sum(values)
 
 
 @function("SUB")
-class SubFunction(Function):
+class SubFunction(SyncFunction):
     MIN_ARGS = MAX_ARGS = 2
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
-        eval_args = await self.eval_args(context)
-        return eval_args[0] - eval_args[1]
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
+        return values[0] - values[1]
 
 
 @function("MUL")
-class MulFunction(Function):
+class MulFunction(SyncFunction):
     MIN_ARGS = 2
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
         r = 1
-        for e in await self.eval_args(context):
+        for e in values:
             r *= e
 
         return r
 
 
 @function("DIV")
-class DivFunction(Function):
+class DivFunction(SyncFunction):
     MIN_ARGS = MAX_ARGS = 2
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
-        eval_args = await self.eval_args(context)
-
-        if eval_args[1]:
-            return eval_args[0] / eval_args[1]
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
+        if values[1]:
+            return values[0] / values[1]
         else:
             raise ExpressionArithmeticError
 
 
 @function("MOD")
-class ModFunction(Function):
+class ModFunction(SyncFunction):
     MIN_ARGS = MAX_ARGS = 2
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
-        eval_args = await self.eval_args(context)
-
-        if eval_args[1]:
-            return eval_args[0] % eval_args[1]
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
+        if values[1]:
+            return values[0] % values[1]
         else:
             raise ExpressionArithmeticError
 
 
 @function("POW")
-class PowFunction(Function):
+class PowFunction(SyncFunction):
     MIN_ARGS = MAX_ARGS = 2
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
-        eval_args = await self.eval_args(context)
-
-        return eval_args[0] ** eval_args[1]
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
+        return values[0] ** values[1]
@@ -1,64 +1,58 @@
 from ..base import EvalContext, EvalResult
-from . import Function, function
+from . import SyncFunction, function
 
 
 @function("BITAND")
-class BitAndFunction(Function):
+class BitAndFunction(SyncFunction):
     MIN_ARGS = MAX_ARGS = 2
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
         r = -1
-        for e in await self.eval_args(context):
+        for e in values:
             r &= int(e)
 
         return r
 
 
 @function("BITOR")
-class BitOrFunction(Function):
+class BitOrFunction(SyncFunction):
     MIN_ARGS = MAX_ARGS = 2
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
         r = 0
-        for e in await self.eval_args(context):
+        for e in values:
             r |= int(e)
 
         return r
 
 
 @function("BITNOT")
-class BitNotFunction(Function):
+class BitNotFunction(SyncFunction):
     MIN_ARGS = MAX_ARGS = 1
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
-        return ~int((await self.eval_args(context))[0])
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
+        return ~int(values[0])
 
 
 @function("BITXOR")
-class BitXOrFunction(Function):
+class BitXOrFunction(SyncFunction):
     MIN_ARGS = MAX_ARGS = 2
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
-        eval_args = await self.eval_args(context)
-
-        return int(eval_args[0]) ^ int(eval_args[1])
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
+        return int(values[0]) ^ int(values[1])
 
 
 @function("SHL")
-class SHLFunction(Function):
+class SHLFunction(SyncFunction):
     MIN_ARGS = MAX_ARGS = 2
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
-        eval_args = await self.eval_args(context)
-
-        return int(eval_args[0]) << int(eval_args[1])
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
+        return int(values[0]) << int(values[1])
 
 
 @function("SHR")
-class SHRFunction(Function):
+class SHRFunction(SyncFunction):
     MIN_ARGS = MAX_ARGS = 2
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
-        eval_args = await self.eval_args(context)
-
-        return int(eval_args[0]) >> int(eval_args[1])
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
+        return int(values[0]) >> int(values[1])
@@ -1,5 +1,5 @@
-from ..base import EvalContext, EvalResult
-from . import Function, function
+from ..base import CompiledExpression, EvalContext, EvalResult
+from . import Function, SyncFunction, function
 
 
 @function("IF")
@@ -13,16 +13,19 @@ class IfFunction(Function):
         else:
             return await self.args[2].eval(context)
 
+    def _compile_with_args(self, args: list[CompiledExpression]) -> CompiledExpression | None:
+        condition, if_true, if_false = args
+        return lambda context: if_true(context) if condition(context) else if_false(context)
+
 
 @function("LUT")
-class LUTFunction(Function):
+class LUTFunction(SyncFunction):
     MIN_ARGS = 5
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
-        args = await self.eval_args(context)
-        length = (len(args) - 1) // 2
-        x = args[0]
-        points = [(args[2 * i + 1], args[2 * i + 2]) for i in range(length)]
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
+        length = (len(values) - 1) // 2
+        x = values[0]
+        points = [(values[2 * i + 1], values[2 * i + 2]) for i in range(length)]
         points.sort(key=lambda p: p[0])
 
         if x < points[0][0]:
@@ -44,14 +47,13 @@ class LUTFunction(Function):
 
 
 @function("LUTLI")
-class LUTLIFunction(Function):
+class LUTLIFunction(SyncFunction):
     MIN_ARGS = 5
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
-        args = await self.eval_args(context)
-        length = (len(args) - 1) // 2
-        x = args[0]
-        points = [(args[2 * i + 1], args[2 * i + 2]) for i in range(length)]
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
+        length = (len(values) - 1) // 2
+        x = values[0]
+        points = [(values[2 * i + 1], values[2 * i + 2]) for i in range(length)]
         points.sort(key=lambda p: p[0])
 
         if x < points[0][0]:
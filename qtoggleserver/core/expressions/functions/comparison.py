@@ -1,52 +1,42 @@
 from ..base import EvalContext, EvalResult
-from . import Function, function
+from . import SyncFunction, function
 
 
 @function("EQ")
-class EqFunction(Function):
+class EqFunction(SyncFunction):
     MIN_ARGS = MAX_ARGS = 2
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
-        eval_args = await self.eval_args(context)
-
-        return int(eval_args[0] == eval_args[1])
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
+        return int(values[0] == values[1])
 
 
 @function("GT")
-class GTFunction(Function):
+class GTFunction(SyncFunction):
     MIN_ARGS = MAX_ARGS = 2
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
-        eval_args = await self.eval_args(context)
-
-        return int(eval_args[0] > eval_args[1])
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
+        return int(values[0] > values[1])
 
 
 @function("GTE")
-class GTEFunction(Function):
+class GTEFunction(SyncFunction):
     MIN_ARGS = MAX_ARGS = 2
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
-        eval_args = await self.eval_args(context)
-
-        return int(eval_args[0] >= eval_args[1])
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
+        return int(values[0] >= values[1])
 
 
 @function("LT")
-class LTFunction(Function):
+class LTFunction(SyncFunction):
     MIN_ARGS = MAX_ARGS = 2
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
-        eval_args = await self.eval_args(context)
-
-        return int(eval_args[0] < eval_args[1])
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
+        return int(values[0] < values[1])
 
 
 @function("LTE")
-class LTEFunction(Function):
+class LTEFunction(SyncFunction):
     MIN_ARGS = MAX_ARGS = 2
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
-        eval_args = await self.eval_args(context)
-
-        return int(eval_args[0] <= eval_args[1])
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
+        return int(values[0] <= values[1])
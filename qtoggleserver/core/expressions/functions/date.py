@@ -5,22 +5,51 @@ from datetime import datetime, time, timedelta, timezone
 
 from qtoggleserver import system
 
-from ..base import DEP_ASAP, DEP_DAY, DEP_HOUR, DEP_MINUTE, DEP_MONTH, DEP_SECOND, DEP_YEAR, EvalContext, EvalResult
+from ..base import (
+    DEP_ASAP,
+    DEP_DAY,
+    DEP_HOUR,
+    DEP_MINUTE,
+    DEP_MONTH,
+    DEP_SECOND,
+    DEP_YEAR,
+    CompiledExpression,
+    EvalContext,
+    EvalResult,
+)
 from ..exceptions import InvalidArgumentValue, RealDateTimeUnavailable
-from . import Function, function
+from . import SyncFunction, function
 
 
-class DateUnitFunction(Function, metaclass=abc.ABCMeta):
-    MIN_ARGS = 0
-    MAX_ARGS = 1
-    TRANSFORM_OK = False
+class RealDateTimeFunction(SyncFunction, metaclass=abc.ABCMeta):
+    """A function that needs real date/time, which is checked before evaluating any of its arguments."""
 
     async def _eval(self, context: EvalContext) -> EvalResult:
         if not system.date.has_real_date_time():
             raise RealDateTimeUnavailable()
 
-        if len(self.args) > 0:
-            timestamp = int(await self.args[0].eval(context))
+        return await super()._eval(context)
+
+    def _compile_with_args(self, args: list[CompiledExpression]) -> CompiledExpression | None:
+        compiled = super()._compile_with_args(args)
+
+        def compiled_real_date_time(context: EvalContext) -> EvalResult:
+            if not system.date.has_real_date_time():
+                raise RealDateTimeUnavailable()
+
+            return compiled(context)
+
+        return compiled_real_date_time
+
+
+class DateUnitFunction(RealDateTimeFunction, metaclass=abc.ABCMeta):
+    MIN_ARGS = 0
+    MAX_ARGS = 1
+    TRANSFORM_OK = False
+
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
+        if len(values) > 0:
+            timestamp = int(values[0])
         else:
             timestamp = context.timestamp
 
@@ -96,15 +125,12 @@ class SecondFunction(DateUnitFunction):
 
 
 @function("MILLISECOND")
-class MillisecondFunction(Function):
+class MillisecondFunction(RealDateTimeFunction):
     MIN_ARGS = MAX_ARGS = 0
     DEPS = {DEP_ASAP}
     TRANSFORM_OK = False
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
-        if not system.date.has_real_date_time():
-            raise RealDateTimeUnavailable()
-
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
         return int(context.now_ms % 1000)
 
 
@@ -125,40 +151,37 @@ class SecondOfDayFunction(DateUnitFunction):
 
 
 @function("DATE")
-class DateFunction(Function):
+class DateFunction(SyncFunction):
     MIN_ARGS = MAX_ARGS = 6
     UNIT_INDEX = {u: i + 1 for i, u in enumerate(("year", "month", "day", "hour", "minute", "second"))}
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
-        eval_args = [int(await self.args[i].eval(context)) for i in range(self.MIN_ARGS)]
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
+        values = [int(v) for v in values]
 
         try:
-            return int(datetime(*eval_args).timestamp())
+            return int(datetime(*values).timestamp())
         except ValueError as e:
             unit = str(e).split()[0]
             index = self.UNIT_INDEX.get(unit)
             if index is None:
                 raise
 
-            raise InvalidArgumentValue(index, eval_args[index])
+            raise InvalidArgumentValue(index, values[index])
 
 
 @function("BOY")
-class BOYFunction(Function):
+class BOYFunction(RealDateTimeFunction):
     MIN_ARGS = 0
     MAX_ARGS = 1
     DEPS = {DEP_YEAR}
     TRANSFORM_OK = False
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
-        if not system.date.has_real_date_time():
-            raise RealDateTimeUnavailable()
-
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
         now = datetime.fromtimestamp(context.timestamp)
 
         n = 0
-        if len(self.args) > 0:
-            n = int(await self.args[0].eval(context))
+        if len(values) > 0:
+            n = int(values[0])
 
         dt = datetime(now.year + n, 1, 1, 0, 0, 0)
         dt = dt.astimezone(tz=timezone.utc)
@@ -167,20 +190,17 @@ class BOYFunction(Function):
 
 
 @function("BOM")
-class BOMFunction(Function):
+class BOMFunction(RealDateTimeFunction):
     MIN_ARGS = 0
     MAX_ARGS = 1
     DEPS = {DEP_MONTH}
     TRANSFORM_OK = False
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
-        if not system.date.has_real_date_time():
-            raise RealDateTimeUnavailable()
-
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
         now = datetime.fromtimestamp(context.timestamp)
         n = 0
-        if len(self.args) > 0:
-            n = int(await self.args[0].eval(context))
+        if len(values) > 0:
+            n = int(values[0])
 
         year, month = now.year, now.month
         if n >= 0:
@@ -205,22 +225,19 @@ class BOMFunction(Function):
 
 
 @function("BOW")
-class BOWFunction(Function):
+class BOWFunction(RealDateTimeFunction):
     MIN_ARGS = 0
     MAX_ARGS = 2
     DEPS = {DEP_DAY}
     TRANSFORM_OK = False
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
-        if not system.date.has_real_date_time():
-            raise RealDateTimeUnavailable()
-
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
         n = 0
         s = 0
-        if len(self.args) > 0:
-            n = int(await self.args[0].eval(context))
-            if len(self.args) > 1:
-                s = int(await self.args[1].eval(context))
+        if len(values) > 0:
+            n = int(values[0])
+            if len(values) > 1:
+                s = int(values[1])
 
         now = datetime.fromtimestamp(context.timestamp)
         dt = now.replace(hour=12)  # using midday practically avoids problems due to DST
@@ -263,20 +280,17 @@ class BOWFunction(Function):
 
 
 @function("BOD")
-class BODFunction(Function):
+class BODFunction(RealDateTimeFunction):
     MIN_ARGS = 0
     MAX_ARGS = 1
     DEPS = {DEP_DAY}
     TRANSFORM_OK = False
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
-        if not system.date.has_real_date_time():
-            raise RealDateTimeUnavailable()
-
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
         now = datetime.fromtimestamp(context.timestamp)
         n = 0
-        if len(self.args) > 0:
-            n = int(await self.args[0].eval(context))
+        if len(values) > 0:
+            n = int(values[0])
         dt = now + timedelta(days=n)
         dt = dt.replace(hour=0, minute=0, second=0, microsecond=0)
         dt = dt.astimezone(tz=timezone.utc)
@@ -285,18 +299,15 @@ class BODFunction(Function):
 
 
 @function("HMSINTERVAL")
-class HMSIntervalFunction(Function):
+class HMSIntervalFunction(RealDateTimeFunction):
     MIN_ARGS = MAX_ARGS = 6
     DEPS = {DEP_SECOND}
     TRANSFORM_OK = False
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
-        if not system.date.has_real_date_time():
-            raise RealDateTimeUnavailable()
-
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
         now = datetime.fromtimestamp(context.timestamp).replace(microsecond=0)
 
-        start_h, start_m, start_s, stop_h, stop_m, stop_s = await self.eval_args(context)
+        start_h, start_m, start_s, stop_h, stop_m, stop_s = values
 
         if not (0 <= start_h <= 23):
             raise InvalidArgumentValue(1, start_h)
@@ -326,17 +337,14 @@ class HMSIntervalFunction(Function):
 
 
 @function("MDINTERVAL")
-class MDIntervalFunction(Function):
+class MDIntervalFunction(RealDateTimeFunction):
     MIN_ARGS = MAX_ARGS = 4
     DEPS = {DEP_DAY}
     TRANSFORM_OK = False
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
-        if not system.date.has_real_date_time():
-            raise RealDateTimeUnavailable()
-
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
         now = datetime.fromtimestamp(context.timestamp).replace(microsecond=0)
-        start_m, start_d, stop_m, stop_d = await self.eval_args(context)
+        start_m, start_d, stop_m, stop_d = values
 
         if not (1 <= start_m <= 12):
             raise InvalidArgumentValue(1, start_m)
@@ -1,5 +1,5 @@
-from ..base import EvalContext, EvalResult
-from . import Function, function
+from ..base import CompiledExpression, EvalContext, EvalResult
+from . import Function, SyncFunction, function
 
 
 @function("AND")
@@ -13,6 +13,16 @@ class AndFunction(Function):
 
         return 1
 
+    def _compile_with_args(self, args: list[CompiledExpression]) -> CompiledExpression | None:
+        def compiled(context: EvalContext) -> EvalResult:
+            for arg in args:
+                if not arg(context):
+                    return 0
+
+            return 1
+
+        return compiled
+
 
 @function("OR")
 class OrFunction(Function):
@@ -25,23 +35,31 @@ class OrFunction(Function):
 
         return 0
 
+    def _compile_with_args(self, args: list[CompiledExpression]) -> CompiledExpression | None:
+        def compiled(context: EvalContext) -> EvalResult:
+            for arg in args:
+                if arg(context):
+                    return 1
+
+            return 0
+
+        return compiled
+
 
 @function("NOT")
-class NotFunction(Function):
+class NotFunction(SyncFunction):
     MIN_ARGS = MAX_ARGS = 1
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
-        return int(not bool((await self.eval_args(context))[0]))
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
+        return int(not bool(values[0]))
 
 
 @function("XOR")
-class XOrFunction(Function):
+class XOrFunction(SyncFunction):
     MIN_ARGS = MAX_ARGS = 2
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
-        eval_args = await self.eval_args(context)
-
-        e1 = bool(eval_args[0])
-        e2 = bool(eval_args[1])
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
+        e1 = bool(values[0])
+        e2 = bool(values[1])
 
         return int(e1 and not e2 or e2 and not e1)
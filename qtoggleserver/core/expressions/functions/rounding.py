@@ -1,40 +1,34 @@
 import math
 
 from ..base import EvalContext, EvalResult
-from . import Function, function
+from . import SyncFunction, function
 
 
 @function("FLOOR")
-class FloorFunction(Function):
+class FloorFunction(SyncFunction):
     MIN_ARGS = MAX_ARGS = 1
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
-        eval_args = await self.eval_args(context)
-
-        return int(math.floor(eval_args[0]))
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
+        return int(math.floor(values[0]))
 
 
 @function("CEIL")
-class CeilFunction(Function):
+class CeilFunction(SyncFunction):
     MIN_ARGS = MAX_ARGS = 1
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
-        eval_args = await self.eval_args(context)
-
-        return int(math.ceil(eval_args[0]))
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
+        return int(math.ceil(values[0]))
 
 
 @function("ROUND")
-class RoundFunction(Function):
+class RoundFunction(SyncFunction):
     MIN_ARGS = 1
     MAX_ARGS = 2
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
-        eval_args = await self.eval_args(context)
-
-        v = eval_args[0]
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
+        v = values[0]
         d = 0
-        if len(eval_args) == 2:
-            d = eval_args[1]
+        if len(values) == 2:
+            d = values[1]
 
         return round(v, int(d))
@@ -1,21 +1,21 @@
 from ..base import EvalContext, EvalResult
-from . import Function, function
+from . import SyncFunction, function
 
 
 @function("ABS")
-class AbsFunction(Function):
+class AbsFunction(SyncFunction):
     MIN_ARGS = MAX_ARGS = 1
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
-        return abs((await self.eval_args(context))[0])
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
+        return abs(values[0])
 
 
 @function("SGN")
-class SgnFunction(Function):
+class SgnFunction(SyncFunction):
     MIN_ARGS = MAX_ARGS = 1
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
-        e = int((await self.eval_args(context))[0])
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
+        e = int(values[0])
         if e > 0:
             return 1
         elif e < 0:
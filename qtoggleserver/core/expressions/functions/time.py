@@ -1,22 +1,22 @@
 from ..base import DEP_ASAP, DEP_SECOND, EvalContext, EvalResult
-from . import Function, function
+from . import SyncFunction, function
 
 
 @function("TIME")
-class TimeFunction(Function):
+class TimeFunction(SyncFunction):
     MIN_ARGS = MAX_ARGS = 0
     DEPS = {DEP_SECOND}
     TRANSFORM_OK = False
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
         return context.timestamp
 
 
 @function("TIMEMS")
-class TimeMSFunction(Function):
+class TimeMSFunction(SyncFunction):
     MIN_ARGS = MAX_ARGS = 0
     DEPS = {DEP_ASAP}
     TRANSFORM_OK = False
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
+    def _eval_values(self, context: EvalContext, values: list[EvalResult]) -> EvalResult:
         return context.now_ms
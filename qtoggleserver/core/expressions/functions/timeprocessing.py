@@ -1,3 +1,7 @@
+import abc
+import bisect
+import math
+
 from collections import deque
 
 from .. import TIME_JUMP_THRESHOLD
@@ -243,9 +247,116 @@ class IntegFunction(Function):
         return result
 
 
-@function("FMAVG")
-class FMAvgFunction(Function):
-    MIN_ARGS = MAX_ARGS = 3
+class _Window:
+    """A sliding window of samples that keeps its statistics up-to-date as samples are added and evicted: running
+    sums for the mean and standard deviation, a sorted list for percentiles and monotonic queues for the minimum and
+    the maximum.
+
+    Keeping the sorted list costs an O(log w) search plus an O(w) memory move per added or evicted sample. Windows hold
+    at most `WindowFunction.MAX_QUEUE_SIZE` samples, so that move is at most a few kilobytes, which is cheaper than the
+    bookkeeping of an O(log w) structure written in Python (e.g. heaps with lazy deletion, which would also only serve
+    the median and not arbitrary percentiles)."""
+
+    def __init__(self) -> None:
+        self._samples: deque[tuple[int, float]] = deque()
+        self._sorted: list[float] = []
+        self._min_queue: deque[tuple[int, float]] = deque()  # (index, value), values increasing
+        self._max_queue: deque[tuple[int, float]] = deque()  # (index, value), values decreasing
+        self._first_index: int = 0
+        self._next_index: int = 0
+
+        # Sums are kept relative to a shift value, for precision, and recomputed once they've been updated by as many
+        # evictions as there are samples, so that rounding errors don't accumulate
+        self._shift: float = 0
+        self._sum: float = 0
+        self._sum_squares: float = 0
+        self._evictions: int = 0
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def push(self, time_ms: int, value: float) -> None:
+        if not self._samples:
+            self._shift = value
+
+        self._samples.append((time_ms, value))
+        bisect.insort(self._sorted, value)
+
+        shifted = value - self._shift
+        self._sum += shifted
+        self._sum_squares += shifted * shifted
+
+        while self._min_queue and self._min_queue[-1][1] >= value:
+            self._min_queue.pop()
+        self._min_queue.append((self._next_index, value))
+
+        while self._max_queue and self._max_queue[-1][1] <= value:
+            self._max_queue.pop()
+        self._max_queue.append((self._next_index, value))
+
+        self._next_index += 1
+
+    def evict(self, width: int, duration_ms: int, now_ms: int) -> None:
+        """Evict the oldest samples, keeping at most `width` samples and, if `duration_ms` is given, only those taken
+        within the last `duration_ms` milliseconds."""
+
+        while len(self._samples) > width:
+            self._pop()
+
+        if duration_ms > 0:
+            while self._samples and self._samples[0][0] <= now_ms - duration_ms:
+                self._pop()
+
+    def _pop(self) -> None:
+        _, value = self._samples.popleft()
+        del self._sorted[bisect.bisect_left(self._sorted, value)]
+
+        if self._min_queue[0][0] == self._first_index:
+            self._min_queue.popleft()
+        if self._max_queue[0][0] == self._first_index:
+            self._max_queue.popleft()
+        self._first_index += 1
+
+        shifted = value - self._shift
+        self._sum -= shifted
+        self._sum_squares -= shifted * shifted
+
+        self._evictions += 1
+        if self._evictions >= len(self._samples):
+            self._resync()
+
+    def _resync(self) -> None:
+        self._shift = self._samples[0][1] if self._samples else 0
+        self._sum = math.fsum(v - self._shift for _, v in self._samples)
+        self._sum_squares = math.fsum((v - self._shift) ** 2 for _, v in self._samples)
+        self._evictions = 0
+
+    def mean(self) -> float:
+        return self._shift + self._sum / len(self._samples)
+
+    def stdev(self) -> float:
+        mean = self._sum / len(self._samples)
+        return math.sqrt(max(0, self._sum_squares / len(self._samples) - mean * mean))
+
+    def min(self) -> float:
+        return self._min_queue[0][1]
+
+    def max(self) -> float:
+        return self._max_queue[0][1]
+
+    def percentile(self, percentile: float) -> float:
+        index = int(max(0, min(percentile, 100)) / 100 * len(self._sorted))
+        return self._sorted[min(index, len(self._sorted) - 1)]
+
+
+class WindowFunction(Function, metaclass=abc.ABCMeta):
+    """Base class for functions computing a statistic over a sliding window of samples. Arguments are the value,
+    `NUM_PARAMS` function-specific parameters, the window width (number of samples), the sampling interval and,
+    optionally, the window duration (in milliseconds)."""
+
+    MIN_ARGS = 3
+    MAX_ARGS = 4
+    NUM_PARAMS = 0
     DEPS = {DEP_ASAP}
     MAX_QUEUE_SIZE = 1024
     TRANSFORM_OK = False
@@ -253,12 +364,15 @@ class FMAvgFunction(Function):
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
 
-        self._queue: deque[float] = deque()
+        self._window: _Window = _Window()
         self._last_time_ms: int = 0
         self._last_result: float = 0
 
     async def _eval(self, context: EvalContext) -> EvalResult:
-        value, width, sampling_interval = await self.eval_args(context)
+        args = await self.eval_args(context)
+        value = args[0]
+        params = args[1 : self.NUM_PARAMS + 1]
+        width, sampling_interval, *duration = args[self.NUM_PARAMS + 1 :]
         width = max(1, min(int(width), self.MAX_QUEUE_SIZE))
 
         if self._last_time_ms > 0:
@@ -266,51 +380,55 @@ class FMAvgFunction(Function):
                 self.pause_asap_eval(self._last_time_ms + sampling_interval)
                 return self._last_result
 
-        # Make room for the new element
-        while len(self._queue) >= width:
-            self._queue.popleft()
-
-        self._queue.append(value)
+        self._window.push(context.now_ms, value)
+        self._window.evict(width, int(duration[0]) if duration else 0, context.now_ms)
         self._last_time_ms = context.now_ms
 
-        self._last_result = sum(self._queue) / len(self._queue)
+        self._last_result = self._eval_window(self._window, *params)
         self.pause_asap_eval(self._last_time_ms + sampling_interval)
 
         return self._last_result
 
+    @abc.abstractmethod
+    def _eval_window(self, window: _Window, *params: float) -> float:
+        raise NotImplementedError()
+
+
+@function("FMAVG")
+class FMAvgFunction(WindowFunction):
+    def _eval_window(self, window: _Window) -> float:
+        return window.mean()
+
 
 @function("FMEDIAN")
-class FMedianFunction(Function):
-    MIN_ARGS = MAX_ARGS = 3
-    DEPS = {DEP_ASAP}
-    MAX_QUEUE_SIZE = 1024
-    TRANSFORM_OK = False
+class FMedianFunction(WindowFunction):
+    def _eval_window(self, window: _Window) -> float:
+        return window.percentile(50)
 
-    def __init__(self, *args, **kwargs) -> None:
-        super().__init__(*args, **kwargs)
 
-        self._queue: deque[float] = deque()
-        self._last_time_ms: int = 0
-        self._last_result: float = 0
+@function("FMIN")
+class FMinFunction(WindowFunction):
+    def _eval_window(self, window: _Window) -> float:
+        return window.min()
 
-    async def _eval(self, context: EvalContext) -> EvalResult:
-        value, width, sampling_interval = await self.eval_args(context)
-        width = max(1, min(int(width), self.MAX_QUEUE_SIZE))
 
-        if self._last_time_ms > 0:
-            if context.now_ms - self._last_time_ms < sampling_interval:
-                self.pause_asap_eval(self._last_time_ms + sampling_interval)
-                return self._last_result
+@function("FMAX")
+class FMaxFunction(WindowFunction):
+    def _eval_window(self, window: _Window) -> float:
+        return window.max()
 
-        # Make room for the new element
-        while len(self._queue) >= width:
-            self._queue.popleft()
 
-        self._queue.append(value)
-        self._last_time_ms = context.now_ms
-        self.pause_asap_eval(self._last_time_ms + sampling_interval)
+@function("FSTDEV")
+class FStDevFunction(WindowFunction):
+    def _eval_window(self, window: _Window) -> float:
+        return window.stdev()
 
-        queue = sorted(self._queue)
-        self._last_result = queue[len(queue) // 2]
 
-        return self._last_result
+@function("FPERCENTILE")
+class FPercentileFunction(WindowFunction):
+    MIN_ARGS = 4
+    MAX_ARGS = 5
+    NUM_PARAMS = 1
+
+    def _eval_window(self, window: _Window, percentile: float) -> float:
+        return window.percentile(percentile)
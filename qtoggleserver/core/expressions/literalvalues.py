@@ -2,7 +2,7 @@ import re
 
 from qtoggleserver.core.typing import NullablePortValue
 
-from .base import EvalContext, EvalResult, Expression, Role
+from .base import CompiledExpression, EvalContext, EvalResult, Expression, Role
 from .exceptions import EmptyExpression, UnexpectedCharacter, ValueUnavailable
 
 
@@ -19,6 +19,12 @@ class LiteralValue(Expression):
         return self.sexpression
 
     async def _eval(self, context: EvalContext) -> EvalResult:
+        return self._eval_sync(context)
+
+    def _compile(self) -> CompiledExpression | None:
+        return self._eval_sync
+
+    def _eval_sync(self, context: EvalContext) -> EvalResult:
         if self._coerced_value is None:
             raise ValueUnavailable
         return self._coerced_value
@@ -4,7 +4,7 @@ import re
 from qtoggleserver.core import ports as core_ports
 from qtoggleserver.core.typing import NullablePortValue
 
-from .base import EvalContext, EvalResult, Expression, Role
+from .base import CompiledExpression, EvalContext, EvalResult, Expression, Role
 from .exceptions import (
     DisabledPort,
     PortAttrUnavailable,
@@ -105,6 +105,12 @@ class PortValue(PortExpression):
         return context.port_values.get(self.port_id)
 
     async def _eval(self, context: EvalContext) -> EvalResult:
+        return self._eval_sync(context)
+
+    def _compile(self) -> CompiledExpression | None:
+        return self._eval_sync
+
+    def _eval_sync(self, context: EvalContext) -> EvalResult:
         port = self.get_port()
         if not port:
             raise UnknownPortId(self.port_id)
@@ -129,6 +135,12 @@ class PortRef(PortExpression):
         return f"{self.prefix}{self.port_id}"
 
     async def _eval(self, context: EvalContext) -> EvalResult:
+        return self._eval_sync(context)
+
+    def _compile(self) -> CompiledExpression | None:
+        return self._eval_sync
+
+    def _eval_sync(self, context: EvalContext) -> EvalResult:
         port = self.get_port()
         if not port:
             raise UnknownPortId(self.port_id)
@@ -149,6 +161,12 @@ class PortAttr(PortExpression):
         return {f"${self.port_id}:"}
 
     async def _eval(self, context: EvalContext) -> EvalResult:
+        return self._eval_sync(context)
+
+    def _compile(self) -> CompiledExpression | None:
+        return self._eval_sync
+
+    def _eval_sync(self, context: EvalContext) -> EvalResult:
         port = self.get_port()
         if not port:
             raise UnknownPortId(self.port_id)
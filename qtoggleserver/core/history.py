@@ -1,7 +1,11 @@
 import asyncio
+import bisect
 import logging
+import math
 import time
 
+from array import array
+from collections import OrderedDict
 from collections.abc import Iterable
 
 from qtoggleserver import persist, system
@@ -14,6 +18,12 @@ from qtoggleserver.utils import json as json_utils
 
 _PERSIST_COLLECTION = "value_history"
 _CACHE_TIMESTAMP_MIN_AGE = 3600 * 1000  # don't cache samples newer than this number of milliseconds ago
+_JANITOR_MAX_PORTS = 64  # maximum number of ports whose old samples are removed at once
+_JANITOR_CHUNK_SIZE = 1000  # maximum number of old samples of each port that are removed at once
+
+# Rollups, as (name, duration in milliseconds), from finest to coarsest
+_ROLLUPS = [("1m", 60 * 1000), ("1h", 3600 * 1000), ("1d", 86400 * 1000)]
+_ROLLUP_AGGS = ("min", "max", "avg", "count")
 
 logger = logging.getLogger(__name__)
 
@@ -21,11 +31,101 @@ _history_event_handler: HistoryEventHandler | None = None
 _sampling_task: asyncio.Task | None = None
 _janitor_task: asyncio.Task | None = None
 
-# Samples cached by port_id and timestamp
-_samples_cache: dict[str, dict[int, PortValue]] = {}
 
 # Used to schedule sample removal with remove_samples(..., background=True)
-_pending_remove_samples: list[tuple[core_ports.BasePort, int | None, int | None]] = []
+_pending_remove_samples: list[tuple[core_ports.BasePort, int | None, int | None, bool]] = []
+
+# Write-behind buffer of samples, as (port_id, timestamp, value), along with the time of the oldest buffered sample
+_pending_samples: list[tuple[str, int, float]] = []
+_pending_samples_time: float = 0
+
+# Most recent samples, by port_id
+_recent_samples: dict[str, RecentSamples] = {}
+
+# Rollup buckets currently being filled, by (port_id, rollup name)
+_rollup_buckets: dict[tuple[str, str], RollupBucket] = {}
+
+# Timestamps from which persisted rollups are complete, by (port_id, rollup name); None if there aren't any
+_rollup_starts: dict[tuple[str, str], int | None] = {}
+
+# Write-behind buffer of rollup samples, by collection
+_pending_rollup_samples: dict[str, list[tuple[str, int, float]]] = {}
+
+
+class RecentSamples:
+    """The most recent samples of a port, kept in memory so that queries for recent history don't need to reach the
+    persisted history. Samples are stored in compact arrays, sorted by timestamp, which are trimmed down to `depth`
+    samples whenever they grow to twice that size."""
+
+    def __init__(self, depth: int) -> None:
+        self._depth: int = depth
+        self._timestamps: array = array("q")
+        self._values: array = array("d")
+
+        # All samples with timestamps starting from here are known to be in memory
+        self._covered_from: int | None = None
+
+    def __len__(self) -> int:
+        return len(self._timestamps)
+
+    def add(self, timestamp: int, value: float) -> None:
+        if self._covered_from is None:
+            self._covered_from = timestamp
+        elif self._timestamps and timestamp < self._timestamps[-1]:
+            # Time went backwards; newer samples we no longer hold may still be persisted
+            self._covered_from = self._timestamps[-1] + 1
+            del self._timestamps[:]
+            del self._values[:]
+
+        self._timestamps.append(int(timestamp))
+        self._values.append(value)
+
+        if len(self._timestamps) >= 2 * self._depth:
+            del self._timestamps[: -self._depth]
+            del self._values[: -self._depth]
+            self._covered_from = max(self._covered_from, self._timestamps[0])
+
+    def covers(self, timestamp: int | None) -> bool:
+        """Tell if all samples starting from `timestamp` are held in memory."""
+
+        return timestamp is not None and self._covered_from is not None and timestamp >= self._covered_from
+
+    def get_slice(
+        self, from_timestamp: int, to_timestamp: int | None, limit: int | None, sort_desc: bool
+    ) -> list[tuple[int, float]]:
+        start = bisect.bisect_left(self._timestamps, from_timestamp)
+        if to_timestamp is not None:
+            stop = bisect.bisect_left(self._timestamps, to_timestamp)
+        else:
+            stop = len(self._timestamps)
+
+        if sort_desc:
+            indexes = range(stop - 1, start - 1, -1)
+        else:
+            indexes = range(start, stop)
+        if limit is not None:
+            indexes = indexes[:limit]
+
+        return [(self._timestamps[i], self._values[i]) for i in indexes]
+
+    def get_at(self, timestamp: int) -> float | None:
+        """Return the value of the newest sample not newer than `timestamp`, or `None` if it's not held in memory."""
+
+        index = bisect.bisect_right(self._timestamps, timestamp) - 1
+        if index < 0 or not self.covers(self._timestamps[index]):
+            return None
+
+        return self._values[index]
+
+    def remove(self, from_timestamp: int | None, to_timestamp: int | None) -> None:
+        start = bisect.bisect_left(self._timestamps, from_timestamp) if from_timestamp is not None else 0
+        if to_timestamp is not None:
+            stop = bisect.bisect_left(self._timestamps, to_timestamp)
+        else:
+            stop = len(self._timestamps)
+
+        del self._timestamps[start:stop]
+        del self._values[start:stop]
 
 
 class HistoryEventHandler(core_events.Handler):
@@ -49,11 +149,148 @@ class HistoryEventHandler(core_events.Handler):
         port.set_history_last_timestamp(now_ms)
 
 
+class SamplesCache:
+    """A cache of samples looked up by timestamp, holding at most `core.history_cache_size` samples. Samples of each
+    port are stored in compact arrays sorted by timestamp, with missing samples stored as NaN. Ports are evicted in
+    least-recently-used order."""
+
+    def __init__(self) -> None:
+        self._samples_by_port_id: OrderedDict[str, tuple[array, array]] = OrderedDict()
+        self._size: int = 0
+        self._hits: int = 0
+        self._misses: int = 0
+        self._evictions: int = 0
+
+    def lookup(self, port_id: str, timestamps: list[int]) -> tuple[dict[int, float | None], list[int]]:
+        """Return the cached samples at `timestamps` along with the timestamps that aren't cached."""
+
+        results = {}
+        missed_timestamps = []
+        samples = self._samples_by_port_id.get(port_id)
+        if samples is None:
+            missed_timestamps = list(timestamps)
+        else:
+            self._samples_by_port_id.move_to_end(port_id)
+            cached_timestamps, values = samples
+            for timestamp in timestamps:
+                index = bisect.bisect_left(cached_timestamps, timestamp)
+                if index < len(cached_timestamps) and cached_timestamps[index] == timestamp:
+                    value = values[index]
+                    results[timestamp] = None if math.isnan(value) else value
+                else:
+                    missed_timestamps.append(timestamp)
+
+        self._hits += len(results)
+        self._misses += len(missed_timestamps)
+
+        return results, missed_timestamps
+
+    def add(self, port_id: str, samples: list[tuple[int, float | None]]) -> None:
+        if not samples:
+            return
+
+        cached_timestamps, values = self._samples_by_port_id.setdefault(port_id, (array("q"), array("d")))
+        self._samples_by_port_id.move_to_end(port_id)
+        for timestamp, value in samples:
+            index = bisect.bisect_left(cached_timestamps, timestamp)
+            if index < len(cached_timestamps) and cached_timestamps[index] == timestamp:
+                continue
+
+            cached_timestamps.insert(index, timestamp)
+            values.insert(index, math.nan if value is None else value)
+            self._size += 1
+
+        # Evict least recently used ports, but never the one that was just added
+        while self._size > settings.core.history_cache_size and len(self._samples_by_port_id) > 1:
+            _, (evicted_timestamps, _) = self._samples_by_port_id.popitem(last=False)
+            self._size -= len(evicted_timestamps)
+            self._evictions += len(evicted_timestamps)
+
+    def has_port(self, port_id: str) -> bool:
+        return port_id in self._samples_by_port_id
+
+    def remove(self, port_id: str, from_timestamp: int | None, next_timestamp: int | None) -> None:
+        """Invalidate cached samples of `port_id` once samples have been removed from history starting at
+        `from_timestamp`. `next_timestamp` is the timestamp of the oldest sample left at or after `from_timestamp`, if
+        any.
+
+        Samples looked up at or after `next_timestamp` are still valid. Samples looked up in between may have been
+        removed and are dropped; if `from_timestamp` is `None`, they are known to be missing instead."""
+
+        samples = self._samples_by_port_id.get(port_id)
+        if samples is None:
+            return
+
+        cached_timestamps, values = samples
+        stop = len(cached_timestamps)
+        if next_timestamp is not None:
+            stop = bisect.bisect_left(cached_timestamps, next_timestamp)
+
+        if from_timestamp is None:
+            for i in range(stop):
+                values[i] = math.nan
+
+            return
+
+        start = bisect.bisect_left(cached_timestamps, from_timestamp)
+        self._size -= max(0, stop - start)
+        del cached_timestamps[start:stop]
+        del values[start:stop]
+        if not cached_timestamps:
+            self._samples_by_port_id.pop(port_id)
+
+    def clear(self) -> None:
+        self._samples_by_port_id.clear()
+        self._size = 0
+
+    def get_stats(self) -> dict[str, int]:
+        return {
+            "size": self._size,
+            "hits": self._hits,
+            "misses": self._misses,
+            "evictions": self._evictions,
+        }
+
+
+# Older samples looked up by timestamp
+_samples_cache = SamplesCache()
+
+
+class RollupBucket:
+    """Statistics of the samples of a port within one bucket of a rollup."""
+
+    def __init__(self, timestamp: int) -> None:
+        self.timestamp: int = timestamp
+        self.min: float = math.inf
+        self.max: float = -math.inf
+        self.sum: float = 0
+        self.count: int = 0
+
+    def add(self, value: float) -> None:
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.sum += value
+        self.count += 1
+
+    def merge(self, min_: float, max_: float, avg: float, count: int) -> None:
+        self.min = min(self.min, min_)
+        self.max = max(self.max, max_)
+        self.sum += avg * count
+        self.count += count
+
+    def get_values(self) -> dict[str, float]:
+        return {"min": self.min, "max": self.max, "avg": self.sum / self.count, "count": self.count}
+
+
 async def sampling_task() -> None:
     while True:
         try:
             await asyncio.sleep(1)
 
+            # Flush buffered samples that are too old, regardless of whether we can currently record history or not
+            if _pending_samples and time.time() - _pending_samples_time >= settings.core.history_buffer_age / 1000.0:
+                await flush_samples()
+
             if not system.date.has_real_date_time():
                 continue  # don't record history unless we've got real date/time
 
@@ -81,8 +318,6 @@ async def sampling_task() -> None:
 
 
 async def janitor_task() -> None:
-    global _pending_remove_samples
-
     while True:
         try:
             await asyncio.sleep(settings.core.history_janitor_interval)
@@ -90,37 +325,12 @@ async def janitor_task() -> None:
             if not system.date.has_real_date_time():
                 continue
 
-            now = int(time.time())
-            for port in list(core_ports.get_all()):
-                history_retention = await port.get_history_retention()
-                if history_retention <= 0:
-                    continue
+            await remove_old_samples()
+            await remove_pending_samples()
+            if settings.core.history_rollups:
+                await remove_old_rollups()
 
-                to_timestamp = (now - history_retention) * 1000
-                logger.debug("removing old samples of %s from history", port)
-                await remove_samples([port], from_timestamp=0, to_timestamp=to_timestamp)
-
-            # Remove samples that were background-scheduled for removal
-            # Group together requests w/o timestamp bounds
-
-            ports = []
-            rem_pending_remove_samples = []
-            for port, from_timestamp, to_timestamp in _pending_remove_samples:
-                if from_timestamp is to_timestamp is None:
-                    ports.append(port)
-                else:
-                    rem_pending_remove_samples.append((port, from_timestamp, to_timestamp))
-
-            if ports:
-                port_ids = [p.get_id() for p in ports]
-                logger.debug("removing samples of %s from history (background)", ", ".join(port_ids))
-                await remove_samples(ports)
-
-            _pending_remove_samples = rem_pending_remove_samples
-            while _pending_remove_samples:
-                port, from_timestamp, to_timestamp = _pending_remove_samples.pop(0)
-                logger.debug("removing samples of %s from history (background)", port)
-                await remove_samples([port], from_timestamp=from_timestamp, to_timestamp=to_timestamp)
+            logger.debug("samples cache: %s", json_utils.dumps(get_samples_cache_stats()))
         except asyncio.CancelledError:
             logger.debug("janitor task cancelled")
             break
@@ -128,6 +338,126 @@ async def janitor_task() -> None:
             logger.error("janitor task error: %s", e, exc_info=True)
 
 
+async def remove_old_samples() -> int:
+    """Remove the samples that are older than the history retention of their ports. Ports with the same retention are
+    handled together, using one removal for up to `_JANITOR_MAX_PORTS` ports at a time. Samples are removed in chunks
+    of at most `_JANITOR_CHUNK_SIZE` samples of each port, yielding to other tasks in between.
+
+    Return the number of removed samples."""
+
+    start_time = time.time()
+    now_ms = int(start_time * 1000)
+
+    # Buffered samples must reach the persisted history, so that oldest samples are looked up correctly
+    await flush_samples()
+
+    ports_by_retention: dict[int, list[core_ports.BasePort]] = {}
+    for port in list(core_ports.get_all()):
+        history_retention = await port.get_history_retention()
+        if history_retention > 0:
+            ports_by_retention.setdefault(history_retention, []).append(port)
+
+    count = 0
+    for history_retention, ports in ports_by_retention.items():
+        to_timestamp = now_ms - history_retention * 1000
+        for i in range(0, len(ports), _JANITOR_MAX_PORTS):
+            count += await _remove_old_samples_chunked(ports[i : i + _JANITOR_MAX_PORTS], to_timestamp)
+
+    logger.debug("removed %d old samples from history in %.3f seconds", count, time.time() - start_time)
+
+    return count
+
+
+async def _remove_old_samples_chunked(ports: list[core_ports.BasePort], to_timestamp: int) -> int:
+    port_ids = [p.get_id() for p in ports]
+
+    count = 0
+    while True:
+        # End the chunk right after the oldest samples of each port, skipping any gaps in history
+        chunk_to_timestamp = to_timestamp
+        found = False
+        for port_id in port_ids:
+            samples = list(
+                await persist.get_samples_slice(
+                    _PERSIST_COLLECTION, port_id, None, chunk_to_timestamp, _JANITOR_CHUNK_SIZE, False
+                )
+            )
+            if len(samples) >= _JANITOR_CHUNK_SIZE:
+                chunk_to_timestamp = samples[-1][0] + 1
+            found = found or bool(samples)
+
+        if not found:
+            break
+
+        count += await persist.remove_samples(_PERSIST_COLLECTION, port_ids, None, chunk_to_timestamp)
+        if chunk_to_timestamp >= to_timestamp:
+            break
+
+        await asyncio.sleep(0)
+
+    if count:
+        for port_id in port_ids:
+            if recent_samples := _recent_samples.get(port_id):
+                recent_samples.remove(None, to_timestamp)
+
+        await _invalidate_samples_cache(port_ids, None)
+
+    return count
+
+
+async def remove_old_rollups() -> int:
+    """Remove the rollup samples that are older than the retention of their rollup.
+
+    Return the number of removed rollup samples."""
+
+    now_ms = int(time.time() * 1000)
+    await flush_samples()
+
+    count = 0
+    for rollup_name, _ in _ROLLUPS:
+        retention = getattr(settings.core, f"history_rollup_{rollup_name}_retention")
+        if retention <= 0:
+            continue
+
+        to_timestamp = now_ms - retention * 1000
+        for agg in _ROLLUP_AGGS:
+            count += await persist.remove_samples(_get_rollup_collection(rollup_name, agg), None, None, to_timestamp)
+
+        # Rollups now start later than they used to
+        for key in [k for k in _rollup_starts if k[1] == rollup_name]:
+            _rollup_starts.pop(key)
+
+    logger.debug("removed %d old rollup samples from history", count)
+
+    return count
+
+
+async def remove_pending_samples() -> int:
+    """Remove the samples that were scheduled for removal with `remove_samples(..., background=True)`, using one
+    removal for all ports sharing the same interval.
+
+    Return the number of removed samples."""
+
+    global _pending_remove_samples
+
+    pending_remove_samples = _pending_remove_samples
+    _pending_remove_samples = []
+
+    ports_by_interval: dict[tuple[int | None, int | None, bool], list[core_ports.BasePort]] = {}
+    for port, from_timestamp, to_timestamp, with_rollups in pending_remove_samples:
+        ports_by_interval.setdefault((from_timestamp, to_timestamp, with_rollups), []).append(port)
+
+    count = 0
+    for (from_timestamp, to_timestamp, with_rollups), ports in ports_by_interval.items():
+        port_ids = [p.get_id() for p in ports]
+        logger.debug("removing samples of %s from history (background)", ", ".join(port_ids))
+        count += await remove_samples(
+            ports, from_timestamp=from_timestamp, to_timestamp=to_timestamp, with_rollups=with_rollups
+        )
+
+    return count
+
+
 def is_enabled() -> bool:
     return persist.is_samples_supported() and settings.core.history_support
 
@@ -139,9 +469,14 @@ async def get_samples_slice(
     limit: int | None = None,
     sort_desc: bool = False,
 ) -> Iterable[tuple[int, PortValue]]:
-    samples = await persist.get_samples_slice(
-        _PERSIST_COLLECTION, port.get_id(), from_timestamp, to_timestamp, limit, sort_desc
-    )
+    recent_samples = _recent_samples.get(port.get_id())
+    if recent_samples and recent_samples.covers(from_timestamp):
+        samples = recent_samples.get_slice(from_timestamp, to_timestamp, limit, sort_desc)
+    else:
+        await _flush_port_samples(port)
+        samples = await persist.get_samples_slice(
+            _PERSIST_COLLECTION, port.get_id(), from_timestamp, to_timestamp, limit, sort_desc
+        )
 
     # Transform samples according to port type
     samples = ((s[0], port.adapt_value_type(s[1])) for s in samples)
@@ -149,39 +484,143 @@ async def get_samples_slice(
     return samples
 
 
+async def get_samples_buckets(
+    port: core_ports.BasePort,
+    from_timestamp: int | None,
+    to_timestamp: int | None,
+    bucket: int,
+    agg: str,
+    limit: int | None = None,
+) -> Iterable[tuple[int, PortValue]]:
+    await _flush_port_samples(port)
+
+    rollup = _choose_rollup(bucket, agg)
+    if rollup:
+        samples = await _get_samples_buckets_with_rollup(port, rollup, from_timestamp, to_timestamp, bucket, agg, limit)
+    else:
+        samples = await persist.get_samples_buckets(
+            _PERSIST_COLLECTION, port.get_id(), from_timestamp, to_timestamp, bucket, agg, limit
+        )
+
+    # Transform samples according to port type; averages are not necessarily valid port values, so leave them as is
+    if agg != "avg":
+        samples = ((s[0], port.adapt_value_type(s[1])) for s in samples)
+
+    return samples
+
+
+async def _get_samples_buckets_with_rollup(
+    port: core_ports.BasePort,
+    rollup: tuple[str, int],
+    from_timestamp: int | None,
+    to_timestamp: int | None,
+    bucket: int,
+    agg: str,
+    limit: int | None,
+) -> list[tuple[int, float]]:
+    """Aggregate samples into buckets using `rollup` for the interval of time where the rollup is complete, and raw
+    samples before and after it."""
+
+    # Completed rollup buckets may still be buffered
+    if _pending_rollup_samples:
+        await flush_samples()
+
+    port_id = port.get_id()
+    rollup_name, duration = rollup
+    rollup_start = await _get_rollup_start(port_id, rollup_name, duration)
+    if rollup_start is None:
+        return list(
+            await persist.get_samples_buckets(
+                _PERSIST_COLLECTION, port_id, from_timestamp, to_timestamp, bucket, agg, limit
+            )
+        )
+
+    # Rollups are complete up to the bucket that is currently being filled
+    current_bucket = _rollup_buckets.get((port_id, rollup_name))
+    if current_bucket:
+        rollup_stop = current_bucket.timestamp
+    else:
+        now_ms = int(time.time() * 1000)
+        rollup_stop = now_ms - now_ms % duration
+
+    # Align the rollup interval to requested buckets
+    rollup_start = -(-rollup_start // bucket) * bucket
+    rollup_stop = rollup_stop - rollup_stop % bucket
+    if from_timestamp is not None:
+        rollup_start = max(rollup_start, -(-from_timestamp // bucket) * bucket)
+    if to_timestamp is not None:
+        rollup_stop = min(rollup_stop, to_timestamp - to_timestamp % bucket)
+
+    if rollup_start >= rollup_stop:
+        return list(
+            await persist.get_samples_buckets(
+                _PERSIST_COLLECTION, port_id, from_timestamp, to_timestamp, bucket, agg, limit
+            )
+        )
+
+    results = []
+    if from_timestamp is None or from_timestamp < rollup_start:
+        samples = await persist.get_samples_buckets(
+            _PERSIST_COLLECTION, port_id, from_timestamp, rollup_start, bucket, agg, limit
+        )
+        results += samples
+
+    if limit is None or len(results) < limit:
+        remaining = limit - len(results) if limit is not None else None
+        results += await _get_rollup_buckets(port_id, rollup_name, rollup_start, rollup_stop, bucket, agg, remaining)
+
+    if (limit is None or len(results) < limit) and (to_timestamp is None or to_timestamp > rollup_stop):
+        remaining = limit - len(results) if limit is not None else None
+        samples = await persist.get_samples_buckets(
+            _PERSIST_COLLECTION, port_id, rollup_stop, to_timestamp, bucket, agg, remaining
+        )
+        results += samples
+
+    return results
+
+
 async def get_samples_by_timestamp(port: core_ports.BasePort, timestamps: list[int]) -> Iterable[GenericJSONDict]:
     now_ms = int(time.time() * 1000)
-    samples_cache = _samples_cache.setdefault(port.get_id(), {})
-    MISSED = {}
+    port_id = port.get_id()
+    recent_samples = _recent_samples.get(port_id)
 
-    results = {}
-    missed_timestamps = []
+    results: dict[int, float | None] = {}
+    lookup_timestamps = []
     for timestamp in timestamps:
-        # Look it up in cache
-        sample = samples_cache.get(timestamp, MISSED)
-        if sample is MISSED:
-            missed_timestamps.append(timestamp)
+        # Look it up in recent samples first
+        if recent_samples and (value := recent_samples.get_at(timestamp)) is not None:
+            results[timestamp] = value
         else:
-            results[timestamp] = sample
+            lookup_timestamps.append(timestamp)
+
+    cached_results, missed_timestamps = _samples_cache.lookup(port_id, lookup_timestamps)
+    results.update(cached_results)
 
     if missed_timestamps:
-        samples = await persist.get_samples_by_timestamp(_PERSIST_COLLECTION, port.get_id(), missed_timestamps)
+        await _flush_port_samples(port)
+
+        samples = await persist.get_samples_by_timestamp(_PERSIST_COLLECTION, port_id, missed_timestamps)
         samples = list(samples)
+        results.update(zip(missed_timestamps, samples))
 
-        # Transform samples according to port type
-        samples = [port.adapt_value_type(s) for s in samples]
+        # Add samples to cache if they're old enough
+        _samples_cache.add(
+            port_id, [(t, s) for t, s in zip(missed_timestamps, samples) if now_ms - t > _CACHE_TIMESTAMP_MIN_AGE]
+        )
 
-        for i, timestamp in enumerate(missed_timestamps):
-            results[timestamp] = samples[i]
+    # Transform samples according to port type, keeping the order of requested timestamps
+    samples = ((t, port.adapt_value_type(results[t])) for t in timestamps)
 
-            # Add sample to cache if it's old enough
-            if now_ms - timestamp > _CACHE_TIMESTAMP_MIN_AGE:
-                samples_cache[timestamp] = samples[i]
+    return ({"value": v, "timestamp": t} if v is not None else None for t, v in samples)
 
-    return ({"value": v, "timestamp": t} if v is not None else None for t, v in results.items())
+
+def get_samples_cache_stats() -> dict[str, int]:
+    return _samples_cache.get_stats()
 
 
 async def save_sample(port: core_ports.BasePort, timestamp: int) -> None:
+    global _pending_samples_time
+
     value = port.get_last_read_value()
     if value is None:
         logger.debug("skipping null sample of %s (timestamp = %s)", port, timestamp)
@@ -189,7 +628,241 @@ async def save_sample(port: core_ports.BasePort, timestamp: int) -> None:
 
     logger.debug("saving sample of %s (value = %s, timestamp = %s)", port, json_utils.dumps(value), timestamp)
 
-    await persist.save_sample(_PERSIST_COLLECTION, port.get_id(), timestamp, float(value))
+    port_id = port.get_id()
+    value = float(value)
+    if settings.core.history_recent_samples > 0:
+        recent_samples = _recent_samples.get(port_id)
+        if recent_samples is None:
+            recent_samples = _recent_samples[port_id] = RecentSamples(settings.core.history_recent_samples)
+        recent_samples.add(timestamp, value)
+
+    if settings.core.history_rollups:
+        await _update_rollups(port_id, timestamp, value)
+
+    if not _pending_samples:
+        _pending_samples_time = time.time()
+    _pending_samples.append((port_id, timestamp, value))
+
+    if len(_pending_samples) >= settings.core.history_buffer_size or settings.core.history_buffer_age <= 0:
+        await flush_samples()
+
+
+async def flush_samples() -> None:
+    """Write all buffered samples at once."""
+
+    global _pending_samples
+    global _pending_rollup_samples
+
+    if _pending_rollup_samples:
+        pending_rollup_samples = _pending_rollup_samples
+        _pending_rollup_samples = {}
+        for collection, samples in list(pending_rollup_samples.items()):
+            try:
+                await persist.save_samples(collection, samples)
+            except Exception:
+                # Put unsaved rollup samples back, so that they are written with the next flush
+                for unsaved_collection, unsaved_samples in pending_rollup_samples.items():
+                    pending = _pending_rollup_samples.get(unsaved_collection, [])
+                    _pending_rollup_samples[unsaved_collection] = _restore_pending_samples(
+                        unsaved_samples, pending, unsaved_collection
+                    )
+                raise
+
+            pending_rollup_samples.pop(collection)
+
+    if not _pending_samples:
+        return
+
+    samples = _pending_samples
+    _pending_samples = []
+
+    logger.debug("flushing %d samples", len(samples))
+
+    try:
+        await persist.save_samples(_PERSIST_COLLECTION, samples)
+    except Exception:
+        # Put samples back, so that they are written with the next flush
+        _pending_samples = _restore_pending_samples(samples, _pending_samples, _PERSIST_COLLECTION)
+        raise
+
+
+def _restore_pending_samples(
+    samples: list[tuple[str, int, float]], pending_samples: list[tuple[str, int, float]], collection: str
+) -> list[tuple[str, int, float]]:
+    samples = samples + pending_samples
+    max_size = max(settings.core.history_buffer_size, len(pending_samples))
+    if len(samples) > max_size:
+        dropped = samples[: len(samples) - max_size]
+        samples = samples[len(samples) - max_size :]
+        logger.error(
+            "dropping %d unsaved samples from %s (timestamps %s to %s)",
+            len(dropped),
+            collection,
+            dropped[0][1],
+            dropped[-1][1],
+        )
+
+    return samples
+
+
+def _get_rollup_collection(rollup_name: str, agg: str) -> str:
+    return f"{_PERSIST_COLLECTION}_{rollup_name}_{agg}"
+
+
+async def _update_rollups(port_id: str, timestamp: int, value: float) -> None:
+    timestamp = int(timestamp)
+    for rollup_name, duration in _ROLLUPS:
+        key = port_id, rollup_name
+        bucket_timestamp = timestamp - timestamp % duration
+        bucket = _rollup_buckets.get(key)
+        if bucket is None:
+            bucket = await _load_rollup_bucket(port_id, rollup_name, duration, bucket_timestamp, timestamp)
+        elif bucket.timestamp < bucket_timestamp:
+            _queue_rollup_bucket(port_id, rollup_name, bucket)
+            bucket = RollupBucket(bucket_timestamp)
+        elif bucket.timestamp > bucket_timestamp:
+            # Time went backwards; the bucket we're in has most likely been persisted already
+            bucket = RollupBucket(bucket_timestamp)
+
+        bucket.add(value)
+        _rollup_buckets[key] = bucket
+
+
+async def _load_rollup_bucket(
+    port_id: str, rollup_name: str, duration: int, bucket_timestamp: int, timestamp: int
+) -> RollupBucket:
+    # Resume the bucket that may have been persisted while being filled, upon previous cleanup
+    bucket = RollupBucket(bucket_timestamp)
+    values = {}
+    for agg in _ROLLUP_AGGS:
+        collection = _get_rollup_collection(rollup_name, agg)
+        samples = list(
+            await persist.get_samples_slice(collection, port_id, bucket_timestamp, bucket_timestamp + 1, 1, False)
+        )
+        if not samples:
+            return await _rebuild_rollup_bucket(port_id, duration, bucket_timestamp, timestamp)
+
+        values[agg] = samples[0][1]
+
+    bucket.merge(values["min"], values["max"], values["avg"], int(values["count"]))
+    for agg in _ROLLUP_AGGS:
+        collection = _get_rollup_collection(rollup_name, agg)
+        await persist.remove_samples(collection, [port_id], bucket_timestamp, bucket_timestamp + 1)
+
+    return bucket
+
+
+async def _rebuild_rollup_bucket(port_id: str, duration: int, bucket_timestamp: int, timestamp: int) -> RollupBucket:
+    # Without a persisted partial bucket (e.g. after a crash), rebuild it from the raw samples saved so far
+    bucket = RollupBucket(bucket_timestamp)
+    if any(s[0] == port_id for s in _pending_samples):
+        await flush_samples()
+
+    values = {}
+    for agg in _ROLLUP_AGGS:
+        samples = list(
+            await persist.get_samples_buckets(
+                _PERSIST_COLLECTION, port_id, bucket_timestamp, timestamp, duration, agg, 1
+            )
+        )
+        if not samples:
+            return bucket
+
+        values[agg] = samples[0][1]
+
+    bucket.merge(values["min"], values["max"], values["avg"], int(values["count"]))
+
+    return bucket
+
+
+def _queue_rollup_bucket(port_id: str, rollup_name: str, bucket: RollupBucket) -> None:
+    key = port_id, rollup_name
+    if key in _rollup_starts and _rollup_starts[key] is None:
+        _rollup_starts.pop(key)
+
+    for agg, value in bucket.get_values().items():
+        collection = _get_rollup_collection(rollup_name, agg)
+        _pending_rollup_samples.setdefault(collection, []).append((port_id, bucket.timestamp, value))
+
+
+def _choose_rollup(bucket: int, agg: str) -> tuple[str, int] | None:
+    """Return the coarsest rollup that can be aggregated into buckets of `bucket` milliseconds using `agg`."""
+
+    if not settings.core.history_rollups or agg not in ("min", "max", "avg"):
+        return None
+
+    for rollup_name, duration in reversed(_ROLLUPS):
+        if bucket % duration == 0:
+            return rollup_name, duration
+
+    return None
+
+
+async def _get_rollup_start(port_id: str, rollup_name: str, duration: int) -> int | None:
+    key = port_id, rollup_name
+    if key not in _rollup_starts:
+        collection = _get_rollup_collection(rollup_name, "count")
+        samples = list(await persist.get_samples_slice(collection, port_id, None, None, 1, False))
+
+        # The first bucket is most likely incomplete, as it has been started along with the rollup
+        _rollup_starts[key] = samples[0][0] + duration if samples else None
+
+    return _rollup_starts[key]
+
+
+async def _get_rollup_buckets(
+    port_id: str,
+    rollup_name: str,
+    from_timestamp: int,
+    to_timestamp: int,
+    bucket: int,
+    agg: str,
+    limit: int | None,
+) -> list[tuple[int, float]]:
+    if agg != "avg":
+        collection = _get_rollup_collection(rollup_name, agg)
+        samples = await persist.get_samples_buckets(
+            collection, port_id, from_timestamp, to_timestamp, bucket, agg, limit
+        )
+
+        return list(samples)
+
+    # Averages must be weighted by the number of samples in each rollup bucket
+    avg_samples = await persist.get_samples_slice(
+        _get_rollup_collection(rollup_name, "avg"), port_id, from_timestamp, to_timestamp, None, False
+    )
+    count_samples = await persist.get_samples_slice(
+        _get_rollup_collection(rollup_name, "count"), port_id, from_timestamp, to_timestamp, None, False
+    )
+
+    results = []
+    current_bucket = None
+    total = count = 0
+    for (timestamp, avg), (_, rollup_count) in zip(avg_samples, count_samples):
+        sample_bucket = timestamp - timestamp % bucket
+        if sample_bucket != current_bucket:
+            if current_bucket is not None:
+                results.append((current_bucket, total / count))
+                if limit is not None and len(results) >= limit:
+                    return results
+
+            current_bucket = sample_bucket
+            total = count = 0
+
+        total += avg * rollup_count
+        count += rollup_count
+
+    if current_bucket is not None:
+        results.append((current_bucket, total / count))
+
+    return results
+
+
+async def _flush_port_samples(port: core_ports.BasePort) -> None:
+    # Buffered samples must reach the persisted history before it is queried
+    port_id = port.get_id()
+    if any(s[0] == port_id for s in _pending_samples):
+        await flush_samples()
 
 
 async def remove_samples(
@@ -197,22 +870,81 @@ async def remove_samples(
     from_timestamp: int | None = None,
     to_timestamp: int | None = None,
     background: bool = False,
+    with_rollups: bool = True,
 ) -> int | None:
-    # Invalidate samples cache for the ports
+    # Buffered samples must reach the persisted history so that they are removed as well
+    await flush_samples()
+
+    # Rollups are removed along with the raw samples, when running in background
+    if with_rollups and settings.core.history_rollups and not background:
+        await _remove_rollups(ports, from_timestamp, to_timestamp)
+
     for port in ports:
-        _samples_cache.pop(port.get_id(), None)
+        if from_timestamp is to_timestamp is None:
+            _recent_samples.pop(port.get_id(), None)
+        elif recent_samples := _recent_samples.get(port.get_id()):
+            recent_samples.remove(from_timestamp, to_timestamp)
 
     if background:
+        # Cached samples still reflect the persisted history, until samples are actually removed
         for port in ports:
-            _pending_remove_samples.append((port, from_timestamp, to_timestamp))
+            _pending_remove_samples.append((port, from_timestamp, to_timestamp, with_rollups))
     else:
         port_ids = [p.get_id() for p in ports]
-        return await persist.remove_samples(_PERSIST_COLLECTION, port_ids, from_timestamp, to_timestamp)
+        count = await persist.remove_samples(_PERSIST_COLLECTION, port_ids, from_timestamp, to_timestamp)
+        await _invalidate_samples_cache(port_ids, from_timestamp)
+
+        return count
+
+
+async def _invalidate_samples_cache(port_ids: list[str], from_timestamp: int | None) -> None:
+    # Samples looked up after the oldest remaining sample still match the same sample
+    for port_id in port_ids:
+        if not _samples_cache.has_port(port_id):
+            continue
+
+        samples = list(await persist.get_samples_slice(_PERSIST_COLLECTION, port_id, from_timestamp, None, 1, False))
+        _samples_cache.remove(port_id, from_timestamp, samples[0][0] if samples else None)
+
+
+async def _remove_rollups(
+    ports: list[core_ports.BasePort], from_timestamp: int | None, to_timestamp: int | None
+) -> None:
+    port_ids = [p.get_id() for p in ports]
+    for rollup_name, duration in _ROLLUPS:
+        # Any rollup bucket touched by the interval no longer reflects the remaining samples
+        rollup_from_timestamp = from_timestamp - from_timestamp % duration if from_timestamp is not None else None
+        for agg in _ROLLUP_AGGS:
+            collection = _get_rollup_collection(rollup_name, agg)
+            await persist.remove_samples(collection, port_ids, rollup_from_timestamp, to_timestamp)
+
+        for port_id in port_ids:
+            key = port_id, rollup_name
+            _rollup_starts.pop(key, None)
+
+            # Drop the bucket being filled if it overlaps the interval, so that it isn't persisted again
+            bucket = _rollup_buckets.get(key)
+            if (
+                bucket
+                and (from_timestamp is None or bucket.timestamp + duration > from_timestamp)
+                and (to_timestamp is None or bucket.timestamp < to_timestamp)
+            ):
+                _rollup_buckets.pop(key)
 
 
 async def reset() -> None:
     logger.debug("clearing persisted data")
+    _pending_samples.clear()
+    _recent_samples.clear()
+    _samples_cache.clear()
+    _rollup_buckets.clear()
+    _rollup_starts.clear()
+    _pending_rollup_samples.clear()
     await persist.remove_samples(_PERSIST_COLLECTION)
+    if settings.core.history_rollups:
+        for rollup_name, _ in _ROLLUPS:
+            for agg in _ROLLUP_AGGS:
+                await persist.remove_samples(_get_rollup_collection(rollup_name, agg))
 
 
 async def init() -> None:
@@ -227,6 +959,10 @@ async def init() -> None:
     _janitor_task = asyncio.create_task(janitor_task())
 
     await persist.ensure_index(_PERSIST_COLLECTION)
+    if settings.core.history_rollups:
+        for rollup_name, _ in _ROLLUPS:
+            for agg in _ROLLUP_AGGS:
+                await persist.ensure_index(_get_rollup_collection(rollup_name, agg))
 
 
 async def cleanup() -> None:
@@ -243,3 +979,10 @@ async def cleanup() -> None:
             await _janitor_task
         except asyncio.CancelledError:
             pass
+
+    # Partial rollup buckets are persisted as well, to be resumed upon next startup
+    for (port_id, rollup_name), bucket in _rollup_buckets.items():
+        _queue_rollup_bucket(port_id, rollup_name, bucket)
+    _rollup_buckets.clear()
+
+    await flush_samples()
@@ -1,4 +1,5 @@
 import asyncio
+import heapq
 import logging
 import time
 
@@ -7,6 +8,7 @@ from datetime import datetime
 from qtoggleserver.conf import settings
 from qtoggleserver.core import events as core_events
 from qtoggleserver.core import ports as core_ports
+from qtoggleserver.core import sessions as core_sessions
 from qtoggleserver.core.expressions import (
     DEP_ASAP,
     DEP_DAY,
@@ -15,7 +17,7 @@ from qtoggleserver.core.expressions import (
     DEP_MONTH,
     DEP_SECOND,
     DEP_YEAR,
-    EvalContext,
+    Expression,
 )
 from qtoggleserver.core.typing import NullablePortValue
 from qtoggleserver.utils import expressions as expressions_utils
@@ -28,6 +30,12 @@ from qtoggleserver.utils import timedset
 # After how much time to retry reading a port whose read_value() method raised an error
 _PORT_READ_ERROR_RETRY_INTERVAL = 10
 
+# Asap eval pauses that never end
+_NEVER_MS = int(1e13)
+
+# How long the scheduler sleeps at most, even if there's no known work to do
+_SCHEDULER_MAX_SLEEP = 60
+
 logger = logging.getLogger(__name__)
 memory_logs: logging_utils.FifoMemoryHandler | None = None
 
@@ -46,9 +54,16 @@ _last_month: int = 0
 _last_year: int = 0
 _force_eval_expression_ports: set[core_ports.BasePort] = set()
 _force_eval_all_expressions: bool = False
+_notified_ports: set[core_ports.BasePort] = set()
 _ports_with_read_error = timedset.TimedSet(_PORT_READ_ERROR_RETRY_INTERVAL)
 _update_lock: asyncio.Lock | None = None
 _attr_change_handler = main_utils.AttrChangeHandler()
+_deadlines: list[int] = []  # min-heap of timestamps (in milliseconds) at which the update loop has work to do
+_scheduled_deadlines: set[int] = set()
+_wake_up_event: asyncio.Event | None = None
+_wake_up_requested: bool = False
+_polled_ports: set[core_ports.BasePort] = set()  # enabled ports that are read every tick
+_heart_beat_ports: set[core_ports.BasePort] = set()  # enabled ports that have their own `heart_beat_second()`
 
 
 def _get_changed_time_deps(now_int: int) -> tuple[bool, set[str]]:
@@ -98,8 +113,6 @@ def _get_changed_time_deps(now_int: int) -> tuple[bool, set[str]]:
 
 
 async def read_ports(ports_to_read: list[core_ports.BasePort] | None = None) -> None:
-    from . import sessions
-
     global _update_lock
 
     if _paused:
@@ -130,33 +143,61 @@ async def read_ports(ports_to_read: list[core_ports.BasePort] | None = None) ->
 
         all_ports = list(core_ports.get_all())
         if not ports_to_read:
-            ports_to_read = all_ports
+            # Only read polled ports and those that notified us about a new value
+            notified_ports = set(_notified_ports)
+            _notified_ports.clear()
+            ports_to_read = [port for port in all_ports if port.POLLED or port in notified_ports]
 
-        for port in ports_to_read:
-            if not port.is_enabled():
-                continue
-
-            old_value = port.get_last_read_value()
+        if second_changed:
+            for port in all_ports:
+                if not port.is_enabled():
+                    continue
 
-            if second_changed:
                 try:
                     port.heart_beat_second()
                 except Exception as e:
                     logger.error("port heart beat second exception: %s", e, exc_info=True)
 
+        ports_old_values: list[tuple[core_ports.BasePort, NullablePortValue]] = []
+        for port in ports_to_read:
+            if not port.is_enabled():
+                continue
+
             # Skip ports with read errors for a while
             if port in _ports_with_read_error:
+                if not port.POLLED:
+                    _notified_ports.add(port)  # retry reading once the read error expires
+
                 continue
 
-            try:
-                new_value = await port.read_transformed_value()
-            except core_ports.SkipRead:
+            ports_old_values.append((port, port.get_last_read_value()))
+
+        # Read all ports concurrently, so that the duration of the read phase is given by the slowest port
+        semaphore = asyncio.Semaphore(max(1, settings.core.port_read_concurrency))
+        new_values = await asyncio.gather(
+            *(_read_port_value(port, semaphore) for port, _ in ports_old_values), return_exceptions=True
+        )
+
+        # Process read results in the order ports were given, preserving value-change ordering
+        for (port, old_value), new_value in zip(ports_old_values, new_values):
+            if isinstance(new_value, core_ports.SkipRead):
                 continue  # read explicitly skipped
-            except Exception as e:
-                logger.error("failed to read value from %s: %s", port, e, exc_info=True)
+            elif isinstance(new_value, TimeoutError):
+                logger.error("timeout reading value from %s", port)
+                _ports_with_read_error.add(port)
+                if not port.POLLED:
+                    _notified_ports.add(port)
+
+                continue
+            elif isinstance(new_value, Exception):
+                logger.error("failed to read value from %s: %s", port, new_value, exc_info=new_value)
                 _ports_with_read_error.add(port)
+                if not port.POLLED:
+                    _notified_ports.add(port)
 
                 continue
+            elif isinstance(new_value, BaseException):
+                raise new_value  # cancellation is not a read error; let it propagate
 
             if new_value != old_value:
                 old_value_str = json_utils.dumps(old_value) if old_value is not None else "(unavailable)"
@@ -178,7 +219,19 @@ async def read_ports(ports_to_read: list[core_ports.BasePort] | None = None) ->
 
         await _eval_changed_expressions(changes, now_ms)
 
-        sessions.update()
+        core_sessions.update()
+
+
+async def _read_port_value(port: core_ports.BasePort, semaphore: asyncio.Semaphore) -> NullablePortValue:
+    """Read the transformed value of `port`, waiting for a free slot in `semaphore` first and giving up after
+    `settings.core.port_read_timeout` milliseconds (if set)."""
+
+    async with semaphore:
+        timeout = settings.core.port_read_timeout
+        if timeout > 0:
+            return await asyncio.wait_for(port.read_transformed_value(), timeout=timeout / 1000.0)
+
+        return await port.read_transformed_value()
 
 
 async def _eval_changed_expressions(changes: set[str], now_ms: int) -> None:
@@ -190,8 +243,6 @@ async def _eval_changed_expressions(changes: set[str], now_ms: int) -> None:
     full_eval = _force_eval_all_expressions
     _force_eval_all_expressions = False
 
-    eval_context: EvalContext | None = None
-
     # Reevaluate all port expressions depending on changed set
     if full_eval:
         ports_to_eval = list(core_ports.get_all())
@@ -202,6 +253,7 @@ async def _eval_changed_expressions(changes: set[str], now_ms: int) -> None:
             for port in deps_map.get(dep, []):
                 ports_to_eval.add(port)
 
+    ports_expressions: list[tuple[core_ports.BasePort, Expression]] = []
     for port in ports_to_eval:
         if not port.is_enabled():
             continue
@@ -216,10 +268,19 @@ async def _eval_changed_expressions(changes: set[str], now_ms: int) -> None:
             if changed_deps == {DEP_ASAP} and expression.is_asap_eval_paused(now_ms):
                 continue
 
-        # Build context lazily so we skip it entirely when all ports are filtered out above
-        if not eval_context:
-            eval_context = await expressions_utils.build_context(now_ms)
+        ports_expressions.append((port, expression))
+
+    # Skip building the context entirely when all ports are filtered out above
+    if not ports_expressions:
+        return
 
+    # Only gather attributes required by the expressions that are about to be evaluated
+    all_deps: set[str] = set()
+    for _, expression in ports_expressions:
+        all_deps.update(expression.get_deps())
+
+    eval_context = await expressions_utils.build_context(now_ms, all_deps)
+    for port, _ in ports_expressions:
         await port.eval_and_push_write(eval_context)
 
 
@@ -229,14 +290,133 @@ async def update_loop() -> None:
             try:
                 if _ready:
                     await read_ports()
+                if settings.core.scheduler:
+                    _schedule_due_work(int(time.time() * 1000))
             except Exception as e:
                 logger.error("update failed: %s", e, exc_info=True)
-            await asyncio.sleep(settings.core.tick_interval / 1000.0)
+
+            if settings.core.scheduler:
+                await _wait_for_due_work()
+            else:
+                await asyncio.sleep(settings.core.tick_interval / 1000.0)
         except asyncio.CancelledError:
             logger.debug("update task cancelled")
             break
 
 
+def _schedule_due_work(now_ms: int) -> None:
+    """Schedule the next run of the update loop for each kind of work that will be due: reading ports, evaluating asap
+    expressions whose evaluation is paused, time-dependent expressions and session keep-alives."""
+
+    tick_ms = now_ms + settings.core.tick_interval
+
+    for port in list(_ports_with_read_error):
+        if port in _ports_with_read_error and port.is_enabled():
+            schedule(int(_ports_with_read_error.get_expiry_time(port) * 1000))
+
+    # Polled ports with read errors are only due once their errors expire
+    if any(port not in _ports_with_read_error for port in _polled_ports):
+        schedule(tick_ms)
+
+    deps_map = expressions_utils.get_deps_map()
+    for port in deps_map.get(DEP_ASAP, []):
+        expression = port.get_expression()
+        if not expression or not port.is_enabled():
+            continue
+
+        paused_until_ms = expression.get_asap_eval_paused_until_ms()
+        if paused_until_ms <= now_ms:
+            schedule(tick_ms)
+            break
+        elif paused_until_ms < _NEVER_MS:
+            schedule(paused_until_ms)
+
+    if _heart_beat_ports or deps_map.get(DEP_SECOND):
+        schedule((now_ms // 1000 + 1) * 1000)
+    elif any(deps_map.get(dep) for dep in (DEP_MINUTE, DEP_HOUR, DEP_DAY, DEP_MONTH, DEP_YEAR)):
+        schedule((now_ms // 60000 + 1) * 60000)
+
+    session_time = core_sessions.get_next_update_time()
+    if session_time is not None:
+        schedule(int(session_time * 1000) + 1)
+
+
+async def _wait_for_due_work() -> None:
+    """Sleep until the earliest scheduled deadline, or until woken up."""
+
+    global _wake_up_event
+    global _wake_up_requested
+
+    if _wake_up_event is None:
+        _wake_up_event = asyncio.Event()
+
+    while not _wake_up_requested:
+        now_ms = int(time.time() * 1000)
+        if _deadlines and _deadlines[0] <= now_ms:
+            break
+
+        timeout_ms = _deadlines[0] - now_ms if _deadlines else _SCHEDULER_MAX_SLEEP * 1000
+        timeout_ms = min(timeout_ms, _SCHEDULER_MAX_SLEEP * 1000)
+
+        # The event is also set when a new deadline is scheduled, so that the sleep duration is recomputed
+        _wake_up_event.clear()
+        try:
+            await asyncio.wait_for(_wake_up_event.wait(), timeout=timeout_ms / 1000.0)
+        except TimeoutError:
+            break
+
+    _wake_up_requested = False
+    now_ms = int(time.time() * 1000)
+    while _deadlines and _deadlines[0] <= now_ms:
+        _scheduled_deadlines.discard(heapq.heappop(_deadlines))
+
+
+def update_port_schedule(port: core_ports.BasePort) -> None:
+    """Keep track of the work that `port` brings to the update loop. Must be called whenever the port is enabled,
+    disabled or removed."""
+
+    if port.is_enabled() and not port.is_removed():
+        if port.POLLED:
+            _polled_ports.add(port)
+        if type(port).heart_beat_second is not core_ports.BasePort.heart_beat_second:
+            _heart_beat_ports.add(port)
+    else:
+        _polled_ports.discard(port)
+        _heart_beat_ports.discard(port)
+
+
+def schedule(timestamp_ms: int) -> None:
+    """Make the update loop run at `timestamp_ms`, at the latest. This is only needed when the scheduler is enabled,
+    as the update loop otherwise runs every tick anyway."""
+
+    if timestamp_ms in _scheduled_deadlines:
+        return
+
+    heapq.heappush(_deadlines, timestamp_ms)
+    _scheduled_deadlines.add(timestamp_ms)
+    if _wake_up_event:
+        _wake_up_event.set()
+
+
+def wake_up() -> None:
+    """Make the update loop run right away, instead of waiting for its next deadline (e.g. because a port has a new
+    value available)."""
+
+    global _wake_up_requested
+
+    _wake_up_requested = True
+    if _wake_up_event:
+        _wake_up_event.set()
+
+
+def notify_port_value(port: core_ports.BasePort) -> None:
+    """Make the update loop read `port` on its next iteration. This is how ports that aren't polled signal that they
+    have a new value."""
+
+    _notified_ports.add(port)
+    wake_up()
+
+
 def force_eval_expressions(port: core_ports.BasePort | None = None) -> None:
     global _force_eval_all_expressions
 
@@ -247,6 +427,8 @@ def force_eval_expressions(port: core_ports.BasePort | None = None) -> None:
     else:
         _force_eval_all_expressions = True
 
+    wake_up()
+
 
 def resume() -> None:
     global _paused
@@ -254,6 +436,7 @@ def resume() -> None:
     if _paused:
         logger.debug("resuming ports reading loop")
         _paused = False
+        wake_up()
 
 
 def pause() -> None:
@@ -273,6 +456,7 @@ def set_ready() -> None:
 
     logger.debug("ready")
     _ready = True
+    wake_up()
 
 
 def uptime() -> float:
@@ -286,6 +470,8 @@ async def init() -> None:
     loop = asyncio.get_running_loop()
 
     core_events.register_handler(_attr_change_handler)
+    if settings.core.scheduler:
+        core_events.register_handler(main_utils.WakeUpHandler(wake_up))
     force_eval_expressions()
     _update_loop_task = loop.create_task(update_loop())
 
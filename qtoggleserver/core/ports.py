@@ -171,6 +171,9 @@ class BasePort(logging_utils.LoggableMixin, metaclass=abc.ABCMeta):
     STEP = None
     INTERNAL = False
 
+    # Set to `False` for ports that know when their value changes; these are only read after calling `notify_value()`
+    POLLED = True
+
     WRITE_QUEUE_SIZE = 16
 
     STANDARD_ATTRDEFS = STANDARD_ATTRDEFS
@@ -246,6 +249,8 @@ class BasePort(logging_utils.LoggableMixin, metaclass=abc.ABCMeta):
         self._write_value_lock = asyncio.Lock()
 
         self._write_queue: deque[WriteRequest] = deque(maxlen=self.WRITE_QUEUE_SIZE)
+        # Set whenever a request is added to the write queue, so that the write loop doesn't need to poll the queue
+        self._write_queue_event: asyncio.Event = asyncio.Event()
         self._write_task: asyncio.Task | None = None
         try:
             asyncio.get_running_loop()
@@ -485,6 +490,7 @@ class BasePort(logging_utils.LoggableMixin, metaclass=abc.ABCMeta):
         self.debug("enabling")
         self._enabled = True
         self.invalidate_attr("enabled")
+        main.update_port_schedule(self)
 
         # Reset port expression
         if self._expression:
@@ -494,11 +500,16 @@ class BasePort(logging_utils.LoggableMixin, metaclass=abc.ABCMeta):
 
             main.force_eval_expressions(self)
 
+        # Ports that aren't polled still need their value read once they're enabled
+        if not self.POLLED:
+            self.notify_value()
+
         try:
             await self.handle_enable()
         except Exception:
             self.error("failed to enable")
             self._enabled = False
+            main.update_port_schedule(self)
 
             raise
 
@@ -515,12 +526,14 @@ class BasePort(logging_utils.LoggableMixin, metaclass=abc.ABCMeta):
         self.debug("disabling")
         self._enabled = False
         self.invalidate_attr("enabled")
+        main.update_port_schedule(self)
 
         try:
             await self.handle_disable()
         except Exception:
             self.error("failed to disable")
             self._enabled = True
+            main.update_port_schedule(self)
 
             raise
 
@@ -568,7 +581,7 @@ class BasePort(logging_utils.LoggableMixin, metaclass=abc.ABCMeta):
 
         if not sexpression:
             self._expression = None
-            expressions_utils.invalidate_deps_map()
+            expressions_utils.update_port_deps(self)
             return
 
         try:
@@ -580,7 +593,7 @@ class BasePort(logging_utils.LoggableMixin, metaclass=abc.ABCMeta):
 
         self.debug('setting expression "%s"', expression)
         self._expression = expression
-        expressions_utils.invalidate_deps_map()
+        expressions_utils.update_port_deps(self)
 
         # This will force expression evaluation for this port right away
         main.force_eval_expressions(self)
@@ -656,11 +669,18 @@ class BasePort(logging_utils.LoggableMixin, metaclass=abc.ABCMeta):
     async def read_value(self) -> NullablePortValue:
         return None
 
+    def notify_value(self) -> None:
+        """Tell the update loop that a new value is available, so that `read_value()` gets called on its next
+        iteration. Ports that aren't polled must call this whenever their value changes."""
+
+        main.notify_port_value(self)
+
     def get_last_read_value(self) -> NullablePortValue:
         return self._last_read_value[0] if self._last_read_value else None
 
     def set_last_read_value(self, value: NullablePortValue) -> None:
         self._last_read_value = value, int(time.time() * 1000)
+        expressions_utils.invalidate_port_value(self)
 
         for target_value, future in self._value_match_waiters:
             if not future.done() and value == target_value:
@@ -714,10 +734,12 @@ class BasePort(logging_utils.LoggableMixin, metaclass=abc.ABCMeta):
         async with self._write_value_lock:
             try:
                 self._writing_value = value
+                expressions_utils.invalidate_port_value(self)
                 await self.write_value(value)
                 self._last_written_value = value, int(time.time() * 1000)
             finally:
                 self._writing_value = None
+                expressions_utils.invalidate_port_value(self)
                 self.save_asap()
 
     def get_pending_value(self) -> NullablePortValue:
@@ -744,6 +766,8 @@ class BasePort(logging_utils.LoggableMixin, metaclass=abc.ABCMeta):
 
         self.debug("pushing value %s to write queue", value)
         self._write_queue.append(WriteRequest(value, future))
+        self._write_queue_event.set()
+        expressions_utils.invalidate_port_value(self)
         self.save_asap()
 
     async def push_write_and_wait(self, value: PortValue) -> None:
@@ -789,10 +813,12 @@ class BasePort(logging_utils.LoggableMixin, metaclass=abc.ABCMeta):
             while True:
                 try:
                     request = self._write_queue.pop()
+                    expressions_utils.invalidate_port_value(self)
                     # No need to call `save_asap()` as it will be called indirectly by `transform_and_write_value()`
                 except IndexError:
                     request = None
-                    await asyncio.sleep(settings.core.tick_interval / 1000.0)
+                    self._write_queue_event.clear()
+                    await self._write_queue_event.wait()
                     continue
 
                 try:
@@ -1000,12 +1026,16 @@ class BasePort(logging_utils.LoggableMixin, metaclass=abc.ABCMeta):
             for value in write_queue:
                 if value is not None:
                     self._write_queue.append(WriteRequest(value))
+            if self._write_queue:
+                self._write_queue_event.set()
 
         # Handle legacy `value` field for backward compatibility with old persisted data
         if data.get("value") is not None and not loaded_last_read:
             self._last_read_value = data["value"], now_ms
             self.debug("loaded value = %s", json_utils.dumps(data["value"]))
 
+        expressions_utils.invalidate_port_value(self)
+
         # various
         self._history_last_timestamp = data.get("history_last_timestamp", 0)
 
@@ -1021,6 +1051,14 @@ class BasePort(logging_utils.LoggableMixin, metaclass=abc.ABCMeta):
 
         self._pending_save = False
 
+    async def prepare_save(self) -> GenericJSONDict:
+        """Clear the pending save flag and return the data to be persisted, under the save lock. Any change made
+        meanwhile marks the port for saving again."""
+
+        async with self._save_lock:
+            self._pending_save = False
+            return await self.to_persisted()
+
     async def to_persisted(self) -> GenericJSONDict:
         d: GenericJSONDict = {
             "id": self.get_id(),
@@ -1073,7 +1111,9 @@ class BasePort(logging_utils.LoggableMixin, metaclass=abc.ABCMeta):
         self.debug("removing port")
         self._removed = True
         _ports_by_id.pop(self._id, None)
-        expressions_utils.invalidate_deps_map()
+        main.update_port_schedule(self)
+        expressions_utils.remove_port_deps(self)
+        expressions_utils.invalidate_port_value(self)
 
         if persisted_data:
             self.debug("removing persisted data")
@@ -1206,6 +1246,7 @@ async def load_iter(port_args: list[dict[str, Any]], trigger_add: bool = True) -
 
         _ports_by_id[port.get_id()] = port
         new_ports[i] = port
+        expressions_utils.invalidate_port_value(port)
 
         logger.debug("initialized %s (driver %s)", port, port_class_desc)
 
@@ -1240,6 +1281,8 @@ async def load_iter(port_args: list[dict[str, Any]], trigger_add: bool = True) -
         except Exception as e:
             port._removed = True
             _ports_by_id.pop(port.get_id())
+            main.update_port_schedule(port)
+            expressions_utils.remove_port_deps(port)
             errors[i] = e
             continue
 
@@ -1282,18 +1325,40 @@ def get_all() -> ValuesView[BasePort]:
     return _ports_by_id.values()
 
 
-async def save_loop() -> None:
-    while True:
+async def save_many(ports: list[BasePort]) -> None:
+    """Persist the given ports, writing all their data at once for each persistence collection. Ports whose data
+    could not be persisted are marked for saving again."""
+
+    records_by_collection: dict[str, dict[str, GenericJSONDict]] = {}
+    ports_by_collection: dict[str, list[BasePort]] = {}
+    for port in ports:
+        if not port.is_loaded():
+            continue
+
+        port.debug("persisting data")
+
         try:
-            for port in list(get_all()):
-                if not port.is_pending_save():
-                    continue
+            records_by_collection.setdefault(port.PERSIST_COLLECTION, {})[port.get_id()] = await port.prepare_save()
+        except Exception as e:
+            port.error("save failed: %s", e, exc_info=True)
+            port.save_asap()
+            continue
 
-                try:
-                    await port.save()
-                except Exception as e:
-                    port.error("save failed: %s", e, exc_info=True)
+        ports_by_collection.setdefault(port.PERSIST_COLLECTION, []).append(port)
 
+    for collection, records in records_by_collection.items():
+        try:
+            await persist.replace_many(collection, records)
+        except Exception as e:
+            logger.error("failed to save %d ports: %s", len(records), e, exc_info=True)
+            for port in ports_by_collection[collection]:
+                port.save_asap()
+
+
+async def save_loop() -> None:
+    while True:
+        try:
+            await save_many([port for port in get_all() if port.is_pending_save()])
             await asyncio.sleep(settings.core.persist_interval / 1000.0)
 
         except asyncio.CancelledError:
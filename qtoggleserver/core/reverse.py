@@ -40,7 +40,10 @@ class InvalidConsumerRequestError(ReverseError):
 
 
 class UnauthorizedConsumerRequestError(ReverseError):
-    pass
+    def __init__(self, message: str, request_dict: GenericJSONDict) -> None:
+        self.request_dict: GenericJSONDict = request_dict
+
+        super().__init__(message)
 
 
 class Reverse:
@@ -67,6 +70,8 @@ class Reverse:
 
         self._enabled: bool = False
         self._url: str | None = None
+        self._slot_tasks: list[asyncio.Task] = []
+        self._http_client: AsyncHTTPClient | None = None
 
     def __str__(self) -> str:
         s = "reverse"
@@ -95,11 +100,16 @@ class Reverse:
         if self._enabled:
             return
 
-        logger.debug("starting wait loop")
+        logger.debug("starting wait loops")
 
         self._enabled = True
-        # TODO: properly handle session loop task
-        asyncio.create_task(self._session_loop())
+
+        # Each slot keeps its own request waiting for a consumer request, so that a slow API call only holds its slot.
+        # Slots use their own client, so that their long-polling requests don't hold up other users of the shared one.
+        concurrency = max(1, settings.reverse.concurrency)
+        if self._http_client is None:  # slots of a previous enabling may still be using it
+            self._http_client = AsyncHTTPClient(force_instance=True, max_clients=concurrency)
+        self._slot_tasks = [asyncio.create_task(self._session_loop(i)) for i in range(concurrency)]
 
     def disable(self) -> None:
         if not self._enabled:
@@ -107,8 +117,21 @@ class Reverse:
 
         logger.debug("wait stopped")
 
+        # Slots stop after their current request, which may well be the API call that disabled the reverse mechanism
         self._enabled = False
 
+    async def wait_stopped(self) -> None:
+        tasks = self._slot_tasks
+        self._slot_tasks = []
+        self.disable()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        if self._http_client:
+            self._http_client.close()
+            self._http_client = None
+
     def to_json(self) -> GenericJSONDict:
         d = {
             "enabled": self._enabled,
@@ -122,9 +145,21 @@ class Reverse:
 
         return d
 
-    async def _session_loop(self) -> None:
+    async def _session_loop(self, slot: int) -> None:
+        try:
+            await self._run_slot(slot)
+        finally:
+            # The last slot to stop closes the client
+            self._slot_tasks = [t for t in self._slot_tasks if t is not asyncio.current_task()]
+            if not self._slot_tasks and self._http_client:
+                self._http_client.close()
+                self._http_client = None
+
+    async def _run_slot(self, slot: int) -> None:
+        # The response to a consumer request is sent along with the next wait request of the same slot, correlated to
+        # its consumer request by the session id
         api_response_dict = None
-        api_request_dict = {}  # TODO this does not work
+        api_request_dict = {}
         sleep_interval = 0
 
         while True:
@@ -136,14 +171,21 @@ class Reverse:
                 sleep_interval = 0
 
             try:
-                api_request_dict = await self._wait(api_request_dict, api_response_dict)  # TODO properly implement me
-            except UnauthorizedConsumerRequestError:
+                api_request_dict = await self._wait(api_request_dict, api_response_dict)
+            except UnauthorizedConsumerRequestError as e:
+                api_request_dict = e.request_dict
                 api_response_dict = {"status": 401, "body": json_utils.dumps({"error": "authentication-required"})}
 
                 continue
+            except asyncio.CancelledError:
+                break
             except Exception as e:
                 logger.error(
-                    "wait failed: %s, retrying in %s seconds", e, settings.reverse.retry_interval, exc_info=True
+                    "wait failed (slot %s): %s, retrying in %s seconds",
+                    slot,
+                    e,
+                    settings.reverse.retry_interval,
+                    exc_info=True,
                 )
                 sleep_interval = settings.reverse.retry_interval
                 continue
@@ -154,6 +196,8 @@ class Reverse:
 
             try:
                 api_response_dict = await self._process_api_request(api_request_dict)
+            except asyncio.CancelledError:
+                break
             except Exception as e:
                 logger.error("reverse API call failed: %s", e, exc_info=True)
                 sleep_interval = settings.reverse.retry_interval
@@ -176,7 +220,6 @@ class Reverse:
             headers["Status"] = f"{api_response_dict['status']} {httputil.responses[api_response_dict['status']]}"
             headers["Session-Id"] = api_request_dict["session_id"]
 
-        http_client = AsyncHTTPClient()
         request = HTTPRequest(
             url, "POST", headers=headers, body=body_str, connect_timeout=self._timeout, request_timeout=self._timeout
         )
@@ -194,7 +237,7 @@ class Reverse:
 
         try:
             # This response is in fact an API request
-            consumer_response = await http_client.fetch(request, raise_error=False)
+            consumer_response = await self._http_client.fetch(request, raise_error=False)
         except Exception as e:
             # We need to catch exceptions here even though raise_error is False, because it only affects HTTP errors
             consumer_response = SimpleNamespace(error=e, code=599)
@@ -207,19 +250,6 @@ class Reverse:
     def _parse_consumer_response(response: HTTPResponse) -> GenericJSONDict:
         body = core_responses.parse(response)  # will raise for non-2xx
 
-        auth = response.headers.get("Authorization")
-        if not auth:
-            raise UnauthorizedConsumerRequestError("Missing authorization header")
-
-        try:
-            usr = core_api_auth.parse_auth_header(
-                auth, core_api_auth.ORIGIN_CONSUMER, core_api_auth.consumer_password_hash_func
-            )
-        except core_api_auth.AuthError as e:
-            raise UnauthorizedConsumerRequestError(str(e)) from e
-
-        access_level = core_api.ACCESS_LEVEL_MAPPING[usr]
-
         try:
             method = response.headers["Method"]
         except KeyError:
@@ -235,14 +265,23 @@ class Reverse:
         except KeyError:
             raise InvalidConsumerRequestError("Missing Session-Id header") from None
 
-        return {
-            "body": body,
-            "method": method,
-            "path": path,
-            "session_id": session_id,
-            "access_level": access_level,
-            "username": usr,
-        }
+        request_dict = {"body": body, "method": method, "path": path, "session_id": session_id}
+
+        auth = response.headers.get("Authorization")
+        if not auth:
+            raise UnauthorizedConsumerRequestError("Missing authorization header", request_dict)
+
+        try:
+            usr = core_api_auth.parse_auth_header(
+                auth, core_api_auth.ORIGIN_CONSUMER, core_api_auth.consumer_password_hash_func
+            )
+        except core_api_auth.AuthError as e:
+            raise UnauthorizedConsumerRequestError(str(e), request_dict) from e
+
+        request_dict["access_level"] = core_api.ACCESS_LEVEL_MAPPING[usr]
+        request_dict["username"] = usr
+
+        return request_dict
 
     async def _process_api_request(self, request_dict: GenericJSONDict) -> GenericJSONDict:
         from qtoggleserver.web import server as web_server
@@ -330,4 +369,5 @@ async def init() -> None:
 
 
 async def cleanup() -> None:
-    pass
+    if _reverse:
+        await _reverse.wait_stopped()
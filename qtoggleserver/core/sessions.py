@@ -2,7 +2,8 @@ import asyncio
 import logging
 import time
 
-from collections import deque
+from collections import OrderedDict
+from collections.abc import Hashable
 
 from qtoggleserver.conf import settings
 from qtoggleserver.core import events as core_events
@@ -14,6 +15,7 @@ SESSION_EXPIRY_FACTOR = 10
 logger = logging.getLogger(__name__)
 
 _sessions_by_id: dict[str, Session] = {}
+_sessions_by_access_level: dict[int, dict[str, Session]] = {}
 _sessions_event_handler: SessionsEventHandler | None = None
 
 
@@ -26,7 +28,10 @@ class Session(logging_utils.LoggableMixin):
         self.timeout: int = 0
         self.access_level: int = 0
         self.future: asyncio.Future | None = None
-        self.queue: deque[core_events.Event] = deque()
+        self.stream_event: asyncio.Event | None = None
+
+        # Queued events, oldest first, by their dedup key (or by themselves, if they don't have one)
+        self.queue: OrderedDict[Hashable, core_events.Event] = OrderedDict()
 
     def reset_and_wait(self, timeout: int, access_level: int) -> asyncio.Future:
         self.debug("resetting (timeout=%s, access_level=%s)", timeout, access_level)
@@ -39,8 +44,8 @@ class Session(logging_utils.LoggableMixin):
 
         self.accessed = int(time.time())
         self.timeout = timeout
-        self.access_level = access_level
         self.future = future
+        self._set_access_level(access_level)
 
         if self.queue:
             self.debug("has queued events, responding right away")
@@ -48,6 +53,58 @@ class Session(logging_utils.LoggableMixin):
 
         return future
 
+    def start_streaming(self, timeout: int, access_level: int) -> asyncio.Event:
+        """Stream events to a persistent connection, instead of waiting for them with `reset_and_wait()`. The returned
+        event is set as soon as events are queued; they are then consumed with `take_events()`."""
+
+        self.debug("streaming (timeout=%s, access_level=%s)", timeout, access_level)
+
+        if self.future:
+            self.debug("already has a listening connection, responding")
+            self.respond()
+
+        self.accessed = int(time.time())
+        self.timeout = timeout
+        self.stream_event = asyncio.Event()
+        self._set_access_level(access_level)
+
+        if self.queue:
+            self.stream_event.set()
+
+        return self.stream_event
+
+    def stop_streaming(self, stream_event: asyncio.Event) -> None:
+        """Stop streaming to the connection that was given `stream_event` by `start_streaming()`. A connection that
+        has meanwhile taken over the session keeps streaming."""
+
+        if self.stream_event is not stream_event:
+            return
+
+        self.debug("streaming stopped")
+
+        # The session expires as if its last listening request has just ended
+        self.accessed = int(time.time())
+        self.stream_event = None
+
+    def is_streaming(self) -> bool:
+        return self.stream_event is not None
+
+    def take_events(self) -> list[core_events.Event]:
+        """Remove and return all queued events, oldest first."""
+
+        events = list(self.queue.values())
+        self.queue = OrderedDict()
+        if self.stream_event:
+            self.stream_event.clear()
+
+        return events
+
+    def _set_access_level(self, access_level: int) -> None:
+        if access_level != self.access_level:
+            _unindex_session(self)
+            self.access_level = access_level
+            _index_session(self)
+
     def is_empty(self) -> bool:
         return len(self.queue) == 0
 
@@ -55,13 +112,12 @@ class Session(logging_utils.LoggableMixin):
         return self.future is not None
 
     def respond(self) -> None:
-        events = list(self.queue)
-        self.queue = deque()
+        events = self.take_events()
         if not self.future:
             return
 
         self.debug("serving %d events", len(events))
-        self.future.set_result(reversed(events))
+        self.future.set_result(events)
         self.future = None
 
     def cancel(self) -> None:
@@ -72,21 +128,23 @@ class Session(logging_utils.LoggableMixin):
             self.future = None
 
     def push(self, event: core_events.Event) -> None:
-        # Deduplicate events in a single pass, replacing the queue with a filtered copy
-        filtered = deque(e for e in self.queue if not event.is_duplicate(e))
-        dropped = len(self.queue) - len(filtered)
-        if dropped:
-            self.debug("dropped %d duplicate event(s) %s", dropped, event)
-        self.queue = filtered
+        # The new event replaces any queued duplicate, moving to the end of the queue
+        key = event.get_dedup_key()
+        if key is None:
+            key = event
+        elif self.queue.pop(key, None) is not None:
+            self.debug("dropped duplicate event %s", event)
 
         # Ensure max queue size
         while len(self.queue) >= settings.core.event_queue_size:
             # This is a debug and not a warning because we often expect event drops from queues belonging to sessions
             # that are no longer active and will simply no longer consume the events
             self.debug("queue full, dropping oldest event")
-            self.queue.pop()
+            self.queue.popitem(last=False)
 
-        self.queue.appendleft(event)
+        self.queue[key] = event
+        if self.stream_event:
+            self.stream_event.set()
 
     def __str__(self) -> str:
         return f"session {self.id}"
@@ -95,17 +153,29 @@ class Session(logging_utils.LoggableMixin):
 class SessionsEventHandler(core_events.Handler):
     FIRE_AND_FORGET = False
 
-    def __init__(self, sessions_by_id: dict[str, Session]) -> None:
-        self._sessions_by_id: dict[str, Session] = sessions_by_id
+    def __init__(self, sessions_by_access_level: dict[int, dict[str, Session]]) -> None:
+        self._sessions_by_access_level: dict[int, dict[str, Session]] = sessions_by_access_level
 
         super().__init__(name="sessions")
 
     async def handle_event(self, event: core_events.Event) -> None:
-        for session in self._sessions_by_id.values():
-            if session.access_level < event.REQUIRED_ACCESS:
+        for access_level, sessions in self._sessions_by_access_level.items():
+            if access_level < event.REQUIRED_ACCESS:
                 continue
 
-            session.push(event)
+            for session in sessions.values():
+                session.push(event)
+
+
+def _index_session(session: Session) -> None:
+    if _sessions_by_id.get(session.id) is session:
+        _sessions_by_access_level.setdefault(session.access_level, {})[session.id] = session
+
+
+def _unindex_session(session: Session) -> None:
+    sessions = _sessions_by_access_level.get(session.access_level)
+    if sessions and sessions.get(session.id) is session:
+        sessions.pop(session.id)
 
 
 def get(session_id: str) -> Session:
@@ -113,6 +183,7 @@ def get(session_id: str) -> Session:
     if not session:
         session = Session(session_id)
         _sessions_by_id[session_id] = session
+        _index_session(session)
         session.debug("created")
 
     return session
@@ -121,6 +192,9 @@ def get(session_id: str) -> Session:
 def update() -> None:
     now = time.time()
     for session_id, session in list(_sessions_by_id.items()):
+        if session.is_streaming():
+            continue  # streamed sessions are served by their connection
+
         if not session.is_empty() and session.is_active():
             session.respond()
             continue
@@ -130,13 +204,33 @@ def update() -> None:
             session.respond()
         elif now - session.accessed > session.timeout * SESSION_EXPIRY_FACTOR and not session.is_active():
             session.debug("expired")
+            _unindex_session(session)
             _sessions_by_id.pop(session_id)
 
 
+def get_next_update_time() -> float | None:
+    """Return the time at which `update()` will have to respond to or expire a session, if nothing else happens in
+    between, or `None` if there are no sessions."""
+
+    next_time = None
+    for session in _sessions_by_id.values():
+        if session.is_streaming():
+            continue
+
+        if session.is_active():
+            session_time = session.accessed + session.timeout
+        else:
+            session_time = session.accessed + session.timeout * SESSION_EXPIRY_FACTOR
+        if next_time is None or session_time < next_time:
+            next_time = session_time
+
+    return next_time
+
+
 async def init() -> None:
     global _sessions_event_handler
 
-    _sessions_event_handler = SessionsEventHandler(_sessions_by_id)
+    _sessions_event_handler = SessionsEventHandler(_sessions_by_access_level)
     core_events.register_handler(_sessions_event_handler)
 
 
@@ -12,6 +12,7 @@ _vport_args: dict[str, GenericJSONDict] = {}
 
 class VirtualPort(core_ports.Port):
     WRITABLE = True
+    POLLED = False
 
     def __init__(
         self,
@@ -49,6 +50,7 @@ class VirtualPort(core_ports.Port):
 
     async def write_value(self, value: PortValue) -> None:
         self._virtual_value = value
+        self.notify_value()
 
     async def to_persisted(self) -> GenericJSONDict:
         data = await super().to_persisted()
@@ -58,6 +60,7 @@ class VirtualPort(core_ports.Port):
 
     async def from_persisted(self, data: GenericJSONDict) -> None:
         self._virtual_value = data.get("virtual_value")
+        self.notify_value()
         await super().from_persisted(data)
 
 
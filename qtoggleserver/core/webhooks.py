@@ -1,10 +1,17 @@
+import asyncio
 import logging
-import queue
+import random
+import time
 
-from tornado.httpclient import AsyncHTTPClient, HTTPRequest, HTTPResponse
+from collections import deque
+from types import SimpleNamespace
+
+from tornado.httpclient import AsyncHTTPClient, HTTPRequest
 
 from qtoggleserver import persist
 from qtoggleserver.conf import settings
+from qtoggleserver.core import api as core_api
+from qtoggleserver.core import events as core_events
 from qtoggleserver.core import responses as core_responses
 from qtoggleserver.core.api import auth as core_api_auth
 from qtoggleserver.core.device import attrs as core_device_attrs
@@ -12,9 +19,13 @@ from qtoggleserver.core.typing import GenericJSONDict
 from qtoggleserver.utils import json as json_utils
 
 
+_AUTH_HEADER_MAX_AGE = 60  # how long to reuse a signed authorization header for, in seconds
+_STATS_LOG_INTERVAL = 300  # how often to log delivery statistics, in seconds
+
 logger = logging.getLogger(__name__)
 
 _webhooks: Webhooks | None = None
+_webhooks_event_handler: WebhooksEventHandler | None = None
 
 
 # TODO: add password support
@@ -31,10 +42,17 @@ class InvalidParamError(WebhooksError):
         super().__init__(f"Invalid field: {param}")
 
 
-class WebhooksRequest:
-    def __init__(self, body: GenericJSONDict) -> None:
-        self.body: GenericJSONDict = body
-        self.retries: int = 0
+class WebhooksEventHandler(core_events.Handler):
+    def __init__(self) -> None:
+        super().__init__(name="webhooks")
+
+    async def handle_event(self, event: core_events.Event) -> None:
+        # Webhooks are authenticated as the normal user
+        if event.REQUIRED_ACCESS > core_api.ACCESS_LEVEL_NORMAL:
+            return
+
+        if _webhooks and _webhooks.is_enabled():
+            _webhooks.call(await event.to_json_fragment())
 
 
 class Webhooks:
@@ -59,7 +77,18 @@ class Webhooks:
         self._retries: int | None = retries
         self._url: str | None = None
 
-        self._queue: queue.Queue = queue.Queue(settings.core.event_queue_size)
+        # Encoded bodies of events waiting to be delivered, oldest first
+        self._queue: deque[str] = deque()
+        self._queue_event: asyncio.Event = asyncio.Event()
+        self._workers: list[asyncio.Task] = []
+        self._http_client: AsyncHTTPClient | None = None
+
+        self._auth_header: str | None = None
+        self._auth_header_time: float = 0
+        self._auth_header_password_hash: str | None = None
+
+        self._stats: dict[str, int] = {"sent": 0, "failed": 0, "retried": 0, "dropped": 0}
+        self._total_latency: float = 0
 
     def __str__(self) -> str:
         s = "webhooks"
@@ -83,6 +112,12 @@ class Webhooks:
 
         self._enabled = True
 
+        # Requests are limited by the number of workers, so the client doesn't need to queue any of them
+        concurrency = settings.webhooks.concurrency
+        self._http_client = AsyncHTTPClient(force_instance=True, max_clients=concurrency)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(concurrency)]
+        self._workers.append(asyncio.create_task(self._stats_logger()))
+
     def disable(self) -> None:
         if not self._enabled:
             return
@@ -91,9 +126,22 @@ class Webhooks:
 
         self._enabled = False
 
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+
+        if self._http_client:
+            self._http_client.close()
+            self._http_client = None
+
         # Drop all queued requests
-        while not self._queue.empty():
-            self._queue.get()
+        self._queue.clear()
+        self._queue_event.clear()
+
+    async def wait_stopped(self) -> None:
+        workers = self._workers
+        self.disable()
+        await asyncio.gather(*workers, return_exceptions=True)
 
     def get_url(self) -> str:
         if not self._url:
@@ -104,62 +152,112 @@ class Webhooks:
 
         return self._url
 
-    def call(self, body: GenericJSONDict) -> None:
-        if not self._enabled:
-            return None
+    def call(self, body: GenericJSONDict | str) -> None:
+        """Queue `body` for delivery. It may be a JSON dict or an already encoded one."""
 
-        request = WebhooksRequest(body)
+        if not self._enabled:
+            return
 
-        if self._queue.empty():
-            return self._request(request)
+        if not isinstance(body, str):
+            body = json_utils.dumps(body)
 
-        try:
-            self._queue.put(request)
-        except queue.Full:
+        if len(self._queue) >= settings.core.event_queue_size:
             logger.error("%s: queue is full", self)
+            self._stats["dropped"] += 1
+            return
 
-        return None
+        self._queue.append(body)
+        self._queue_event.set()
 
-    def _request(self, request: WebhooksRequest) -> None:
-        if not self._enabled:
-            return
+    def get_stats(self) -> dict[str, int | float]:
+        delivered = self._stats["sent"] + self._stats["failed"]
+
+        return {
+            "queue_size": len(self._queue),
+            **self._stats,
+            "avg_latency": round(self._total_latency / delivered * 1000) if delivered else 0,
+        }
+
+    async def _worker(self) -> None:
+        batch_size = settings.webhooks.batch_size
+        while True:
+            try:
+                await self._queue_event.wait()
+
+                # Let more events gather, so that they are sent in a single request
+                if batch_size > 1 and len(self._queue) < batch_size and settings.webhooks.batch_window:
+                    await asyncio.sleep(settings.webhooks.batch_window / 1000)
+
+                bodies = []
+                while self._queue and len(bodies) < batch_size:
+                    bodies.append(self._queue.popleft())
+                if not self._queue:
+                    self._queue_event.clear()
 
-        url = self.get_url()
-        body = json_utils.dumps(request.body)
+                if not bodies:
+                    continue  # another worker took them
 
-        def on_response(response: HTTPResponse) -> None:
+                if batch_size > 1:
+                    body = json_utils.join_encoded(bodies)
+                else:
+                    body = bodies[0]
+
+                await self._deliver(body, len(bodies))
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error("%s: worker error: %s", self, e, exc_info=True)
+
+    async def _stats_logger(self) -> None:
+        last_stats = self.get_stats()
+        while True:
             try:
-                core_responses.parse(response)
+                await asyncio.sleep(_STATS_LOG_INTERVAL)
+
+                # Only report when there has been some activity since the last report
+                stats = self.get_stats()
+                if stats != last_stats:
+                    logger.info("%s: stats: %s", self, json_utils.dumps(stats))
+                    last_stats = stats
+            except asyncio.CancelledError:
+                break
+
+    async def _deliver(self, body: str, count: int) -> None:
+        retries = 0
+        start_time = time.time()
+        while True:
+            try:
+                await self._request(body)
             except core_responses.Error as e:
                 logger.error("%s: call failed: %s", self, e)
 
-                # Retry mechanism
-                if not self._retries:
-                    return self._check_pending()
+                if not self._retries or retries >= self._retries:
+                    self._stats["failed"] += count
+                    self._total_latency += time.time() - start_time
+                    return
 
-                if request.retries <= self._retries:
-                    request.retries += 1
-                    logger.debug("%s: resending request (retry %s/%s)", self, request.retries, self._retries)
+                retries += 1
+                self._stats["retried"] += 1
 
-                    self._request(request)
-                else:
-                    self._check_pending()
+                # Exponential backoff with full jitter, so that failed requests don't retry in lockstep
+                backoff = min(settings.webhooks.retry_backoff * 2 ** (retries - 1), settings.webhooks.retry_backoff_max)
+                delay = random.uniform(0, backoff) / 1000
+                logger.debug("%s: resending request in %.3fs (retry %s/%s)", self, delay, retries, self._retries)
+                await asyncio.sleep(delay)
             else:
-                logger.debug("%s: call succeeded", self)
-                self._check_pending()
+                latency = time.time() - start_time
+                logger.debug("%s: call succeeded (%d events, %.3fs)", self, count, latency)
+                self._stats["sent"] += count
+                self._total_latency += latency
+                return
 
-            return None
-
-        http_client = AsyncHTTPClient()
-        # TODO use webhooks password
+    async def _request(self, body: str) -> None:
         headers = {
             "Content-Type": json_utils.JSON_CONTENT_TYPE,
-            "Authorization": core_api_auth.make_auth_header(
-                core_api_auth.ORIGIN_DEVICE, username=None, password_hash=core_device_attrs.normal_password_hash
-            ),
+            "Authorization": self._get_auth_header(),
         }
         request = HTTPRequest(
-            url,
+            self.get_url(),
             "POST",
             headers=headers,
             body=body,
@@ -170,15 +268,30 @@ class Webhooks:
 
         logger.debug("%s: calling", self)
 
-        http_client.fetch(request, callback=on_response)  # TODO implement me using await
-
-    def _check_pending(self) -> None:
         try:
-            request = self._queue.get(block=False)
-        except queue.Empty:
-            return
+            response = await self._http_client.fetch(request, raise_error=False)
+        except Exception as e:
+            # We need to catch exceptions here even though raise_error is False, because it only affects HTTP errors
+            response = SimpleNamespace(error=e, code=599)
 
-        self._request(request)
+        core_responses.parse(response)
+
+    def _get_auth_header(self) -> str:
+        # TODO use webhooks password
+        password_hash = core_device_attrs.normal_password_hash
+        now = time.time()
+        if (
+            self._auth_header is None
+            or password_hash != self._auth_header_password_hash
+            or now - self._auth_header_time > _AUTH_HEADER_MAX_AGE
+        ):
+            self._auth_header = core_api_auth.make_auth_header(
+                core_api_auth.ORIGIN_DEVICE, username=None, password_hash=password_hash
+            )
+            self._auth_header_time = now
+            self._auth_header_password_hash = password_hash
+
+        return self._auth_header
 
     def to_json(self) -> GenericJSONDict:
         d = {
@@ -244,9 +357,16 @@ async def reset() -> None:
 
 
 async def init() -> None:
+    global _webhooks_event_handler
+
     logger.debug("loading persisted data")
     await load()
 
+    _webhooks_event_handler = WebhooksEventHandler()
+    core_events.register_handler(_webhooks_event_handler)
+
 
 async def cleanup() -> None:
-    pass
+    if _webhooks:
+        logger.debug("stats: %s", json_utils.dumps(_webhooks.get_stats()))
+        await _webhooks.wait_stopped()
@@ -2,17 +2,20 @@ import copy
 import logging
 import operator
 import os
+import time
 
 from collections.abc import Iterable
-from typing import Any
+from typing import Any, BinaryIO
 
 from qtoggleserver.conf import settings
 from qtoggleserver.persist import BaseDriver
-from qtoggleserver.persist.typing import Id, Record
+from qtoggleserver.persist.typing import Id, Record, SampleValue
 from qtoggleserver.utils import json as json_utils
 
 
 DEFAULT_FILE_PATH = "qtoggleserver-data.json"
+DEFAULT_JOURNAL_MAX_SIZE = 1024 * 1024  # bytes
+DEFAULT_JOURNAL_COMPACT_INTERVAL = 3600  # seconds
 
 FILTER_OP_MAPPING = {
     "gt": operator.gt,
@@ -44,6 +47,9 @@ class JSONDriver(BaseDriver):
         file_path: str | None = DEFAULT_FILE_PATH,
         pretty_format: bool | None = None,
         use_backup: bool = True,
+        journal: bool = False,
+        journal_max_size: int = DEFAULT_JOURNAL_MAX_SIZE,
+        journal_compact_interval: int = DEFAULT_JOURNAL_COMPACT_INTERVAL,
         **kwargs,
     ) -> None:
         if file_path:
@@ -59,9 +65,26 @@ class JSONDriver(BaseDriver):
         self._pretty_format: bool = pretty_format
         self._use_backup: bool = use_backup
 
+        # In journal mode, mutations are appended to a journal file and only periodically folded into the data file
+        self._journal: bool = journal and bool(file_path)
+        self._journal_max_size: int = journal_max_size
+        self._journal_compact_interval: int = journal_compact_interval
+        self._journal_file: BinaryIO | None = None
+        self._journal_size: int = 0
+        self._last_compact_time: float = time.monotonic()
+
         self._data: IndexedData = self._index(self._load())
+        if self._journal and self._replay_journal():
+            self._compact()
+
         self._max_ids: dict[str, int] = self._compute_max_ids(self._data)
 
+    async def cleanup(self) -> None:
+        if self._journal and self._journal_size:
+            self._compact()
+
+        self._close_journal()
+
     async def query(
         self,
         collection: str,
@@ -129,13 +152,13 @@ class JSONDriver(BaseDriver):
 
         coll[id_] = record
 
-        self._save(self._unindex(self._data))
+        self._commit(collection, changed_ids=[id_])
 
         return id_
 
     async def update(self, collection: str, record_part: Record, filt: dict[str, Any]) -> int:
         coll = self._data.setdefault(collection, {})
-        modified_count = 0
+        modified_ids = []
 
         if isinstance(filt.get("id"), Id):
             filt = filt.copy()
@@ -144,7 +167,7 @@ class JSONDriver(BaseDriver):
             record = coll.get(id_)
             if record is not None:
                 record.update(record_part)
-                modified_count = 1
+                modified_ids.append(id_)
         else:  # no single specific id in filt
             for id_, record in coll.items():
                 # Apply filter criteria
@@ -153,11 +176,11 @@ class JSONDriver(BaseDriver):
 
                 # Actually update the record
                 record.update(record_part)
-                modified_count += 1
+                modified_ids.append(id_)
 
-        self._save(self._unindex(self._data))
+        self._commit(collection, changed_ids=modified_ids)
 
-        return modified_count
+        return len(modified_ids)
 
     async def replace(self, collection: str, id_: Id, record: Record) -> bool:
         coll = self._data.setdefault(collection, {})
@@ -171,13 +194,41 @@ class JSONDriver(BaseDriver):
         record["id"] = id_
         coll[id_] = record
 
-        self._save(self._unindex(self._data))
+        self._commit(collection, changed_ids=[id_])
 
         return True
 
+    async def replace_many(self, collection: str, records: dict[Id, Record]) -> None:
+        coll = self._data.setdefault(collection, {})
+
+        for id_, record in records.items():
+            # Never change record id with replace
+            coll[id_] = dict(record, id=id_)
+            try:
+                self._max_ids[collection] = max(self._max_ids.get(collection, 0), int(id_))
+            except ValueError, TypeError:
+                pass
+
+        self._commit(collection, changed_ids=list(records))
+
+    async def save_samples(self, collection: str, samples: list[tuple[Id, int, SampleValue]]) -> None:
+        coll = self._data.setdefault(collection, {})
+        next_id = self._max_ids.get(collection, 0)
+
+        ids = []
+        for obj_id, timestamp, value in samples:
+            next_id += 1
+            id_ = str(next_id)
+            coll[id_] = {"oid": obj_id, "val": value, "ts": timestamp, "id": id_}
+            ids.append(id_)
+
+        self._max_ids[collection] = next_id
+
+        self._commit(collection, changed_ids=ids)
+
     async def remove(self, collection: str, filt: dict[str, Any]) -> int:
         coll = self._data.setdefault(collection, {})
-        removed_count = 0
+        removed_ids = []
 
         if isinstance(filt.get("id"), Id):
             filt = filt.copy()
@@ -186,7 +237,7 @@ class JSONDriver(BaseDriver):
             record = coll.get(id_)
             if (record is not None) and self._filter_matches(record, filt):
                 coll.pop(id_)
-                removed_count = 1
+                removed_ids.append(id_)
         else:  # no single specific id in filt
             for id_, record in list(coll.items()):
                 # Apply filter criteria
@@ -195,11 +246,11 @@ class JSONDriver(BaseDriver):
 
                 # Actually remove the record
                 coll.pop(id_)
-                removed_count += 1
+                removed_ids.append(id_)
 
-        self._save(self._unindex(self._data))
+        self._commit(collection, removed_ids=removed_ids)
 
-        return removed_count
+        return len(removed_ids)
 
     def _filter_matches(self, record: Record, filt: dict[str, Any]) -> bool:
         for key, value in filt.items():
@@ -244,6 +295,101 @@ class JSONDriver(BaseDriver):
         path, ext = os.path.splitext(self._file_path)
         return f"{path}_backup{ext}"
 
+    def _get_journal_file_path(self) -> str | None:
+        if not self._file_path:
+            return None
+        path, ext = os.path.splitext(self._file_path)
+        return f"{path}_journal{ext}"
+
+    def _commit(
+        self, collection: str, changed_ids: list[Id] | None = None, removed_ids: list[Id] | None = None
+    ) -> None:
+        if not self._journal:
+            self._save(self._unindex(self._data))
+            return
+
+        if not changed_ids and not removed_ids:
+            return
+
+        # Journal the resulting state of affected records rather than the operation itself, so that replaying an
+        # entry more than once (e.g. after an interrupted compaction) yields the same data
+        entry: dict[str, Any] = {"collection": collection}
+        if changed_ids:
+            coll = self._data[collection]
+            entry["set"] = {id_: coll[id_] for id_ in changed_ids}
+        if removed_ids:
+            entry["remove"] = removed_ids
+
+        self._append_journal(entry)
+
+        if (self._journal_size >= self._journal_max_size) or (
+            time.monotonic() - self._last_compact_time >= self._journal_compact_interval
+        ):
+            self._compact()
+
+    def _append_journal(self, entry: dict[str, Any]) -> None:
+        if self._journal_file is None:
+            journal_file_path = self._get_journal_file_path()
+            logger.debug("opening journal %s", journal_file_path)
+            self._journal_file = open(journal_file_path, "ab")
+
+        line = json_utils.dumps(entry, extra_types=json_utils.ExtraTypes.EXTENDED).encode() + b"\n"
+        self._journal_file.write(line)
+        self._journal_file.flush()
+        self._journal_size += len(line)
+
+    def _close_journal(self) -> None:
+        if self._journal_file is not None:
+            self._journal_file.close()
+            self._journal_file = None
+
+    def _replay_journal(self) -> int:
+        journal_file_path = self._get_journal_file_path()
+        try:
+            with open(journal_file_path, "rb") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return 0
+
+        logger.debug("replaying journal %s", journal_file_path)
+
+        count = 0
+        for line in lines:
+            try:
+                entry = json_utils.loads(line, extra_types=json_utils.ExtraTypes.EXTENDED)
+            except Exception as e:
+                # Most likely a partially written entry, due to an unclean shutdown; nothing can follow it
+                logger.warning("ignoring invalid journal entry in %s: %s", journal_file_path, e)
+                break
+
+            coll = self._data.setdefault(entry["collection"], {})
+            for id_, record in entry.get("set", {}).items():
+                coll[id_] = record
+            for id_ in entry.get("remove", []):
+                coll.pop(id_, None)
+
+            count += 1
+
+        logger.debug("replayed %d journal entries", count)
+
+        # Return the number of journal lines, including any invalid ones, so that they are discarded by compaction
+        return len(lines)
+
+    def _compact(self) -> None:
+        logger.debug("compacting journal into %s", self._file_path)
+
+        # The data file is fully written before the journal is discarded; replaying a journal that has already been
+        # folded into the data file is harmless
+        self._save(self._unindex(self._data))
+        self._close_journal()
+
+        journal_file_path = self._get_journal_file_path()
+        if os.path.exists(journal_file_path):
+            os.remove(journal_file_path)
+
+        self._journal_size = 0
+        self._last_compact_time = time.monotonic()
+
     def _load(self) -> UnindexedData:
         if not self._file_path:
             return {}
@@ -1,7 +1,10 @@
+import asyncio
+import functools
 import logging
 import re
 
-from collections.abc import Iterable
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
 import bson
@@ -9,7 +12,7 @@ import pymongo.database
 import pymongo.errors
 
 from qtoggleserver.persist import BaseDriver
-from qtoggleserver.persist.typing import Id, Record
+from qtoggleserver.persist.typing import Id, Record, Sample, SampleValue
 
 
 logger = logging.getLogger(__name__)
@@ -18,10 +21,20 @@ _OBJECT_ID_RE = re.compile("^[0-9a-f]{24}$")
 DEFAULT_DB = "qtoggleserver"
 
 FILTER_OP_MAPPING = {"gt": "$gt", "ge": "$gte", "lt": "$lt", "le": "$lte", "in": "$in"}
+SAMPLE_AGG_MAPPING = {
+    "min": {"$min": "$val"},
+    "max": {"$max": "$val"},
+    "avg": {"$avg": "$val"},
+    "first": {"$first": "$val"},
+    "last": {"$last": "$val"},
+    "count": {"$sum": 1},
+}
 
 
 class MongoDriver(BaseDriver):
-    def __init__(self, host: str = "127.0.0.1", port: int = 27017, db: str = DEFAULT_DB, **kwargs) -> None:
+    def __init__(
+        self, host: str = "127.0.0.1", port: int = 27017, db: str = DEFAULT_DB, max_workers: int = 4, **kwargs
+    ) -> None:
         self._host: str = host
         self._port: int = port
         self._db_name: str = db
@@ -29,6 +42,9 @@ class MongoDriver(BaseDriver):
         self._client: pymongo.MongoClient | None = None
         self._db: pymongo.database.Database | None = None
 
+        # Blocking pymongo calls are offloaded to a bounded pool of threads, keeping the event loop responsive
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mongo")
+
     async def init(self) -> None:
         logger.debug("connecting to %s:%s/%s", self._host, self._port, self._db_name)
         self._client = pymongo.MongoClient(self._host, self._port, serverSelectionTimeoutMS=200, connectTimeoutMS=200)
@@ -37,7 +53,8 @@ class MongoDriver(BaseDriver):
     async def cleanup(self) -> None:
         logger.debug("disconnecting mongo client")
 
-        self._client.close()
+        await self._run(self._client.close)
+        self._executor.shutdown(wait=False)
 
     async def query(
         self,
@@ -69,14 +86,17 @@ class MongoDriver(BaseDriver):
         if limit is not None:
             q = q.limit(limit)
 
-        return self._query_gen_wrapper(q)
+        # Iterating the cursor is what actually talks to the server
+        return self._query_gen_wrapper(await self._run(list, q))
 
     async def insert(self, collection: str, record: Record) -> Id:
         record = record.copy()
         if "id" in record:
             record["_id"] = self._id_to_db(record.pop("id"))
 
-        return self._id_from_db(self._db[collection].insert_one(record).inserted_id)
+        result = await self._run(self._db[collection].insert_one, record)
+
+        return self._id_from_db(result.inserted_id)
 
     async def update(self, collection: str, record_part: Record, filt: dict[str, Any]) -> int:
         if "id" in record_part:
@@ -89,16 +109,37 @@ class MongoDriver(BaseDriver):
 
         db_filt = self._filt_to_db(filt)
 
-        return self._db[collection].update_many(db_filt, {"$set": record_part}, upsert=False).modified_count
+        result = await self._run(self._db[collection].update_many, db_filt, {"$set": record_part}, upsert=False)
+
+        return result.modified_count
 
     async def replace(self, collection: str, id_: Id, record: Record) -> bool:
         record = record.copy()
         id_ = self._id_to_db(id_)
         record["_id"] = id_
 
-        matched = self._db[collection].replace_one({"_id": id_}, record, upsert=False).matched_count
+        result = await self._run(self._db[collection].replace_one, {"_id": id_}, record, upsert=False)
+
+        return result.matched_count > 0
+
+    async def replace_many(self, collection: str, records: dict[Id, Record]) -> None:
+        if not records:
+            return
 
-        return matched > 0
+        db_records = []
+        for id_, record in records.items():
+            record = record.copy()
+            record.pop("id", None)
+            record["_id"] = self._id_to_db(id_)
+            db_records.append(record)
+
+        await self._run(self._replace_records, collection, db_records)
+
+    def _replace_records(self, collection: str, db_records: list[Record]) -> None:
+        # Replace (or insert) each record on its own, within a single worker job, so that a failure leaves the
+        # remaining records in place
+        for db_record in db_records:
+            self._db[collection].replace_one({"_id": db_record["_id"]}, db_record, upsert=True)
 
     async def remove(self, collection: str, filt: dict[str, Any]) -> int:
         if "id" in filt:
@@ -107,7 +148,94 @@ class MongoDriver(BaseDriver):
 
         db_filt = self._filt_to_db(filt)
 
-        return self._db[collection].delete_many(db_filt).deleted_count
+        result = await self._run(self._db[collection].delete_many, db_filt)
+
+        return result.deleted_count
+
+    async def get_samples_buckets(
+        self,
+        collection: str,
+        obj_id: Id,
+        from_timestamp: int | None,
+        to_timestamp: int | None,
+        bucket: int,
+        agg: str,
+        limit: int | None,
+    ) -> Iterable[Sample]:
+        filt: dict[str, Any] = {"oid": obj_id}
+        if from_timestamp is not None:
+            filt.setdefault("ts", {})["$gte"] = from_timestamp
+        if to_timestamp is not None:
+            filt.setdefault("ts", {})["$lt"] = to_timestamp
+
+        # Samples must be sorted for the first/last accumulators
+        pipeline = [
+            {"$match": filt},
+            {"$sort": {"ts": pymongo.ASCENDING}},
+            {
+                "$group": {
+                    "_id": {"$subtract": ["$ts", {"$mod": ["$ts", bucket]}]},
+                    "val": SAMPLE_AGG_MAPPING[agg],
+                }
+            },
+            {"$sort": {"_id": pymongo.ASCENDING}},
+        ]
+        if limit is not None:
+            pipeline.append({"$limit": limit})
+
+        results = await self._run(lambda: list(self._db[collection].aggregate(pipeline)))
+
+        return [(int(r["_id"]), r["val"]) for r in results]
+
+    async def get_samples_by_timestamp(
+        self,
+        collection: str,
+        obj_id: Id,
+        timestamps: list[int],
+    ) -> Iterable[SampleValue]:
+        if not timestamps:
+            return []
+
+        coll = self._db[collection]
+        min_timestamp = min(timestamps)
+        max_timestamp = max(timestamps)
+
+        # Samples older than the latest one at or before the earliest timestamp are irrelevant; an indexed lookup tells
+        # where to start scanning from
+        first = await self._run(
+            coll.find_one,
+            {"oid": obj_id, "ts": {"$lte": min_timestamp}},
+            {"_id": 0, "ts": 1},
+            sort=[("ts", pymongo.DESCENDING)],
+        )
+        start_timestamp = first["ts"] if first else min_timestamp
+
+        # Group the relevant samples into buckets delimited by the requested timestamps, keeping only the latest value
+        # of each bucket, with a single aggregation pipeline
+        boundaries = [start_timestamp] + sorted({t + 1 for t in timestamps})
+        pipeline = [
+            {"$match": {"oid": obj_id, "ts": {"$gte": start_timestamp, "$lte": max_timestamp}}},
+            {"$sort": {"ts": pymongo.ASCENDING}},
+            {"$bucket": {"groupBy": "$ts", "boundaries": boundaries, "output": {"val": {"$last": "$val"}}}},
+        ]
+        buckets = await self._run(lambda: list(coll.aggregate(pipeline)))
+        values_by_bucket = {b["_id"]: b["val"] for b in buckets}
+
+        # The sample at or before a timestamp is the latest value of the last non-empty bucket ending right after it
+        values_by_end = {}
+        value = None
+        for i in range(1, len(boundaries)):
+            value = values_by_bucket.get(boundaries[i - 1], value)
+            values_by_end[boundaries[i]] = value
+
+        return [values_by_end[t + 1] for t in timestamps]
+
+    async def save_samples(self, collection: str, samples: list[tuple[Id, int, SampleValue]]) -> None:
+        if not samples:
+            return
+
+        records = [{"oid": obj_id, "val": value, "ts": timestamp} for obj_id, timestamp, value in samples]
+        await self._run(self._db[collection].insert_many, records, ordered=False)
 
     def is_samples_supported(self) -> bool:
         return True
@@ -116,13 +244,18 @@ class MongoDriver(BaseDriver):
         if index:
             index = [(f, [pymongo.ASCENDING, pymongo.DESCENDING][r]) for f, r in index]
         else:  # assuming samples collection
-            index = [("ts", pymongo.ASCENDING)]
+            index = [("oid", pymongo.ASCENDING), ("ts", pymongo.ASCENDING)]
 
         try:
-            self._db[collection].create_index(index)
+            await self._run(self._db[collection].create_index, index)
         except pymongo.errors.DuplicateKeyError:
             pass
 
+    async def _run(self, func: Callable, *args, **kwargs) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs)
+        )
+
     @classmethod
     def _query_gen_wrapper(cls, q: Iterable[Record]) -> Iterable[Record]:
         for r in q:
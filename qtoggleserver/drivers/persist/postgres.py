@@ -21,6 +21,14 @@ POOL_MAX_CONNECTIONS = 4
 POOL_MAX_QUERIES = 256
 
 FILTER_OP_MAPPING = {"gt": ">", "ge": ">=", "lt": "<", "le": "<=", "in": "in"}
+SAMPLE_AGG_MAPPING = {
+    "min": "MIN(val)",
+    "max": "MAX(val)",
+    "avg": "AVG(val)",
+    "first": "(ARRAY_AGG(val ORDER BY ts))[1]",
+    "last": "(ARRAY_AGG(val ORDER BY ts DESC))[1]",
+    "count": "COUNT(val)",
+}
 
 D_FMT = "__{:04d}-{:02d}-{:02d}T"
 D_FMT_LEN = 13
@@ -141,6 +149,21 @@ class PostgresDriver(BaseDriver):
 
         return count > 0
 
+    async def replace_many(self, collection: str, records: dict[Id, Record]) -> None:
+        await self._ensure_table_exists(collection)
+
+        statement = (
+            f"INSERT INTO {collection}(id, content) VALUES($1, $2) "
+            "ON CONFLICT (id) DO UPDATE SET content = EXCLUDED.content"
+        )
+        params_list = []
+        for id_, record in records.items():
+            db_record = self._record_to_db(record)
+            db_record.pop("id", None)
+            params_list.append([id_, db_record])
+
+        await self._execute_many(statement, params_list)
+
     async def remove(self, collection: str, filt: dict[str, Any]) -> int:
         await self._ensure_table_exists(collection)
 
@@ -197,33 +220,66 @@ class PostgresDriver(BaseDriver):
 
         return ((r[0], r[1]) for r in results)
 
+    async def get_samples_buckets(
+        self,
+        collection: str,
+        obj_id: Id,
+        from_timestamp: int | None,
+        to_timestamp: int | None,
+        bucket: int,
+        agg: str,
+        limit: int | None,
+    ) -> Iterable[Sample]:
+        await self._ensure_table_exists(collection, for_samples=True)
+
+        filt: dict[str, Any] = {
+            "oid": obj_id,
+        }
+
+        if from_timestamp is not None:
+            filt.setdefault("ts", {})["ge"] = from_timestamp
+
+        if to_timestamp is not None:
+            filt.setdefault("ts", {})["lt"] = to_timestamp
+
+        params = [bucket]
+        where_clause = self._filt_to_where_clause(self._filt_to_db(filt), params, for_samples=True)
+        agg_expr = SAMPLE_AGG_MAPPING[agg]
+        query = f"SELECT ts - ts % $1::BIGINT AS bucket, {agg_expr} FROM {collection} WHERE {where_clause}"
+        query += " GROUP BY bucket ORDER BY bucket"
+
+        if limit is not None:
+            query += f" LIMIT ${len(params) + 1}"
+            params.append(limit)
+
+        results = await self._execute_query(query, params)
+
+        return ((r[0], r[1]) for r in results)
+
     async def get_samples_by_timestamp(
         self,
         collection: str,
         obj_id: Id,
         timestamps: list[int],
     ) -> Iterable[SampleValue]:
-        # `await self._ensure_table_exists(collection)` is called by `get_samples_slice()` below.
+        await self._ensure_table_exists(collection, for_samples=True)
 
-        query_tasks = []
-        for timestamp in timestamps:
-            task = self.get_samples_slice(
-                collection, obj_id, from_timestamp=None, to_timestamp=timestamp + 1, limit=1, sort_desc=True
-            )
-            query_tasks.append(task)
+        if not timestamps:
+            return []
 
-        task_results = await asyncio.gather(*query_tasks)
+        # Look up the latest sample at or before each timestamp in a single query; with an index on (oid, ts), each
+        # lateral subquery is an index probe
+        query = (
+            "SELECT s.val FROM UNNEST($2::BIGINT[]) WITH ORDINALITY AS t(ts, i) "
+            "LEFT JOIN LATERAL ("
+            f"SELECT val FROM {collection} WHERE oid = $1 AND ts <= t.ts ORDER BY ts DESC LIMIT 1"
+            ") s ON TRUE "
+            "ORDER BY t.i"
+        )
 
-        samples = []
-        for i, task_result in enumerate(task_results):
-            query_results = list(task_result)
-            if query_results:
-                sample = query_results[0][1]
-                samples.append(sample)
-            else:
-                samples.append(None)
+        results = await self._execute_query(query, [obj_id, timestamps])
 
-        return samples
+        return [r[0] for r in results]
 
     async def save_sample(self, collection: str, obj_id: Id, timestamp: int, value: SampleValue) -> None:
         await self._ensure_table_exists(collection, for_samples=True)
@@ -236,6 +292,18 @@ class PostgresDriver(BaseDriver):
 
         await self._execute_statement(statement, params)
 
+    async def save_samples(self, collection: str, samples: list[tuple[Id, int, SampleValue]]) -> None:
+        await self._ensure_table_exists(collection, for_samples=True)
+
+        if not samples:
+            return
+
+        records = [(obj_id, timestamp, float(value)) for obj_id, timestamp, value in samples]
+
+        # Binary COPY is the fastest way of bulk-loading rows
+        async with await self._acquire_connection() as conn:
+            await conn.copy_records_to_table(collection, records=records, columns=["oid", "ts", "val"])
+
     async def remove_samples(
         self,
         collection: str,
@@ -271,7 +339,7 @@ class PostgresDriver(BaseDriver):
         # A missing `index` specification indicates an index on samples.
         for_samples = False
         if not index:
-            index = [("ts", False)]
+            index = [("oid", False), ("ts", False)]
             for_samples = True
 
         await self._ensure_table_exists(collection, for_samples=for_samples)
@@ -282,13 +350,17 @@ class PostgresDriver(BaseDriver):
 
         params = []
         if for_samples:
-            index_statement = "ts"
+            index_statement = "oid, ts"
         else:
             index_statement = self._index_to_index_clause(index, params)
         statement = f"CREATE INDEX IF NOT EXISTS {index_name} ON {collection}({index_statement})"
 
         await self._execute_statement(statement, params)
 
+        if for_samples:
+            # Older versions indexed samples on timestamp alone; that index only slows down inserts now
+            await self._execute_statement(f"DROP INDEX IF EXISTS {collection}_ts")
+
     async def cleanup(self) -> None:
         logger.debug("disconnecting client")
 
@@ -372,6 +444,11 @@ class PostgresDriver(BaseDriver):
                 else:
                     return stmt.get_statusmsg(), []
 
+    async def _execute_many(self, statement: str, params_list: list[Iterable[Any]]) -> None:
+        async with await self._acquire_connection() as conn:
+            async with conn.transaction():
+                await conn.executemany(statement, params_list)
+
     @staticmethod
     def _fields_to_select_clause(fields: list[str], params: list[Any]) -> str:
         select_clause = []
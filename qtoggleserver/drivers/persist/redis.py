@@ -5,10 +5,11 @@ from collections.abc import Iterable
 from typing import Any
 
 import redis
+import redis.asyncio
 
 from qtoggleserver.core.typing import GenericJSONDict
 from qtoggleserver.persist import BaseDriver
-from qtoggleserver.persist.typing import Id, Record
+from qtoggleserver.persist.typing import Id, Record, Sample, SampleValue
 from qtoggleserver.utils import json as json_utils
 
 
@@ -20,6 +21,9 @@ FILTER_OP_MAPPING = {
     "in": lambda a, b: a in b,
 }
 
+# How many set members to ask for with each scan round trip
+_SCAN_COUNT = 1000
+
 logger = logging.getLogger(__name__)
 
 
@@ -29,15 +33,22 @@ class DuplicateRecordId(redis.RedisError):
 
 class RedisDriver(BaseDriver):
     def __init__(
-        self, host: str = "127.0.0.1", port: int = 6379, db: int = 0, samples_support: bool = False, **kwargs
+        self,
+        host: str = "127.0.0.1",
+        port: int = 6379,
+        db: int = 0,
+        max_connections: int = 10,
+        samples_support: bool = True,
+        **kwargs,
     ) -> None:
         logger.debug("connecting to %s:%s/%s", host, port, db)
 
-        self._client: redis.Redis = redis.StrictRedis(
-            host=host, port=port, db=db, encoding="utf8", decode_responses=True
+        self._client: redis.asyncio.Redis = redis.asyncio.Redis(
+            host=host, port=port, db=db, max_connections=max_connections, encoding="utf8", decode_responses=True
         )
 
         self._samples_support: bool = samples_support
+        self._migrated_samples_collections: set[str] = set()
 
     async def query(
         self,
@@ -52,19 +63,15 @@ class RedisDriver(BaseDriver):
         if isinstance(filt.get("id"), Id):  # look for specific record id
             filt = filt.copy()
             id_ = filt.pop("id")
-            db_record = self._client.hgetall(self._make_record_key(collection, id_))
+            db_record = await self._client.hgetall(self._make_record_key(collection, id_))
 
             # Apply filter criteria
             if db_record and self._filter_matches(db_record, filt):
                 db_record["id"] = id_
                 db_records.append(db_record)
         else:  # no single specific id in filt
-            # Look through all records from this collection, iterating through set
-            for id_ in self._client.sscan_iter(self._make_set_key(collection)):
-                # Retrieve the db record
-                db_record = self._client.hgetall(self._make_record_key(collection, id_))
-                db_record["id"] = id_
-
+            # Look through all records from this collection
+            for db_record in await self._get_all_db_records(collection):
                 # Apply filter criteria
                 if self._filter_matches(db_record, filt):
                     db_records.append(db_record)
@@ -92,24 +99,26 @@ class RedisDriver(BaseDriver):
         record = record.copy()
         id_ = record.pop("id", None)
         if id_ is None:
-            id_ = self._get_next_id(collection)
+            id_ = await self._get_next_id(collection)
 
         key = self._make_record_key(collection, id_)
         set_key = self._make_set_key(collection)
 
         # Check for duplicates
-        if self._client.sismember(set_key, id_):
+        if await self._client.sismember(set_key, id_):
             raise DuplicateRecordId(id_)
 
         # Adapt the record to db
         db_record = self._record_to_db(record)
 
-        # Actually insert the record, but only if it's not empty
-        if db_record:
-            self._client.hset(key, mapping=db_record)
+        async with self._client.pipeline(transaction=True) as pipeline:
+            # Actually insert the record, but only if it's not empty
+            if db_record:
+                pipeline.hset(key, mapping=db_record)
 
-        # Add the id to set
-        self._client.sadd(set_key, id_)
+            # Add the id to set
+            pipeline.sadd(set_key, id_)
+            await pipeline.execute()
 
         return id_
 
@@ -125,32 +134,30 @@ class RedisDriver(BaseDriver):
             key = self._make_record_key(collection, id_)
 
             # Retrieve the db record
-            db_record = self._client.hgetall(key)
+            db_record = await self._client.hgetall(key)
             if db_record and self._filter_matches(db_record, filt):
-                self._client.hset(key, mapping=db_record_part)
+                await self._client.hset(key, mapping=db_record_part)
                 modified_count = 1
 
         else:  # no single specific id in filt
-            # Look through all records from this collection, iterating through set
-            for id_ in self._client.sscan_iter(self._make_set_key(collection)):
-                key = self._make_record_key(collection, id_)
+            async with self._client.pipeline(transaction=True) as pipeline:
+                # Look through all records from this collection
+                for db_record in await self._get_all_db_records(collection):
+                    # Apply filter criteria
+                    if not self._filter_matches(db_record, filt):
+                        continue
 
-                # Retrieve the db record
-                db_record = self._client.hgetall(key)
-                db_record["id"] = id_
-
-                # Apply filter criteria
-                if not self._filter_matches(db_record, filt):
-                    continue
+                    # Actually update the record
+                    key = self._make_record_key(collection, db_record["id"])
+                    if db_record_part:
+                        pipeline.hset(key, mapping=db_record_part)
 
-                # Actually update the record
-                if db_record_part:
-                    self._client.hset(key, mapping=db_record_part)
+                    else:
+                        pipeline.delete(key)
 
-                else:
-                    self._client.delete(key)
+                    modified_count += 1
 
-                modified_count += 1
+                await pipeline.execute()
 
         return modified_count
 
@@ -162,21 +169,40 @@ class RedisDriver(BaseDriver):
         skey = self._make_set_key(collection)
         key = self._make_record_key(collection, id_)
 
-        if not self._client.sismember(skey, id_):
+        if not await self._client.sismember(skey, id_):
             return False  # no record found, no replacing
 
-        # Remove existing record
-        self._client.delete(key)
+        async with self._client.pipeline(transaction=True) as pipeline:
+            # Remove existing record
+            pipeline.delete(key)
 
-        # Insert the new record, if not empty
-        if new_db_record:
-            self._client.hset(key, mapping=new_db_record)
+            # Insert the new record, if not empty
+            if new_db_record:
+                pipeline.hset(key, mapping=new_db_record)
 
-        # Make sure the id is present in set
-        self._client.sadd(skey, id_)
+            # Make sure the id is present in set
+            pipeline.sadd(skey, id_)
+            await pipeline.execute()
 
         return True
 
+    async def replace_many(self, collection: str, records: dict[Id, Record]) -> None:
+        skey = self._make_set_key(collection)
+
+        # Replace all records in a single transaction
+        async with self._client.pipeline(transaction=True) as pipeline:
+            for id_, record in records.items():
+                new_db_record = self._record_to_db(record)
+                new_db_record.pop("id", None)  # never add the id together with other fields
+
+                key = self._make_record_key(collection, id_)
+                pipeline.delete(key)
+                if new_db_record:
+                    pipeline.hset(key, mapping=new_db_record)
+                pipeline.sadd(skey, id_)
+
+            await pipeline.execute()
+
     async def remove(self, collection: str, filt: dict[str, Any]) -> int:
         removed_count = 0
 
@@ -184,53 +210,190 @@ class RedisDriver(BaseDriver):
             filt = filt.copy()
             id_ = filt.pop("id")
             key = self._make_record_key(collection, id_)
-            db_record = self._client.hgetall(key)
+            db_record = await self._client.hgetall(key)
 
-            # Actually remove the record
-            if db_record and self._filter_matches(db_record, filt):
-                self._client.delete(key)
-                removed_count = 1
+            async with self._client.pipeline(transaction=True) as pipeline:
+                # Actually remove the record
+                if db_record and self._filter_matches(db_record, filt):
+                    pipeline.delete(key)
+                    removed_count = 1
 
-            # Remove the id from set
-            self._client.srem(self._make_set_key(collection), id_)
+                # Remove the id from set
+                pipeline.srem(self._make_set_key(collection), id_)
+                await pipeline.execute()
 
         else:  # no single specific id in filt
-            ids_to_remove = set()
+            ids_to_remove = []
 
-            # Look through all records from this collection, iterating through set
-            for id_ in self._client.sscan_iter(self._make_set_key(collection)):
-                key = self._make_record_key(collection, id_)
+            # Look through all records from this collection
+            for db_record in await self._get_all_db_records(collection):
+                # Apply filter criteria
+                if self._filter_matches(db_record, filt):
+                    ids_to_remove.append(db_record["id"])
 
-                # Retrieve the db record
-                db_record = self._client.hgetall(key)
-                db_record["id"] = id_
+            if ids_to_remove:
+                async with self._client.pipeline(transaction=True) as pipeline:
+                    # Actually remove the records
+                    pipeline.delete(*(self._make_record_key(collection, id_) for id_ in ids_to_remove))
 
-                # Apply filter criteria
-                if not self._filter_matches(db_record, filt):
-                    continue
+                    # Remove the ids from set
+                    pipeline.srem(self._make_set_key(collection), *ids_to_remove)
+                    await pipeline.execute()
 
-                # Actually remove the record
-                self._client.delete(key)
+            removed_count = len(ids_to_remove)
 
-                # Remember ids to remove from set
-                ids_to_remove.add(id_)
+        return removed_count
 
-                removed_count += 1
+    async def get_samples_slice(
+        self,
+        collection: str,
+        obj_id: Id,
+        from_timestamp: int | None,
+        to_timestamp: int | None,
+        limit: int | None,
+        sort_desc: bool,
+    ) -> Iterable[Sample]:
+        await self._migrate_samples(collection)
 
-            # Remove the ids from set
-            for id_ in ids_to_remove:
-                self._client.srem(self._make_set_key(collection), id_)
+        key = self._make_samples_key(collection, obj_id)
+        min_score = from_timestamp if from_timestamp is not None else "-inf"
+        max_score = f"({to_timestamp}" if to_timestamp is not None else "+inf"  # exclusive upper bound
+        start, num = (0, limit) if limit is not None else (None, None)
 
-        return removed_count
+        if sort_desc:
+            members = await self._client.zrevrangebyscore(key, max_score, min_score, start=start, num=num)
+        else:
+            members = await self._client.zrangebyscore(key, min_score, max_score, start=start, num=num)
+
+        return [self._sample_from_db(m) for m in members]
+
+    async def get_samples_by_timestamp(
+        self,
+        collection: str,
+        obj_id: Id,
+        timestamps: list[int],
+    ) -> Iterable[SampleValue]:
+        await self._migrate_samples(collection)
+
+        key = self._make_samples_key(collection, obj_id)
+
+        # Look up the latest sample at or before each timestamp, all in a single round trip
+        async with self._client.pipeline(transaction=False) as pipeline:
+            for timestamp in timestamps:
+                pipeline.zrevrangebyscore(key, timestamp, "-inf", start=0, num=1)
+            results = await pipeline.execute()
+
+        return [self._sample_from_db(members[0])[1] if members else None for members in results]
+
+    async def save_sample(self, collection: str, obj_id: Id, timestamp: int, value: SampleValue) -> None:
+        await self._migrate_samples(collection)
+
+        async with self._client.pipeline(transaction=True) as pipeline:
+            pipeline.zadd(self._make_samples_key(collection, obj_id), {self._sample_to_db(timestamp, value): timestamp})
+            pipeline.sadd(self._make_samples_set_key(collection), obj_id)
+            await pipeline.execute()
+
+    async def save_samples(self, collection: str, samples: list[tuple[Id, int, SampleValue]]) -> None:
+        if not samples:
+            return
+
+        await self._migrate_samples(collection)
+
+        async with self._client.pipeline(transaction=True) as pipeline:
+            for obj_id, timestamp, value in samples:
+                pipeline.zadd(
+                    self._make_samples_key(collection, obj_id), {self._sample_to_db(timestamp, value): timestamp}
+                )
+            pipeline.sadd(self._make_samples_set_key(collection), *{obj_id for obj_id, _, _ in samples})
+            await pipeline.execute()
+
+    async def remove_samples(
+        self,
+        collection: str,
+        obj_ids: list[Id] | None,
+        from_timestamp: int | None,
+        to_timestamp: int | None,
+    ) -> int:
+        await self._migrate_samples(collection)
+
+        if obj_ids is None:
+            obj_ids = list(await self._client.smembers(self._make_samples_set_key(collection)))
+
+        if not obj_ids:
+            return 0
+
+        min_score = from_timestamp if from_timestamp is not None else "-inf"
+        max_score = f"({to_timestamp}" if to_timestamp is not None else "+inf"  # exclusive upper bound
+
+        async with self._client.pipeline(transaction=True) as pipeline:
+            for obj_id in obj_ids:
+                pipeline.zremrangebyscore(self._make_samples_key(collection, obj_id), min_score, max_score)
+            results = await pipeline.execute()
+
+        return sum(results)
 
     async def cleanup(self) -> None:
         logger.debug("disconnecting redis client")
 
-        self._client.close()
+        await self._client.aclose()
 
     def is_samples_supported(self) -> bool:
         return self._samples_support
 
+    async def _migrate_samples(self, collection: str) -> None:
+        # Samples used to be stored as regular records, with `oid`, `ts` and `val` fields; move any such records into
+        # the per-object sorted sets, once per collection
+        if collection in self._migrated_samples_collections:
+            return
+
+        self._migrated_samples_collections.add(collection)
+
+        db_records = await self._get_all_db_records(collection)
+        if not db_records:
+            return
+
+        async with self._client.pipeline(transaction=True) as pipeline:
+            obj_ids = set()
+            ids = []
+            for db_record in db_records:
+                record = self._record_from_db(db_record)
+                if "oid" not in record or "ts" not in record:
+                    continue
+
+                obj_id = record["oid"]
+                timestamp = record["ts"]
+                pipeline.zadd(
+                    self._make_samples_key(collection, obj_id),
+                    {self._sample_to_db(timestamp, record.get("val")): timestamp},
+                )
+                obj_ids.add(obj_id)
+                ids.append(record["id"])
+
+            if ids:
+                pipeline.sadd(self._make_samples_set_key(collection), *obj_ids)
+                pipeline.delete(*(self._make_record_key(collection, id_) for id_ in ids))
+                pipeline.srem(self._make_set_key(collection), *ids)
+                await pipeline.execute()
+
+        if ids:
+            logger.info("migrated %d samples of %s", len(ids), collection)
+
+    async def _get_all_db_records(self, collection: str) -> list[GenericJSONDict]:
+        ids = [id_ async for id_ in self._client.sscan_iter(self._make_set_key(collection), count=_SCAN_COUNT)]
+        if not ids:
+            return []
+
+        # Retrieve all records in a single round trip
+        async with self._client.pipeline(transaction=False) as pipeline:
+            for id_ in ids:
+                pipeline.hgetall(self._make_record_key(collection, id_))
+            db_records = await pipeline.execute()
+
+        for id_, db_record in zip(ids, db_records):
+            db_record["id"] = id_
+
+        return db_records
+
     def _filter_matches(self, db_record: GenericJSONDict, filt: dict[str, Any]) -> bool:
         for key, value in filt.items():
             try:
@@ -261,8 +424,8 @@ class RedisDriver(BaseDriver):
         else:  # assuming simple value
             return record_value == filt_value
 
-    def _get_next_id(self, collection: str) -> Id:
-        return str(self._client.incr(self._make_sequence_key(collection)))
+    async def _get_next_id(self, collection: str) -> Id:
+        return str(await self._client.incr(self._make_sequence_key(collection)))
 
     @classmethod
     def _record_from_db(cls, db_record: GenericJSONDict, fields: set[str] | None = None) -> Record:
@@ -284,6 +447,16 @@ class RedisDriver(BaseDriver):
     def _value_from_db(value: str) -> Any:
         return json_utils.loads(value, extra_types=json_utils.ExtraTypes.EXTENDED)
 
+    @classmethod
+    def _sample_to_db(cls, timestamp: int, value: SampleValue) -> str:
+        # Prefix values with their timestamp, so that equal values at different moments are distinct set members
+        return f"{timestamp}:{cls._value_to_db(value)}"
+
+    @classmethod
+    def _sample_from_db(cls, member: str) -> Sample:
+        timestamp, value = member.split(":", 1)
+        return int(timestamp), cls._value_from_db(value)
+
     @staticmethod
     def _make_record_key(collection: str, id_: Id) -> str:
         if id_:
@@ -299,3 +472,11 @@ class RedisDriver(BaseDriver):
     @staticmethod
     def _make_sequence_key(collection: str) -> str:
         return f"{collection}-id-sequence"
+
+    @staticmethod
+    def _make_samples_key(collection: str, obj_id: Id) -> str:
+        return f"{collection}:{obj_id}-samples"
+
+    @staticmethod
+    def _make_samples_set_key(collection: str) -> str:
+        return f"{collection}-samples-oid-set"
@@ -1,3 +1,5 @@
+from collections.abc import Hashable
+
 from qtoggleserver.core import api as core_api
 from qtoggleserver.core import events as core_events
 from qtoggleserver.core.typing import GenericJSONDict, GenericJSONList
@@ -15,10 +17,10 @@ class FrontendEvent(core_events.Event):
 
         return result
 
-    def is_duplicate(self, event: core_events.Event) -> bool:
+    def get_dedup_key(self) -> Hashable | None:
         if not self.request:
-            return False
-        return isinstance(event, self.__class__) and self.request.session_id == event.request.session_id
+            return None
+        return self._type, self.request.session_id
 
 
 class DashboardUpdateEvent(FrontendEvent):
@@ -1,3 +1,5 @@
+from collections.abc import Hashable
+
 from qtoggleserver.core import api as core_api
 from qtoggleserver.core import events as core_events
 from qtoggleserver.core.typing import GenericJSONDict
@@ -41,5 +43,5 @@ class PeripheralUpdate(PeripheralEvent):
     async def make_params(self) -> GenericJSONDict:
         return self.get_peripheral().to_json()
 
-    def is_duplicate(self, event: core_events.Event) -> bool:
-        return isinstance(event, self.__class__) and event.get_peripheral() == self.get_peripheral()
+    def get_dedup_key(self) -> Hashable | None:
+        return self._type, self.get_peripheral().get_id()
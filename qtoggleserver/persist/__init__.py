@@ -9,7 +9,7 @@ from qtoggleserver.utils import conf as conf_utils
 from qtoggleserver.utils import dynload as dynload_utils
 from qtoggleserver.utils import json as json_utils
 
-from .base import BaseDriver
+from .base import SAMPLE_AGGREGATIONS, BaseDriver  # noqa: F401
 from .typing import Id, Record, Sample, SampleValue
 
 
@@ -210,6 +210,21 @@ async def replace(collection: str, id_: Id, record: Record) -> bool:
         return True
 
 
+async def replace_many(collection: str, records: dict[Id, Record]) -> None:
+    """Replace each record given in `records` (indexed by id) in `collection`, inserting those that don't exist.
+
+    All records are written at once, if the driver supports it."""
+
+    if not records:
+        return
+
+    logger.debug("replacing %d records in %s", len(records), collection)
+
+    records = {id_: dict(record, id=id_) for id_, record in records.items()}  # make sure records contain the id field
+    driver = await _get_driver()
+    await driver.replace_many(collection, records)
+
+
 async def remove(collection: str, filt: dict[str, Any] | None = None) -> int:
     """Remove records from `collection`.
 
@@ -265,6 +280,39 @@ async def get_samples_slice(
     return await driver.get_samples_slice(collection, obj_id, from_timestamp, to_timestamp, limit, sort_desc)
 
 
+async def get_samples_buckets(
+    collection: str,
+    obj_id: Id,
+    from_timestamp: int | None,
+    to_timestamp: int | None,
+    bucket: int,
+    agg: str,
+    limit: int | None = None,
+) -> Iterable[Sample]:
+    """Return the samples of `obj_id` from `collection`, aggregated into buckets of `bucket` milliseconds, using `agg`
+    function (one of `SAMPLE_AGGREGATIONS`).
+
+    Filter samples by an interval of time, if `from_timestamp` and/or `to_timestamp` are not `None`.
+    `from_timestamp` is inclusive, while `to_timestamp` is exclusive.
+
+    Optionally limit results to `limit` number of buckets, if not `None`."""
+
+    if logger.getEffectiveLevel() <= logging.DEBUG:
+        logger.debug(
+            "getting %s of samples of object %s from %s between %s and %s in buckets of %s ms (limit=%s)",
+            agg,
+            obj_id,
+            collection,
+            json_utils.dumps(from_timestamp),
+            json_utils.dumps(to_timestamp),
+            bucket,
+            json_utils.dumps(limit),
+        )
+
+    driver = await _get_driver()
+    return await driver.get_samples_buckets(collection, obj_id, from_timestamp, to_timestamp, bucket, agg, limit)
+
+
 async def get_samples_by_timestamp(collection: str, obj_id: Id, timestamps: list[int]) -> Iterable[SampleValue]:
     """For each timestamp in `timestamps`, return the sample of `obj_id` from `collection` that was saved right
     before the (or at the exact) timestamp.
@@ -298,6 +346,20 @@ async def save_sample(collection: str, obj_id: Id, timestamp: int, value: Sample
     return await driver.save_sample(collection, obj_id, timestamp, value)
 
 
+async def save_samples(collection: str, samples: list[tuple[Id, int, SampleValue]]) -> None:
+    """Save several samples, given as `(obj_id, timestamp, value)` tuples, to a specified `collection`.
+
+    All samples are written at once, if the driver supports it."""
+
+    if not samples:
+        return
+
+    logger.debug("saving %d samples into %s", len(samples), collection)
+
+    driver = await _get_driver()
+    await driver.save_samples(collection, samples)
+
+
 async def remove_samples(
     collection: str,
     obj_ids: list[Id] | None = None,
@@ -7,6 +7,10 @@ from typing import Any
 from .typing import Id, Record, Sample, SampleValue
 
 
+# Functions that can be used to aggregate samples into buckets
+SAMPLE_AGGREGATIONS = ("min", "max", "avg", "first", "last", "count")
+
+
 class BaseDriver(metaclass=abc.ABCMeta):
     async def init(self) -> None:
         """Perform any initialization necessary to use this driver."""
@@ -68,6 +72,17 @@ class BaseDriver(metaclass=abc.ABCMeta):
 
         return False
 
+    async def replace_many(self, collection: str, records: dict[Id, Record]) -> None:
+        """Replace each record given in `records` (indexed by id) in `collection`, inserting those that don't exist.
+
+        Drivers should override this method to write all records at once (e.g. in a single transaction); this default
+        implementation simply replaces (or inserts) records one by one."""
+
+        for id_, record in records.items():
+            record = dict(record, id=id_)
+            if not await self.replace(collection, id_, record):
+                await self.insert(collection, record)
+
     @abc.abstractmethod
     async def remove(self, collection: str, filt: dict[str, Any]) -> int:
         """Remove records from `collection`.
@@ -114,6 +129,67 @@ class BaseDriver(metaclass=abc.ABCMeta):
 
         return ((r["ts"], r["val"]) for r in results)
 
+    async def get_samples_buckets(
+        self,
+        collection: str,
+        obj_id: Id,
+        from_timestamp: int | None,
+        to_timestamp: int | None,
+        bucket: int,
+        agg: str,
+        limit: int | None,
+    ) -> Iterable[Sample]:
+        """Return the samples of `obj_id` from `collection`, aggregated into buckets of `bucket` milliseconds.
+
+        Buckets are aligned to multiples of `bucket`. Each returned sample consists of the bucket start timestamp and
+        the aggregated value, which is computed using `agg` function (one of `SAMPLE_AGGREGATIONS`). Empty buckets are
+        not returned. Results are always sorted by timestamp, in ascending order.
+
+        Filter samples by an interval of time, if `from_timestamp` and/or `to_timestamp` are not `None`.
+        `from_timestamp` is inclusive, while `to_timestamp` is exclusive.
+
+        Optionally limit results to `limit` number of buckets, if not `None`.
+
+        Drivers should override this method to aggregate samples natively; this default implementation goes through all
+        samples in the interval, one bucket at a time."""
+
+        samples = await self.get_samples_slice(
+            collection, obj_id, from_timestamp, to_timestamp, limit=None, sort_desc=False
+        )
+
+        results = []
+        current_bucket = None
+        value = count = None
+        for timestamp, sample_value in samples:
+            sample_bucket = timestamp - timestamp % bucket
+            if sample_bucket != current_bucket:
+                if current_bucket is not None:
+                    results.append(
+                        (current_bucket, value / count if agg == "avg" else count if agg == "count" else value)
+                    )
+                    if limit is not None and len(results) >= limit:
+                        return results
+
+                current_bucket = sample_bucket
+                value = sample_value
+                count = 1
+                continue
+
+            count += 1
+            if agg == "min":
+                value = min(value, sample_value)
+            elif agg == "max":
+                value = max(value, sample_value)
+            elif agg == "avg":
+                value += sample_value
+            elif agg == "last":
+                value = sample_value
+
+        if current_bucket is not None:
+            results.append((current_bucket, value / count if agg == "avg" else count if agg == "count" else value))
+
+        return results
+
     async def get_samples_by_timestamp(
         self,
         collection: str,
@@ -153,6 +229,15 @@ class BaseDriver(metaclass=abc.ABCMeta):
 
         await self.insert(collection, record)
 
+    async def save_samples(self, collection: str, samples: list[tuple[Id, int, SampleValue]]) -> None:
+        """Save several samples, given as `(obj_id, timestamp, value)` tuples, to a specified `collection`.
+
+        Drivers should override this method to write all samples at once; this default implementation simply saves
+        samples one by one."""
+
+        for obj_id, timestamp, value in samples:
+            await self.save_sample(collection, obj_id, timestamp, value)
+
     async def remove_samples(
         self,
         collection: str,
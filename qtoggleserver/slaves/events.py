@@ -1,3 +1,4 @@
+from collections.abc import Hashable
 from typing import TYPE_CHECKING
 
 from qtoggleserver.core import api as core_api
@@ -45,5 +46,5 @@ class SlaveDeviceUpdate(SlaveDeviceEvent):
     async def make_params(self) -> GenericJSONDict:
         return self.get_slave().to_json()
 
-    def is_duplicate(self, event: core_events.Event) -> bool:
-        return isinstance(event, self.__class__) and event.get_slave() == self.get_slave()
+    def get_dedup_key(self) -> Hashable | None:
+        return self._type, self.get_slave().get_name()
@@ -42,6 +42,7 @@ MASTER_ATTRS = {
 
 class SlavePort(core_ports.BasePort):
     PERSIST_COLLECTION = "slave_ports"
+    POLLED = False
 
     _DEVICE_EXPRESSION_ATTRDEF = {"type": "string", "modifiable": True, "max": 1024}
 
@@ -283,6 +284,7 @@ class SlavePort(core_ports.BasePort):
 
     def push_remote_value(self, value: NullablePortValue) -> None:
         self._remote_value_queue.appendleft(value)
+        self.notify_value()
 
     def get_last_remote_value(self) -> NullablePortValue:
         try:
@@ -293,10 +295,15 @@ class SlavePort(core_ports.BasePort):
     async def read_value(self) -> NullablePortValue:
         try:
             self._cached_value = self._remote_value_queue.pop()
-            return self._cached_value
         except IndexError:
             raise core_ports.SkipRead()
 
+        # Queued values are read one per update loop iteration
+        if self._remote_value_queue:
+            self.notify_value()
+
+        return self._cached_value
+
     async def write_value(self, value: PortValue) -> None:
         if self._slave.is_online():
             try:
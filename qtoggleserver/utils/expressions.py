@@ -2,69 +2,174 @@ from qtoggleserver.conf import settings
 from qtoggleserver.core import ports as core_ports
 from qtoggleserver.core.device import attrs as core_device_attrs
 from qtoggleserver.core.expressions import EvalContext
+from qtoggleserver.core.typing import Attributes, NullablePortValue
 from qtoggleserver.slaves import devices as slaves_devices
 
 
-_deps_map_cache: dict[str, list[core_ports.BasePort]] | None = None
+# Reverse index from dependency string to ports, together with the deps each port is currently indexed under, so
+# that the index can be updated one port at a time
+_deps_map: dict[str, set[core_ports.BasePort]] = {}
+_port_deps: dict[core_ports.BasePort, set[str]] = {}
+_deps_map_valid: bool = False
 
+# Persistent port values store, shared by all evaluation contexts and updated incrementally from ports that have
+# been flagged via `invalidate_port_value()`
+_port_values: dict[str, NullablePortValue] = {}
+_port_values_valid: bool = False
+_dirty_value_ports: set[core_ports.BasePort] = set()
 
-def get_deps_map() -> dict[str, list[core_ports.BasePort]]:
+
+def get_deps_map() -> dict[str, set[core_ports.BasePort]]:
     """Return a mapping from dependency string to ports whose expressions depend on it.
 
-    Built lazily and cached; call :func:`invalidate_deps_map` to force a rebuild.
-    Keys are dep strings as returned by `Expression.get_deps()` (e.g. `"$port_id"`,
-    `"asap"`, `"second"`, ...).
+    Built lazily, then kept up-to-date by :func:`update_port_deps` and :func:`remove_port_deps`; call
+    :func:`invalidate_deps_map` to force a full rebuild. Keys are dep strings as returned by `Expression.get_deps()`
+    (e.g. `"$port_id"`, `"$port_id:"`, `"#slave_name:"`, `"asap"`, `"second"`, ...).
     """
-    global _deps_map_cache
+    global _deps_map_valid
 
-    if _deps_map_cache is None:
-        _deps_map_cache = {}
+    if not _deps_map_valid:
+        _deps_map.clear()
+        _port_deps.clear()
         for port in core_ports.get_all():
-            expression = port.get_expression()
-            if not expression:
-                continue
-            for dep in expression.get_deps():
-                _deps_map_cache.setdefault(dep, []).append(port)
+            _add_port_deps(port)
+
+        _deps_map_valid = True
+
+    return _deps_map
+
+
+def update_port_deps(port: core_ports.BasePort) -> None:
+    """Update the deps map entries of `port`. Must be called whenever the port's expression changes."""
+
+    if not _deps_map_valid:
+        return  # will be included by the next full rebuild
+
+    remove_port_deps(port)
+    if not port.is_removed():
+        _add_port_deps(port)
+
+
+def remove_port_deps(port: core_ports.BasePort) -> None:
+    """Remove `port` from the deps map. Must be called when the port is removed."""
+
+    for dep in _port_deps.pop(port, ()):
+        ports = _deps_map[dep]
+        ports.discard(port)
+        if not ports:
+            _deps_map.pop(dep)
 
-    return _deps_map_cache
+
+def _add_port_deps(port: core_ports.BasePort) -> None:
+    expression = port.get_expression()
+    if not expression:
+        return
+
+    deps = expression.get_deps()
+    _port_deps[port] = deps
+    for dep in deps:
+        _deps_map.setdefault(dep, set()).add(port)
 
 
 def invalidate_deps_map() -> None:
-    """Invalidate the deps map cache, forcing a full rebuild on next access."""
-    global _deps_map_cache
-    _deps_map_cache = None
+    """Invalidate the deps map, forcing a full rebuild on next access."""
+    global _deps_map_valid
+    _deps_map_valid = False
+
+
+def invalidate_port_value(port: core_ports.BasePort) -> None:
+    """Flag the value of `port` as changed, so that it is refreshed in the port values store on next context build.
+    Must be called whenever the port's last known value changes, as well as when the port is added or removed."""
+
+    _dirty_value_ports.add(port)
+
+
+def invalidate_port_values() -> None:
+    """Invalidate the whole port values store, forcing a full rebuild on next context build."""
+
+    global _port_values_valid
+
+    _port_values_valid = False
+
 
+def _update_port_values() -> None:
+    global _port_values_valid
 
-async def build_context(now_ms: int) -> EvalContext:
+    if not _port_values_valid:
+        _port_values.clear()
+        _dirty_value_ports.clear()
+        for port in core_ports.get_all():
+            _port_values[port.get_id()] = port.get_last_value()
+
+        _port_values_valid = True
+        return
+
+    while _dirty_value_ports:
+        port = _dirty_value_ports.pop()
+        port_id = port.get_id()
+        if not port.is_removed():
+            _port_values[port_id] = port.get_last_value()
+        elif core_ports.get(port_id) is None:  # don't drop the value of a new port that has reused the same id
+            _port_values.pop(port_id, None)
+
+
+async def _get_device_attrs(deps: set[str] | None) -> Attributes:
+    if deps is None or "#:" in deps:
+        device_attrs = await core_device_attrs.get_attrs()
+    else:
+        device_attrs = {}
+
+    if not settings.slaves.enabled:
+        return device_attrs
+
+    # Add slave device attrs
+    if deps is None:
+        slaves = list(slaves_devices.get_all())
+    else:
+        slave_names = (d[1:-1] for d in deps if d.startswith("#") and d.endswith(":") and len(d) > 2)
+        slaves = [s for s in (slaves_devices.get(n) for n in slave_names) if s]
+
+    for slave in slaves:
+        slave_name = slave.get_name()
+        slave_attrs = slave.get_cached_attrs()
+        device_attrs.update({f"{slave_name}:{attr_name}": attr_value for attr_name, attr_value in slave_attrs.items()})
+
+    return device_attrs
+
+
+async def build_context(now_ms: int, deps: set[str] | None = None) -> EvalContext:
     """Build an expression evaluation context for the current system state.
 
-    Gathers port values and attributes for all ports (including disabled ones; disabled ports are
-    only special-cased for port *value* expressions, not attribute expressions), collects
-    device-level attributes, and includes slave device attributes if slaves are enabled. Returns a
-    complete EvalContext ready for expression evaluation.
+    Port values come from a persistent store that is only refreshed for the ports whose values changed since the
+    previous call. Attributes are materialized lazily: when `deps` is given, only attributes of ports (`$port_id:`)
+    and devices (`#:`, `#slave_name:`) present among `deps` are gathered; otherwise attributes of all ports (including
+    disabled ones; disabled ports are only special-cased for port *value* expressions, not attribute expressions),
+    device-level attributes and all slave device attributes are included.
+
+    The returned context shares the port values store, so it must be used right away, before ports are read again.
 
     Args:
         now_ms: Current time in milliseconds since epoch.
+        deps: Dependencies of the expressions to be evaluated in this context; `None` means all.
 
     Returns:
         EvalContext with port values, port attributes, device attributes, and timestamp.
     """
-    port_values = {}
+    _update_port_values()
+
     port_attrs = {}
-    for port in core_ports.get_all():
-        port_id = port.get_id()
-        port_values[port_id] = port.get_last_value()
-        port_attrs[port_id] = await port.get_attrs()
+    if deps is None:
+        for port in core_ports.get_all():
+            port_attrs[port.get_id()] = await port.get_attrs()
+    else:
+        for dep in deps:
+            if not dep.startswith("$") or not dep.endswith(":"):
+                continue
 
-    device_attrs = await core_device_attrs.get_attrs()
+            port = core_ports.get(dep[1:-1])
+            if port:
+                port_attrs[port.get_id()] = await port.get_attrs()
 
-    # Add slave device attrs
-    if settings.slaves.enabled:
-        for slave in slaves_devices.get_all():
-            slave_name = slave.get_name()
-            slave_attrs = slave.get_cached_attrs()
-            device_attrs.update(
-                {f"{slave_name}:{attr_name}": attr_value for attr_name, attr_value in slave_attrs.items()}
-            )
-
-    return EvalContext(port_values, port_attrs, device_attrs, now_ms)
+    device_attrs = await _get_device_attrs(deps)
+
+    return EvalContext(_port_values, port_attrs, device_attrs, now_ms)
@@ -1,6 +1,7 @@
 import json
 import math
 
+from collections.abc import Iterable
 from datetime import date, datetime
 from enum import StrEnum
 from typing import Any, cast
@@ -41,6 +42,16 @@ class ExtraTypes(StrEnum):
     STR = "str"
 
 
+class Encoded(str):
+    """Already encoded JSON, which `dumps()` outputs as is."""
+
+
+def join_encoded(fragments: Iterable[str]) -> Encoded:
+    """Encode a JSON list out of already encoded JSON `fragments`, without decoding or encoding them again."""
+
+    return Encoded("[" + ", ".join(fragments) + "]")
+
+
 def _replace_nan_inf_rec(obj: Any, replace_value: Any) -> Any:
     new_obj: Any
     if isinstance(obj, dict):
@@ -173,7 +184,9 @@ def dumps(obj: Any, extra_types: str | ExtraTypes = ExtraTypes.NONE, **kwargs) -
         '{"obj": "<MyClass instance>"}'
     """
     # Treat primitive types separately to gain just a bit of performance
-    if isinstance(obj, str):
+    if isinstance(obj, Encoded):
+        return str(obj)
+    elif isinstance(obj, str):
         return '"' + obj + '"'
     elif isinstance(obj, bool):
         return ["false", "true"][obj]
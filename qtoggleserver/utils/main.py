@@ -1,3 +1,5 @@
+from collections.abc import Callable
+
 from qtoggleserver.core import events as core_events
 from qtoggleserver.slaves import events as slaves_events
 
@@ -65,3 +67,17 @@ class AttrChangeHandler(core_events.Handler):
             (slaves_events.SlaveDeviceAdd, slaves_events.SlaveDeviceRemove, slaves_events.SlaveDeviceUpdate),
         ):
             self._pending.add(f"#{event.get_slave().get_name()}:")
+
+
+class WakeUpHandler(core_events.Handler):
+    """Call `wake_up` on every event, so that an update loop that only runs when it has work to do still serves
+    sessions and re-evaluates attribute-dependent expressions right away."""
+
+    FIRE_AND_FORGET = False
+
+    def __init__(self, wake_up: Callable[[], None]) -> None:
+        super().__init__(name="wake-up")
+        self._wake_up: Callable[[], None] = wake_up
+
+    async def handle_event(self, event: core_events.Event) -> None:
+        self._wake_up()
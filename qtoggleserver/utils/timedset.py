@@ -15,6 +15,9 @@ class TimedSet(collections.abc.MutableSet):
         self._set.add(x)
         self._times[x] = time.time()
 
+    def get_expiry_time(self, x: Any) -> float:
+        return self._times[x] + self._timeout
+
     def discard(self, x: Any) -> None:
         self._set.discard(x)
 
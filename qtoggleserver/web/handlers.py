@@ -1,11 +1,15 @@
+import asyncio
 import logging
 
 from qui import constants as qui_constants
 from qui import settings as qui_settings
+from tornado.iostream import StreamClosedError
 from tornado.web import HTTPError
+from tornado.websocket import WebSocketClosedError, WebSocketHandler
 
 from qtoggleserver import system
 from qtoggleserver.conf import settings
+from qtoggleserver.core import sessions as core_sessions
 from qtoggleserver.core.api.funcs import backup as backup_api_funcs
 from qtoggleserver.core.api.funcs import device as device_api_funcs
 from qtoggleserver.core.api.funcs import firmware as firmware_api_funcs
@@ -18,6 +22,7 @@ from qtoggleserver.peripherals.api import funcs as peripherals_api_funcs
 from qtoggleserver.slaves.api.funcs import devices as slaves_devices_api_funcs
 from qtoggleserver.slaves.api.funcs import discovered as slaves_discovered_api_funcs
 from qtoggleserver.system.api import funcs as system_api_funcs
+from qtoggleserver.utils import json as json_utils
 
 from .base import APIHandler, BaseHandler, NoSuchFunction
 
@@ -180,6 +185,87 @@ class ListenHandler(APIHandler):
         await self.call_api_func(various_api_funcs.get_listen)
 
 
+class ListenWebSocketHandler(APIHandler, WebSocketHandler):
+    def __init__(self, *args, **kwargs) -> None:
+        self._session: core_sessions.Session | None = None
+        self._timeout: int = 0
+        self._batch: int = 0
+        self._stream_task: asyncio.Task | None = None
+
+        super().__init__(*args, **kwargs)
+
+    # Browsers can't set headers on WebSocket requests. They pass the session id as a query argument instead and the
+    # JWT as a subprotocol (e.g. `new WebSocket(url, ["qtoggle", "bearer.<jwt>"])`), keeping it out of request logs
+    SUBPROTOCOL = "qtoggle"
+    AUTH_SUBPROTOCOL_PREFIX = "bearer."
+
+    def prepare(self) -> None:
+        session_id = self.get_query_argument("session_id", None)
+        if session_id and "Session-Id" not in self.request.headers:
+            self.request.headers["Session-Id"] = session_id
+
+        if "Authorization" not in self.request.headers:
+            for subprotocol in self.request.headers.get("Sec-WebSocket-Protocol", "").split(","):
+                subprotocol = subprotocol.strip()
+                if subprotocol.startswith(self.AUTH_SUBPROTOCOL_PREFIX):
+                    token = subprotocol[len(self.AUTH_SUBPROTOCOL_PREFIX) :]
+                    self.request.headers["Authorization"] = f"Bearer {token}"
+                    break
+
+        super().prepare()
+
+    def select_subprotocol(self, subprotocols: list[str]) -> str | None:
+        # Never echo the token back
+        return self.SUBPROTOCOL if self.SUBPROTOCOL in subprotocols else None
+
+    async def get(self, *args, **kwargs) -> None:
+        try:
+            self._session, self._timeout, self._batch = await various_api_funcs.get_listen_ws(self)
+        except Exception as e:
+            await self._handle_api_call_exception(various_api_funcs.get_listen_ws, {}, e)
+            return
+
+        await WebSocketHandler.get(self, *args, **kwargs)
+
+    def open(self, *args, **kwargs) -> None:
+        self._stream_task = asyncio.create_task(self._stream())
+
+    def on_message(self, message: str | bytes) -> None:
+        pass  # clients aren't expected to send anything
+
+    def on_close(self) -> None:
+        if self._stream_task:
+            self._stream_task.cancel()
+            self._stream_task = None
+
+    async def _stream(self) -> None:
+        session = self._session
+        stream_event = session.start_streaming(self._timeout, self.access_level)
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(stream_event.wait(), self._timeout)
+                except TimeoutError:
+                    self.ping()  # keep-alive
+                    continue
+
+                # Let more events gather, so that they are sent in a single message
+                if self._batch:
+                    await asyncio.sleep(self._batch / 1000)
+
+                events = session.take_events()
+                message = json_utils.join_encoded([await e.to_json_fragment() for e in events])
+
+                # Events triggered while the message is being written stay queued, where duplicates replace each other
+                await self.write_message(message)
+        except WebSocketClosedError, StreamClosedError:
+            session.debug("streaming connection closed")
+        except asyncio.CancelledError:
+            pass
+        finally:
+            session.stop_streaming(stream_event)
+
+
 class ReverseHandler(APIHandler):
     async def get(self) -> None:
         await self.call_api_func(reverse_api_funcs.get_reverse)
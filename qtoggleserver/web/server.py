@@ -101,7 +101,10 @@ def _make_routing_table() -> list[URLSpec]:
         handlers_list += [URLSpec(r"^/api/webhooks/?$", handlers.WebhooksHandler)]
 
     if settings.core.listen_support:
-        handlers_list += [URLSpec(r"^/api/listen/?$", handlers.ListenHandler)]
+        handlers_list += [
+            URLSpec(r"^/api/listen/?$", handlers.ListenHandler),
+            URLSpec(r"^/api/listen/ws/?$", handlers.ListenWebSocketHandler),
+        ]
 
     # Reverse API calls
 
@@ -11,6 +11,7 @@ from freezegun import freeze_time
 
 from qtoggleserver import peripherals, persist
 from qtoggleserver.conf import settings
+from qtoggleserver.core import history as core_history
 from qtoggleserver.core import ports as core_ports
 from qtoggleserver.core import vports as core_vports
 from qtoggleserver.core.api.funcs import ports as ports_api_funcs
@@ -67,6 +68,9 @@ def freezer(dummy_local_datetime):
 @pytest.fixture
 def mock_persist_driver():
     persist._thread_local.driver = MockPersistDriver()
+    # Recent and cached samples mirror the persisted history
+    core_history._recent_samples.clear()
+    core_history._samples_cache.clear()
     return persist._thread_local.driver
 
 
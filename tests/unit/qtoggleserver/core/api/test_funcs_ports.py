@@ -308,3 +308,49 @@ class TestPatchPortValueTimeout:
             await ports_api_funcs.patch_port_value(request, "nid1", 100)
         assert exc_info.value.status == 504
         spy.assert_not_called()
+
+
+class TestGetPortHistory:
+    async def test_buckets(self, mock_api_request_maker, mock_num_port1, mock_persist_driver) -> None:
+        """Should return samples aggregated into buckets when `bucket` is given."""
+
+        await mock_persist_driver.save_samples(
+            "value_history", [("nid1", 1000, 1), ("nid1", 1500, 3), ("nid1", 2500, 5), ("nid2", 1000, 7)]
+        )
+
+        request = mock_api_request_maker(
+            "GET",
+            "/ports/nid1/history",
+            query={"from": "0", "to": "3000", "bucket": "1000", "agg": "max"},
+            access_level=core_api.ACCESS_LEVEL_VIEWONLY,
+        )
+        result = await ports_api_funcs.get_port_history(request, "nid1")
+
+        assert result == [{"timestamp": 1000, "value": 3}, {"timestamp": 2000, "value": 5}]
+
+    async def test_buckets_avg_default(self, mock_api_request_maker, mock_num_port1, mock_persist_driver) -> None:
+        """Should average samples in buckets by default."""
+
+        await mock_persist_driver.save_samples("value_history", [("nid1", 1000, 1), ("nid1", 1500, 2)])
+
+        request = mock_api_request_maker(
+            "GET",
+            "/ports/nid1/history",
+            query={"from": "0", "to": "3000", "bucket": "1000"},
+            access_level=core_api.ACCESS_LEVEL_VIEWONLY,
+        )
+        result = await ports_api_funcs.get_port_history(request, "nid1")
+
+        assert result == [{"timestamp": 1000, "value": 1.5}]
+
+    @pytest.mark.parametrize("query", [{"bucket": "0"}, {"bucket": "abc"}, {"bucket": "1000", "agg": "median"}])
+    async def test_invalid_bucket_params(self, mock_api_request_maker, mock_num_port1, query) -> None:
+        request = mock_api_request_maker(
+            "GET",
+            "/ports/nid1/history",
+            query=dict(query, **{"from": "0"}),
+            access_level=core_api.ACCESS_LEVEL_VIEWONLY,
+        )
+        with pytest.raises(core_api.APIError, match="invalid-field") as exc_info:
+            await ports_api_funcs.get_port_history(request, "nid1")
+        assert exc_info.value.status == 400
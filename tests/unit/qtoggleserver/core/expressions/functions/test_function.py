@@ -1,4 +1,7 @@
-from qtoggleserver.core.expressions import DEP_ASAP, Role
+import pytest
+
+from qtoggleserver.core.expressions import DEP_ASAP, Role, arithmetic, parse
+from qtoggleserver.core.expressions.exceptions import RealDateTimeUnavailable
 from tests.unit.qtoggleserver.mock.expressions import MockExpression, MockFunction
 
 
@@ -25,3 +28,51 @@ class TestFunction:
 
         assert f.is_asap_eval_paused(999)
         assert not f.is_asap_eval_paused(1000)
+
+
+class TestCompile:
+    async def test_pure(self, dummy_eval_context):
+        """Should compile a tree of pure functions and literals into a callable that gives the same result."""
+
+        e = parse(None, "IF(GT(ADD(1, MUL(2, 3)), 5), ROUND(DIV(10, 4), 1), 0)", Role.VALUE)
+        compiled = e.compile()
+        assert compiled is not None
+        assert compiled(dummy_eval_context) == 2.5
+        assert await e.eval(dummy_eval_context) == 2.5
+
+    def test_cached(self):
+        """Should compile an expression only once."""
+
+        e = parse(None, "ADD(1, 2)", Role.VALUE)
+        assert e.compile() is e.compile()
+
+    async def test_async_arg(self, dummy_eval_context):
+        """Should not compile a function that has an argument that can't be compiled, while still compiling the
+        other arguments."""
+
+        f = MockFunction(value=3, args=[], role=Role.VALUE)
+        pure = parse(None, "MUL(2, 3)", Role.VALUE)
+        e = arithmetic.AddFunction([pure, f], role=Role.VALUE)
+
+        assert f.compile() is None
+        assert e.compile() is None
+        assert pure.compile() is not None
+        assert await e.eval(dummy_eval_context) == 9
+
+    def test_lazy_branching(self, dummy_eval_context):
+        """Should evaluate only the needed arguments of compiled `IF`, `AND` and `OR`."""
+
+        assert parse(None, "IF(1, 2, DIV(1, 0))", Role.VALUE).compile()(dummy_eval_context) == 2
+        assert parse(None, "AND(0, DIV(1, 0))", Role.VALUE).compile()(dummy_eval_context) == 0
+        assert parse(None, "OR(1, DIV(1, 0))", Role.VALUE).compile()(dummy_eval_context) == 1
+
+    def test_asap_pause(self, mocker, dummy_eval_context):
+        """Should pause asap eval of compiled asap functions that fail, even when not evaluated directly."""
+
+        mocker.patch("qtoggleserver.system.date.has_real_date_time", return_value=False)
+        e = parse(None, "ADD(MILLISECOND(), 1)", Role.VALUE)
+        with pytest.raises(RealDateTimeUnavailable):
+            e.compile()(dummy_eval_context)
+
+        assert e.is_asap_eval_paused(dummy_eval_context.now_ms)
+        assert not e.is_asap_eval_paused(dummy_eval_context.now_ms + 1000)
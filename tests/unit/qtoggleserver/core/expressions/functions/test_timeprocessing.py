@@ -1,3 +1,6 @@
+import random
+import statistics
+
 import pytest
 
 from qtoggleserver.core.expressions import DEP_ASAP, Function, Role, timeprocessing
@@ -445,13 +448,30 @@ class TestFMAvg:
             Function.parse(None, "FMAVG(1, 2)", Role.VALUE, 0)
 
         with pytest.raises(InvalidNumberOfArguments):
-            Function.parse(None, "FMAVG(1, 2, 3, 4)", Role.VALUE, 0)
+            Function.parse(None, "FMAVG(1, 2, 3, 4, 5)", Role.VALUE, 0)
 
     @pytest.mark.parametrize("role", [Role.TRANSFORM_READ, Role.TRANSFORM_WRITE])
     def test_no_transform(self, role):
         with pytest.raises(UnknownFunction):
             Function.parse(None, "FMAVG()", role, 0)
 
+    async def test_duration(self, dummy_eval_context, later_eval_context):
+        value_expr = MockExpression(2)
+        width_expr = MockExpression(10)
+        time_expr = MockExpression(100)
+        duration_expr = MockExpression(250)
+        expr = timeprocessing.FMAvgFunction([value_expr, width_expr, time_expr, duration_expr], Role.VALUE)
+
+        assert await expr.eval(dummy_eval_context) == 2
+        value_expr.set_value(4)
+        assert await expr.eval(later_eval_context(100)) == 3
+        value_expr.set_value(6)
+        assert await expr.eval(later_eval_context(200)) == 4
+        value_expr.set_value(8)
+        assert await expr.eval(later_eval_context(300)) == 6  # first sample is older than 250 ms
+        value_expr.set_value(10)
+        assert await expr.eval(later_eval_context(1000)) == 10
+
     def test_deps(self):
         assert timeprocessing.FMAvgFunction.DEPS == {DEP_ASAP}
 
@@ -514,7 +534,7 @@ class TestFMedian:
             Function.parse(None, "FMEDIAN(1, 2)", Role.VALUE, 0)
 
         with pytest.raises(InvalidNumberOfArguments):
-            Function.parse(None, "FMEDIAN(1, 2, 3, 4)", Role.VALUE, 0)
+            Function.parse(None, "FMEDIAN(1, 2, 3, 4, 5)", Role.VALUE, 0)
 
     @pytest.mark.parametrize("role", [Role.TRANSFORM_READ, Role.TRANSFORM_WRITE])
     def test_no_transform(self, role):
@@ -523,3 +543,115 @@ class TestFMedian:
 
     def test_deps(self):
         assert timeprocessing.FMedianFunction.DEPS == {DEP_ASAP}
+
+
+class TestFMin:
+    async def test(self, dummy_eval_context, later_eval_context):
+        value_expr = MockExpression(5)
+        width_expr = MockExpression(3)
+        time_expr = MockExpression(100)
+        expr = timeprocessing.FMinFunction([value_expr, width_expr, time_expr], Role.VALUE)
+
+        assert await expr.eval(dummy_eval_context) == 5
+        value_expr.set_value(2)
+        assert await expr.eval(later_eval_context(50)) == 5
+        assert await expr.eval(later_eval_context(100)) == 2
+        value_expr.set_value(7)
+        assert await expr.eval(later_eval_context(200)) == 2
+        value_expr.set_value(9)
+        assert await expr.eval(later_eval_context(300)) == 2
+        assert await expr.eval(later_eval_context(400)) == 7
+
+    def test_num_args(self):
+        with pytest.raises(InvalidNumberOfArguments):
+            Function.parse(None, "FMIN(1, 2)", Role.VALUE, 0)
+
+        with pytest.raises(InvalidNumberOfArguments):
+            Function.parse(None, "FMIN(1, 2, 3, 4, 5)", Role.VALUE, 0)
+
+
+class TestFMax:
+    async def test(self, dummy_eval_context, later_eval_context):
+        value_expr = MockExpression(5)
+        width_expr = MockExpression(3)
+        time_expr = MockExpression(100)
+        expr = timeprocessing.FMaxFunction([value_expr, width_expr, time_expr], Role.VALUE)
+
+        assert await expr.eval(dummy_eval_context) == 5
+        value_expr.set_value(9)
+        assert await expr.eval(later_eval_context(100)) == 9
+        value_expr.set_value(2)
+        assert await expr.eval(later_eval_context(200)) == 9
+        assert await expr.eval(later_eval_context(300)) == 9
+        assert await expr.eval(later_eval_context(400)) == 2
+
+    def test_parse(self):
+        e = Function.parse(None, "FMAX(1, 2, 3, 4)", Role.VALUE, 0)
+        assert isinstance(e, timeprocessing.FMaxFunction)
+
+
+class TestFStDev:
+    async def test(self, dummy_eval_context, later_eval_context):
+        value_expr = MockExpression(2)
+        width_expr = MockExpression(4)
+        time_expr = MockExpression(100)
+        expr = timeprocessing.FStDevFunction([value_expr, width_expr, time_expr], Role.VALUE)
+
+        assert await expr.eval(dummy_eval_context) == 0
+        value_expr.set_value(4)
+        assert await expr.eval(later_eval_context(100)) == 1
+        value_expr.set_value(4)
+        await expr.eval(later_eval_context(200))
+        value_expr.set_value(6)
+        assert await expr.eval(later_eval_context(300)) == pytest.approx(statistics.pstdev([2, 4, 4, 6]))
+
+    def test_parse(self):
+        e = Function.parse(None, "FSTDEV(1, 2, 3)", Role.VALUE, 0)
+        assert isinstance(e, timeprocessing.FStDevFunction)
+
+
+class TestFPercentile:
+    async def test(self, dummy_eval_context, later_eval_context):
+        value_expr = MockExpression(0)
+        percentile_expr = MockExpression(90)
+        width_expr = MockExpression(10)
+        time_expr = MockExpression(100)
+        expr = timeprocessing.FPercentileFunction([value_expr, percentile_expr, width_expr, time_expr], Role.VALUE)
+
+        for i in range(10):
+            value_expr.set_value(10 - i)
+            result = await expr.eval(later_eval_context(i * 100))
+
+        assert result == 10
+        percentile_expr.set_value(0)
+        value_expr.set_value(20)
+        assert await expr.eval(later_eval_context(1000)) == 1
+
+    def test_num_args(self):
+        with pytest.raises(InvalidNumberOfArguments):
+            Function.parse(None, "FPERCENTILE(1, 2, 3)", Role.VALUE, 0)
+
+        with pytest.raises(InvalidNumberOfArguments):
+            Function.parse(None, "FPERCENTILE(1, 2, 3, 4, 5, 6)", Role.VALUE, 0)
+
+
+class TestWindow:
+    def test_matches_full_computation(self):
+        """Should keep its statistics equal to those computed over the whole window, while sliding it."""
+
+        rnd = random.Random(0)
+        window = timeprocessing._Window()
+        samples = []
+        for i in range(2000):
+            value = rnd.choice([rnd.uniform(-1000, 1000), float(rnd.randint(0, 5))])
+            width = rnd.randint(1, 20)
+            window.push(i * 10, value)
+            window.evict(width, 0, i * 10)
+            samples = (samples + [value])[-width:]
+
+            assert len(window) == len(samples)
+            assert window.min() == min(samples)
+            assert window.max() == max(samples)
+            assert window.mean() == pytest.approx(statistics.fmean(samples), abs=1e-6)
+            assert window.stdev() == pytest.approx(statistics.pstdev(samples), abs=1e-4)
+            assert window.percentile(50) == sorted(samples)[len(samples) // 2]
@@ -1,6 +1,7 @@
 import pytest
 
-from qtoggleserver.core.expressions import EvalContext, Role, parse
+from qtoggleserver.core import expressions
+from qtoggleserver.core.expressions import EvalContext, Role, clear_parse_cache, parse
 from qtoggleserver.core.expressions.exceptions import (
     EmptyExpression,
     MissingAttrPrefix,
@@ -179,3 +180,87 @@ async def test_parse_device_attr_as_function_arg():
     e = parse(None, "ADD(#:name, 2)", role=Role.VALUE)
     # "my_device" is truthy → 1, + 2 = 3
     assert await e.eval(context) == 3
+
+
+async def test_parse_unexpected_character_nested():
+    with pytest.raises(UnexpectedCharacter) as exc_info:
+        parse(None, "ADD(MUL(1, 2) x, 3)", role=Role.VALUE)
+
+    assert exc_info.value.c == "x"
+    assert exc_info.value.pos == 15
+
+    with pytest.raises(UnexpectedCharacter) as exc_info:
+        parse(None, "ADD(1, MUL(2, , 3))", role=Role.VALUE)
+
+    assert exc_info.value.c == ","
+    assert exc_info.value.pos == 15
+
+
+async def test_parse_outer_errors_first():
+    """Errors of outer functions should be reported before errors of their arguments."""
+
+    with pytest.raises(UnknownFunction) as exc_info:
+        parse(None, "UNKNOWN_FUNC(ADD(1, ?))", role=Role.VALUE)
+
+    assert exc_info.value.name == "UNKNOWN_FUNC"
+
+    with pytest.raises(UnbalancedParentheses) as exc_info:
+        parse(None, "ADD(MUL(1) x, 2))", role=Role.VALUE)
+
+    assert exc_info.value.pos == 17
+
+
+class TestParseCache:
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        clear_parse_cache()
+        yield
+        clear_parse_cache()
+
+    def test_new_expression(self):
+        """Should return a new expression each time the same string is parsed."""
+
+        e1 = parse("nid1", "ADD($, 1)", role=Role.VALUE)
+        e2 = parse("nid1", "ADD($, 1)", role=Role.VALUE)
+        assert e1 is not e2
+        assert str(e1) == str(e2)
+
+    def test_shared_stateless(self):
+        """Should share stateless sub-expressions between parsed expressions."""
+
+        e1 = parse(None, "ADD(MUL(2, 3), 1)", role=Role.VALUE)
+        e2 = parse(None, "ADD(MUL(2, 3), 1)", role=Role.VALUE)
+        assert e1.args[0] is e2.args[0]
+
+    async def test_cloned_stateful(self):
+        """Should not share state between parsed expressions."""
+
+        e1 = parse(None, "ADD(RISING(1), 1)", role=Role.VALUE)
+        e2 = parse(None, "ADD(RISING(1), 1)", role=Role.VALUE)
+        assert e1.args[0] is not e2.args[0]
+
+        e1.args[0]._last_value = 0
+        assert await e1.eval(EvalContext()) == 2
+        assert await e2.eval(EvalContext()) == 1
+
+    def test_key(self):
+        """Should cache expressions by self port id and role."""
+
+        e1 = parse("nid1", "$", role=Role.VALUE)
+        e2 = parse("nid2", "$", role=Role.VALUE)
+        assert e1.port_id == "nid1"
+        assert e2.port_id == "nid2"
+
+        with pytest.raises(UnknownFunction):
+            parse("nid1", "TIME()", role=Role.TRANSFORM_READ)
+
+    def test_size(self, mocker):
+        """Should evict the least recently used expressions."""
+
+        mocker.patch.object(expressions, "PARSE_CACHE_SIZE", 2)
+        parse(None, "ADD(1, 2)", role=Role.VALUE)
+        parse(None, "ADD(1, 3)", role=Role.VALUE)
+        parse(None, "ADD(1, 2)", role=Role.VALUE)
+        parse(None, "ADD(1, 4)", role=Role.VALUE)
+
+        assert list(expressions._parse_cache) == [(None, "ADD(1, 2)", Role.VALUE), (None, "ADD(1, 4)", Role.VALUE)]
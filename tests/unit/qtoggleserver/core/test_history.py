@@ -0,0 +1,491 @@
+import time
+
+from datetime import timedelta
+
+import pytest
+
+from qtoggleserver import persist
+from qtoggleserver.conf import settings
+from qtoggleserver.core import history
+
+
+@pytest.fixture(autouse=True)
+def reset_pending_samples():
+    history._pending_samples.clear()
+    yield
+    history._pending_samples.clear()
+
+
+class TestSampleBuffer:
+    async def test_buffered(self, mock_persist_driver, mock_num_port1, mocker):
+        """Should buffer samples instead of persisting them right away."""
+
+        mocker.patch.object(settings.core, "history_buffer_size", 10)
+        save_samples_spy = mocker.spy(persist, "save_samples")
+        mock_num_port1.set_last_read_value(5)
+
+        await history.save_sample(mock_num_port1, 1000)
+        await history.save_sample(mock_num_port1, 2000)
+
+        save_samples_spy.assert_not_called()
+        assert history._pending_samples == [("nid1", 1000, 5.0), ("nid1", 2000, 5.0)]
+
+    async def test_flush_on_size(self, mock_persist_driver, mock_num_port1, mock_num_port2, mocker):
+        """Should persist all buffered samples at once when the buffer is full."""
+
+        mocker.patch.object(settings.core, "history_buffer_size", 3)
+        save_samples_spy = mocker.spy(persist, "save_samples")
+        mock_num_port1.set_last_read_value(5)
+        mock_num_port2.set_last_read_value(6)
+
+        await history.save_sample(mock_num_port1, 1000)
+        await history.save_sample(mock_num_port2, 1000)
+        await history.save_sample(mock_num_port1, 2000)
+
+        save_samples_spy.assert_called_once_with(
+            "value_history", [("nid1", 1000, 5.0), ("nid2", 1000, 6.0), ("nid1", 2000, 5.0)]
+        )
+        assert history._pending_samples == []
+
+    async def test_unbuffered(self, mock_persist_driver, mock_num_port1, mocker):
+        """Should persist samples right away when buffering is disabled."""
+
+        mocker.patch.object(settings.core, "history_buffer_age", 0)
+        save_samples_spy = mocker.spy(persist, "save_samples")
+        mock_num_port1.set_last_read_value(5)
+
+        await history.save_sample(mock_num_port1, 1000)
+
+        save_samples_spy.assert_called_once_with("value_history", [("nid1", 1000, 5.0)])
+
+    async def test_flush_before_query(self, mock_persist_driver, mock_num_port1, mocker):
+        """Should persist buffered samples before querying the history of their port."""
+
+        mocker.patch.object(settings.core, "history_buffer_size", 10)
+        mock_num_port1.set_last_read_value(5)
+
+        await history.save_sample(mock_num_port1, 1000)
+        samples = list(await history.get_samples_slice(mock_num_port1))
+
+        assert samples == [(1000, 5)]
+        assert history._pending_samples == []
+
+    async def test_flush_failure(self, mock_persist_driver, mock_num_port1, mocker):
+        """Should keep buffered samples upon a failed flush, dropping the oldest ones beyond the buffer size."""
+
+        mocker.patch.object(settings.core, "history_buffer_size", 3)
+        mocker.patch.object(persist, "save_samples", side_effect=Exception("db down"))
+        mock_num_port1.set_last_read_value(5)
+
+        await history.save_sample(mock_num_port1, 1000)
+        await history.save_sample(mock_num_port1, 2000)
+        with pytest.raises(Exception, match="db down"):
+            await history.save_sample(mock_num_port1, 3000)
+        assert [s[1] for s in history._pending_samples] == [1000, 2000, 3000]
+
+        with pytest.raises(Exception, match="db down"):
+            await history.save_sample(mock_num_port1, 4000)
+        assert [s[1] for s in history._pending_samples] == [2000, 3000, 4000]
+
+    async def test_flush_on_cleanup(self, mock_persist_driver, mock_num_port1, mocker):
+        """Should persist buffered samples upon cleanup."""
+
+        mocker.patch.object(settings.core, "history_buffer_size", 10)
+        save_samples_spy = mocker.spy(persist, "save_samples")
+        mock_num_port1.set_last_read_value(5)
+
+        await history.save_sample(mock_num_port1, 1000)
+        await history.cleanup()
+
+        save_samples_spy.assert_called_once_with("value_history", [("nid1", 1000, 5.0)])
+
+
+class TestRecentSamples:
+    async def test_slice_from_memory(self, mock_persist_driver, mock_num_port1, mocker):
+        """Should answer queries within the recent samples window without reaching the persisted history."""
+
+        get_samples_slice_spy = mocker.spy(persist, "get_samples_slice")
+        for i in range(1, 6):
+            mock_num_port1.set_last_read_value(i)
+            await history.save_sample(mock_num_port1, i * 1000)
+
+        assert list(await history.get_samples_slice(mock_num_port1, 2000, 5000)) == [(2000, 2), (3000, 3), (4000, 4)]
+        assert list(await history.get_samples_slice(mock_num_port1, 1000, limit=2, sort_desc=True)) == [
+            (5000, 5),
+            (4000, 4),
+        ]
+        get_samples_slice_spy.assert_not_called()
+
+    async def test_slice_outside_window(self, mock_persist_driver, mock_num_port1, mocker):
+        """Should query the persisted history for queries reaching before the recent samples window."""
+
+        mocker.patch.object(settings.core, "history_recent_samples", 2)
+        get_samples_slice_spy = mocker.spy(persist, "get_samples_slice")
+        for i in range(1, 6):
+            mock_num_port1.set_last_read_value(i)
+            await history.save_sample(mock_num_port1, i * 1000)
+
+        assert len(history._recent_samples["nid1"]) == 3
+
+        assert list(await history.get_samples_slice(mock_num_port1, 3000)) == [(3000, 3), (4000, 4), (5000, 5)]
+        get_samples_slice_spy.assert_not_called()
+
+        assert list(await history.get_samples_slice(mock_num_port1, 2000)) == [
+            (2000, 2),
+            (3000, 3),
+            (4000, 4),
+            (5000, 5),
+        ]
+        get_samples_slice_spy.assert_called_once()
+
+    async def test_by_timestamp_from_memory(self, mock_persist_driver, mock_num_port1, mocker):
+        """Should look up samples by timestamp in memory, when covered by recent samples."""
+
+        get_samples_by_timestamp_spy = mocker.spy(persist, "get_samples_by_timestamp")
+        mock_num_port1.set_last_read_value(1)
+        await history.save_sample(mock_num_port1, 1000)
+        mock_num_port1.set_last_read_value(2)
+        await history.save_sample(mock_num_port1, 2000)
+
+        samples = list(await history.get_samples_by_timestamp(mock_num_port1, [2500, 1500]))
+        assert samples == [{"timestamp": 2500, "value": 2}, {"timestamp": 1500, "value": 1}]
+        get_samples_by_timestamp_spy.assert_not_called()
+
+    async def test_remove(self, mock_persist_driver, mock_num_port1):
+        """Should remove samples from memory along with the persisted ones."""
+
+        for i in range(1, 6):
+            mock_num_port1.set_last_read_value(i)
+            await history.save_sample(mock_num_port1, i * 1000)
+
+        await history.remove_samples([mock_num_port1], from_timestamp=2000, to_timestamp=4000)
+        assert list(await history.get_samples_slice(mock_num_port1, 1000)) == [(1000, 1), (4000, 4), (5000, 5)]
+
+        await history.remove_samples([mock_num_port1])
+        assert "nid1" not in history._recent_samples
+
+    def test_time_backwards(self):
+        """Should no longer cover timestamps it may be missing samples for, after time went backwards."""
+
+        recent_samples = history.RecentSamples(10)
+        recent_samples.add(1000, 1)
+        recent_samples.add(2000, 2)
+        recent_samples.add(1500, 3)
+
+        assert not recent_samples.covers(1500)
+        assert not recent_samples.covers(2000)
+        assert recent_samples.covers(2001)
+        assert recent_samples.get_at(2500) is None
+
+
+class TestSamplesCache:
+    def test_lookup(self):
+        """Should return cached samples, including missing ones, and count hits and misses."""
+
+        cache = history.SamplesCache()
+        cache.add("nid1", [(1000, 1), (3000, None), (2000, 2)])
+
+        results, missed_timestamps = cache.lookup("nid1", [2000, 3000, 4000])
+        assert results == {2000: 2, 3000: None}
+        assert missed_timestamps == [4000]
+
+        results, missed_timestamps = cache.lookup("nid2", [1000])
+        assert results == {}
+        assert missed_timestamps == [1000]
+
+        assert cache.get_stats() == {"size": 3, "hits": 2, "misses": 2, "evictions": 0}
+
+    def test_evict_lru(self, mocker):
+        """Should evict least recently used ports once the cache holds too many samples."""
+
+        mocker.patch.object(settings.core, "history_cache_size", 4)
+        cache = history.SamplesCache()
+        cache.add("nid1", [(1000, 1), (2000, 2)])
+        cache.add("nid2", [(1000, 1), (2000, 2)])
+        cache.lookup("nid1", [1000])
+        cache.add("nid3", [(1000, 1)])
+
+        assert cache.lookup("nid2", [1000]) == ({}, [1000])
+        assert cache.lookup("nid1", [1000]) == ({1000: 1}, [])
+        assert cache.get_stats()["size"] == 3
+        assert cache.get_stats()["evictions"] == 2
+
+    def test_remove_from(self):
+        """Should remove cached samples looked up between the start of the removed interval and the next sample."""
+
+        cache = history.SamplesCache()
+        cache.add("nid1", [(1000, 1), (2000, 2), (3000, 3), (4000, 4)])
+        cache.remove("nid1", 2000, 3500)
+
+        assert cache.lookup("nid1", [1000, 2000, 3000, 4000]) == ({1000: 1, 4000: 4}, [2000, 3000])
+        assert cache.get_stats()["size"] == 2
+
+        cache.remove("nid1", 500, None)
+        assert cache.lookup("nid1", [1000, 4000]) == ({}, [1000, 4000])
+        assert cache.get_stats()["size"] == 0
+
+    def test_remove_older(self):
+        """Should mark cached samples looked up before the next sample as missing, when removing older samples."""
+
+        cache = history.SamplesCache()
+        cache.add("nid1", [(1000, 1), (2000, 2), (3000, 3)])
+        cache.remove("nid1", None, 2500)
+
+        assert cache.lookup("nid1", [1000, 2000, 3000]) == ({1000: None, 2000: None, 3000: 3}, [])
+        assert cache.get_stats()["size"] == 3
+
+    async def test_by_timestamp(self, mock_persist_driver, mock_num_port1, mocker):
+        """Should cache old samples looked up by timestamp, and keep them until their range is removed."""
+
+        mocker.patch.object(settings.core, "history_recent_samples", 0)
+        mock_num_port1.set_last_read_value(5)
+        await history.save_sample(mock_num_port1, 1000)
+        get_samples_by_timestamp_spy = mocker.spy(persist, "get_samples_by_timestamp")
+
+        samples = list(await history.get_samples_by_timestamp(mock_num_port1, [500, 1500]))
+        assert samples == [None, {"timestamp": 1500, "value": 5}]
+        samples = list(await history.get_samples_by_timestamp(mock_num_port1, [500, 1500]))
+        assert samples == [None, {"timestamp": 1500, "value": 5}]
+        get_samples_by_timestamp_spy.assert_called_once()
+
+        # Samples looked up after the removed interval may have been removed as well
+        await history.remove_samples([mock_num_port1], from_timestamp=1000, to_timestamp=1200)
+        assert history._samples_cache.lookup("nid1", [500, 1500]) == ({500: None}, [1500])
+        samples = list(await history.get_samples_by_timestamp(mock_num_port1, [1500]))
+        assert samples == [None]
+
+
+class TestJanitor:
+    @pytest.fixture(autouse=True)
+    def reset_janitor(self):
+        history._pending_remove_samples.clear()
+        yield
+        history._pending_remove_samples.clear()
+
+    async def test_remove_old_samples(
+        self, freezer, mock_persist_driver, mock_num_port1, mock_num_port2, dummy_utc_datetime, mocker
+    ):
+        """Should remove old samples of ports with the same retention together."""
+
+        freezer.move_to(dummy_utc_datetime)
+        now_ms = int(time.time() * 1000)
+        mocker.patch.object(mock_num_port1, "get_history_retention", return_value=3600)
+        mocker.patch.object(mock_num_port2, "get_history_retention", return_value=3600)
+        for port in (mock_num_port1, mock_num_port2):
+            port.set_last_read_value(1)
+            for hours in (3, 2, 0):
+                await history.save_sample(port, now_ms - hours * 3600 * 1000 - 1)
+        remove_samples_spy = mocker.spy(persist, "remove_samples")
+
+        assert await history.remove_old_samples() == 4
+        remove_samples_spy.assert_called_once_with("value_history", ["nid1", "nid2"], None, now_ms - 3600 * 1000)
+        assert list(await history.get_samples_slice(mock_num_port1, 0)) == [(now_ms - 1, 1)]
+
+        # Nothing is removed when there are no old samples
+        remove_samples_spy.reset_mock()
+        freezer.move_to(dummy_utc_datetime + timedelta(minutes=10))
+        assert await history.remove_old_samples() == 0
+        remove_samples_spy.assert_not_called()
+
+    async def test_remove_old_samples_chunks(
+        self, freezer, mock_persist_driver, mock_num_port1, dummy_utc_datetime, mocker
+    ):
+        """Should remove old samples in chunks of a bounded number of samples, skipping gaps in history."""
+
+        freezer.move_to(dummy_utc_datetime)
+        now_ms = int(time.time() * 1000)
+        mocker.patch.object(history, "_JANITOR_CHUNK_SIZE", 2)
+        mocker.patch.object(mock_num_port1, "get_history_retention", return_value=3600)
+        mock_num_port1.set_last_read_value(1)
+        timestamps = [now_ms - days * 86400 * 1000 for days in (300, 200, 100, 2, 1)]
+        for timestamp in timestamps:
+            await history.save_sample(mock_num_port1, timestamp)
+        remove_samples_spy = mocker.spy(persist, "remove_samples")
+
+        assert await history.remove_old_samples() == 5
+        assert [c.args[3] for c in remove_samples_spy.call_args_list] == [
+            timestamps[1] + 1,
+            timestamps[3] + 1,
+            now_ms - 3600 * 1000,
+        ]
+
+    async def test_keeps_newer_cached_samples(
+        self, freezer, mock_persist_driver, mock_num_port1, dummy_utc_datetime, mocker
+    ):
+        """Should keep cached samples looked up after the oldest remaining sample, and mark older ones as missing."""
+
+        freezer.move_to(dummy_utc_datetime)
+        now_ms = int(time.time() * 1000)
+        mocker.patch.object(settings.core, "history_recent_samples", 0)
+        mocker.patch.object(mock_num_port1, "get_history_retention", return_value=7200)
+        for minutes, value in ((180, 1), (100, 2)):
+            mock_num_port1.set_last_read_value(value)
+            await history.save_sample(mock_num_port1, now_ms - minutes * 60 * 1000)
+
+        old_timestamp = now_ms - 150 * 60 * 1000
+        new_timestamp = now_ms - 90 * 60 * 1000
+        await history.get_samples_by_timestamp(mock_num_port1, [old_timestamp, new_timestamp])
+
+        await history.remove_old_samples()
+        assert history._samples_cache.lookup("nid1", [old_timestamp, new_timestamp]) == (
+            {old_timestamp: None, new_timestamp: 2},
+            [],
+        )
+
+    async def test_remove_pending_samples(self, mock_persist_driver, mock_num_port1, mock_num_port2, mocker):
+        """Should remove samples scheduled for removal, using one removal for each interval."""
+
+        remove_samples_spy = mocker.spy(persist, "remove_samples")
+        await history.remove_samples([mock_num_port1], background=True)
+        await history.remove_samples([mock_num_port2], background=True)
+        await history.remove_samples([mock_num_port1], from_timestamp=1000, to_timestamp=2000, background=True)
+        remove_samples_spy.assert_not_called()
+
+        await history.remove_pending_samples()
+        assert remove_samples_spy.call_count == 2
+        remove_samples_spy.assert_any_call("value_history", ["nid1", "nid2"], None, None)
+        remove_samples_spy.assert_any_call("value_history", ["nid1"], 1000, 2000)
+        assert history._pending_remove_samples == []
+
+
+class TestRollups:
+    @pytest.fixture(autouse=True)
+    def enable_rollups(self, mocker):
+        mocker.patch.object(settings.core, "history_rollups", True)
+        history._rollup_buckets.clear()
+        history._rollup_starts.clear()
+        history._pending_rollup_samples.clear()
+        yield
+        history._rollup_buckets.clear()
+        history._rollup_starts.clear()
+        history._pending_rollup_samples.clear()
+
+    async def _save_samples(self, port, samples):
+        for timestamp, value in samples:
+            port.set_last_read_value(value)
+            await history.save_sample(port, timestamp)
+
+    async def test_maintained_on_write(self, mock_persist_driver, mock_num_port1):
+        """Should persist the statistics of each rollup bucket once the next bucket starts."""
+
+        await self._save_samples(mock_num_port1, [(0, 1), (20_000, 5), (40_000, 3), (60_000, 7)])
+        await history.flush_samples()
+
+        for agg, value in (("min", 1), ("max", 5), ("avg", 3), ("count", 3)):
+            samples = list(await persist.get_samples_slice(f"value_history_1m_{agg}", "nid1"))
+            assert samples == [(0, value)]
+
+        bucket = history._rollup_buckets[("nid1", "1m")]
+        assert (bucket.timestamp, bucket.min, bucket.count) == (60_000, 7, 1)
+        assert list(await persist.get_samples_slice("value_history_1h_count", "nid1")) == []
+
+    async def test_resume_partial_bucket(self, mock_persist_driver, mock_num_port1):
+        """Should persist partial rollup buckets upon cleanup and resume them on the next sample."""
+
+        await self._save_samples(mock_num_port1, [(0, 1), (20_000, 5)])
+        await history.cleanup()
+        assert history._rollup_buckets == {}
+
+        await self._save_samples(mock_num_port1, [(40_000, 3), (60_000, 7)])
+        await history.flush_samples()
+
+        assert list(await persist.get_samples_slice("value_history_1m_count", "nid1")) == [(0, 3)]
+        assert list(await persist.get_samples_slice("value_history_1m_avg", "nid1")) == [(0, 3)]
+
+    async def test_rebuild_partial_bucket(self, mock_persist_driver, mock_num_port1):
+        """Should rebuild partial rollup buckets from raw samples when restarting without cleanup."""
+
+        await self._save_samples(mock_num_port1, [(0, 1), (20_000, 5)])
+        await history.flush_samples()
+
+        # Crash: partial rollup buckets are lost
+        history._rollup_buckets.clear()
+
+        await self._save_samples(mock_num_port1, [(40_000, 3), (60_000, 7)])
+        await history.flush_samples()
+
+        for agg, value in (("min", 1), ("max", 5), ("avg", 3), ("count", 3)):
+            assert list(await persist.get_samples_slice(f"value_history_1m_{agg}", "nid1")) == [(0, value)]
+
+        bucket = history._rollup_buckets[("nid1", "1h")]
+        assert (bucket.min, bucket.max, bucket.count) == (1, 7, 4)
+
+    async def test_query_buckets(self, freezer, mock_persist_driver, mock_num_port1, mocker):
+        """Should answer bucketed queries from rollups where they are complete, and from raw samples elsewhere."""
+
+        freezer.move_to("2020-01-01T00:10:00Z")
+        now_ms = int(time.time() * 1000)
+        base = now_ms - 600_000
+        samples = [(base + i * 10_000, i % 7) for i in range(59)]
+        await self._save_samples(mock_num_port1, samples)
+        await history.flush_samples()
+
+        mocker.patch.object(settings.core, "history_rollups", False)
+        expected = {}
+        for agg in ("min", "max", "avg"):
+            expected[agg] = list(await history.get_samples_buckets(mock_num_port1, base, now_ms, 120_000, agg))
+        mocker.patch.object(settings.core, "history_rollups", True)
+
+        get_samples_buckets_spy = mocker.spy(persist, "get_samples_buckets")
+        for agg in ("min", "max", "avg"):
+            results = list(await history.get_samples_buckets(mock_num_port1, base, now_ms, 120_000, agg))
+            assert results == pytest.approx(expected[agg])
+
+        assert any(c.args[0] == "value_history_1m_max" for c in get_samples_buckets_spy.call_args_list)
+
+        results = list(await history.get_samples_buckets(mock_num_port1, base, now_ms, 120_000, "max", limit=2))
+        assert results == expected["max"][:2]
+
+    async def test_first_last_use_raw_samples(self, mock_persist_driver, mock_num_port1, mocker):
+        """Should aggregate raw samples for aggregations that rollups don't maintain."""
+
+        await self._save_samples(mock_num_port1, [(0, 1), (60_000, 2), (120_000, 3)])
+        get_samples_buckets_spy = mocker.spy(persist, "get_samples_buckets")
+
+        results = list(await history.get_samples_buckets(mock_num_port1, 0, 180_000, 60_000, "last"))
+        assert results == [(0, 1), (60_000, 2), (120_000, 3)]
+        get_samples_buckets_spy.assert_called_once_with("value_history", "nid1", 0, 180_000, 60_000, "last", None)
+
+    async def test_remove(self, mock_persist_driver, mock_num_port1):
+        """Should remove the rollups touched by removed samples."""
+
+        await self._save_samples(mock_num_port1, [(0, 1), (60_000, 2), (120_000, 3)])
+        await history.remove_samples([mock_num_port1], from_timestamp=90_000)
+
+        assert list(await persist.get_samples_slice("value_history_1m_count", "nid1")) == [(0, 1)]
+        assert ("nid1", "1m") not in history._rollup_buckets
+
+        # Removed buckets must not be persisted again
+        await history.flush_samples()
+        assert list(await persist.get_samples_slice("value_history_1m_count", "nid1")) == [(0, 1)]
+
+        await history.remove_samples([mock_num_port1])
+        assert list(await persist.get_samples_slice("value_history_1m_count", "nid1")) == []
+        assert ("nid1", "1m") not in history._rollup_buckets
+
+    async def test_remove_background(self, mock_persist_driver, mock_num_port1, mocker):
+        """Should remove rollups only once, along with the raw samples, when removing in background."""
+
+        history._pending_remove_samples.clear()
+        await self._save_samples(mock_num_port1, [(0, 1), (60_000, 2), (120_000, 3)])
+        remove_samples_spy = mocker.spy(persist, "remove_samples")
+
+        await history.remove_samples([mock_num_port1], background=True)
+        remove_samples_spy.assert_not_called()
+
+        await history.remove_pending_samples()
+        collections = [c.args[0] for c in remove_samples_spy.call_args_list]
+        assert collections.count("value_history") == 1
+        assert collections.count("value_history_1m_count") == 1
+        assert list(await persist.get_samples_slice("value_history_1m_count", "nid1")) == []
+
+    async def test_remove_old_rollups(self, freezer, mock_persist_driver, mock_num_port1, mocker):
+        """Should remove rollups older than the retention of their level."""
+
+        freezer.move_to("2020-01-01T00:10:00Z")
+        now_ms = int(time.time() * 1000)
+        mocker.patch.object(settings.core, "history_rollup_1m_retention", 300)
+        await self._save_samples(mock_num_port1, [(now_ms - 540_000, 1), (now_ms - 120_000, 2), (now_ms, 3)])
+
+        assert await history.remove_old_rollups() == 4
+        assert list(await persist.get_samples_slice("value_history_1m_count", "nid1")) == [(now_ms - 120_000, 1)]
@@ -1,3 +1,4 @@
+import asyncio
 import time
 
 from datetime import datetime, timedelta
@@ -5,6 +6,7 @@ from unittest.mock import MagicMock
 
 import pytest
 
+from qtoggleserver.conf import settings
 from qtoggleserver.core import events as core_events
 from qtoggleserver.core import main as core_main
 from qtoggleserver.core import ports as core_ports
@@ -250,6 +252,166 @@ class TestReadPorts:
         spy_handle_value_changes.assert_called_once_with({DEP_ASAP}, int(time.time() * 1000))
 
 
+class TestConcurrentRead:
+    @pytest.fixture(autouse=True)
+    def reset_read_errors(self):
+        """Clear the set of ports with read errors before and after each test."""
+        core_main._ports_with_read_error.clear()
+        yield
+        core_main._ports_with_read_error.clear()
+
+    async def test_reads_ports_concurrently(self, mocker, mock_num_port1, mock_num_port2):
+        """Should have all port reads in flight at the same time, instead of awaiting them one after another."""
+
+        in_flight = 0
+        max_in_flight = 0
+
+        async def slow_read_value():
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return 10
+
+        mocker.patch.object(mock_num_port1, "read_value", side_effect=slow_read_value)
+        mocker.patch.object(mock_num_port2, "read_value", side_effect=slow_read_value)
+
+        await read_ports()
+        assert max_in_flight == 2
+        assert mock_num_port1.get_last_read_value() == 10
+        assert mock_num_port2.get_last_read_value() == 10
+
+    async def test_concurrency_limit(self, mocker, mock_num_port1, mock_num_port2):
+        """Should never have more than `port_read_concurrency` reads in flight."""
+
+        mocker.patch.object(settings.core, "port_read_concurrency", 1)
+        in_flight = 0
+        max_in_flight = 0
+
+        async def slow_read_value():
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return 10
+
+        mocker.patch.object(mock_num_port1, "read_value", side_effect=slow_read_value)
+        mocker.patch.object(mock_num_port2, "read_value", side_effect=slow_read_value)
+
+        await read_ports()
+        assert max_in_flight == 1
+
+    async def test_read_timeout_marks_read_error(self, mocker, mock_num_port1, mock_num_port2):
+        """Should give up on a port that exceeds `port_read_timeout` and retry it only later, while still processing
+        the other ports."""
+
+        mocker.patch.object(settings.core, "port_read_timeout", 10)
+
+        async def stuck_read_value():
+            await asyncio.sleep(10)
+
+        mocker.patch.object(mock_num_port1, "read_value", side_effect=stuck_read_value)
+        mock_num_port2.set_next_value(20)
+
+        await read_ports()
+        assert mock_num_port1 in core_main._ports_with_read_error
+        assert mock_num_port1.get_last_read_value() is None
+        assert mock_num_port2.get_last_read_value() == 20
+
+    async def test_read_exception_marks_read_error(self, mocker, mock_num_port1, mock_num_port2):
+        """Should add a port whose read fails to the read-error set, without affecting other ports."""
+
+        mocker.patch.object(mock_num_port1, "read_value", side_effect=ValueError("dummy"))
+        mock_num_port2.set_next_value(20)
+
+        await read_ports()
+        assert mock_num_port1 in core_main._ports_with_read_error
+        assert mock_num_port2 not in core_main._ports_with_read_error
+        assert mock_num_port2.get_last_read_value() == 20
+
+    async def test_read_cancelled_propagates(self, mocker, mock_num_port1):
+        """Should re-raise a cancelled port read, instead of treating it as a read error."""
+
+        mocker.patch.object(mock_num_port1, "read_value", side_effect=asyncio.CancelledError())
+
+        with pytest.raises(asyncio.CancelledError):
+            await read_ports()
+        assert mock_num_port1 not in core_main._ports_with_read_error
+
+    async def test_skip_read_not_marked_as_error(self, mock_num_port1):
+        """Should not consider `SkipRead` a read error."""
+
+        await read_ports()
+        assert mock_num_port1 not in core_main._ports_with_read_error
+
+    async def test_value_changes_triggered_in_port_order(self, mocker, mock_num_port1, mock_num_port2):
+        """Should trigger value-change events in port order, regardless of which read finishes first."""
+
+        async def slow_read_value():
+            await asyncio.sleep(0.01)
+            return 10
+
+        mocker.patch.object(mock_num_port1, "read_value", side_effect=slow_read_value)
+        mock_num_port2.set_next_value(20)
+        triggered = []
+        mocker.patch.object(
+            mock_num_port1, "trigger_value_change", side_effect=lambda *a: triggered.append(mock_num_port1)
+        )
+        mocker.patch.object(
+            mock_num_port2, "trigger_value_change", side_effect=lambda *a: triggered.append(mock_num_port2)
+        )
+
+        await read_ports(ports_to_read=[mock_num_port1, mock_num_port2])
+        assert triggered == [mock_num_port1, mock_num_port2]
+
+
+class TestNotifiedPorts:
+    @pytest.fixture(autouse=True)
+    def reset_notified_ports(self):
+        """Clear the set of notified ports before and after each test."""
+        core_main._notified_ports.clear()
+        yield
+        core_main._notified_ports.clear()
+
+    async def test_not_polled(self, mocker, mock_num_port1, mock_num_port2):
+        """Should not read ports that aren't polled, unless they notified a new value."""
+
+        mocker.patch.object(mock_num_port1, "POLLED", False)
+        mock_num_port1.set_next_value(10)
+        mock_num_port2.set_next_value(20)
+
+        await read_ports()
+        assert mock_num_port1.get_last_read_value() is None
+        assert mock_num_port2.get_last_read_value() == 20
+
+    async def test_notified(self, mocker, mock_num_port1):
+        """Should read a port that isn't polled once, after it notified a new value."""
+
+        mocker.patch.object(mock_num_port1, "POLLED", False)
+        read_value_spy = mocker.spy(mock_num_port1, "read_value")
+        mock_num_port1.set_next_value(10)
+        mock_num_port1.notify_value()
+
+        await read_ports()
+        await read_ports()
+        assert mock_num_port1.get_last_read_value() == 10
+        read_value_spy.assert_called_once()
+
+    async def test_heart_beat(self, freezer, mocker, mock_num_port1, dummy_utc_datetime):
+        """Should keep calling `heart_beat_second()` for ports that aren't polled."""
+
+        mocker.patch.object(mock_num_port1, "POLLED", False)
+        freezer.move_to(dummy_utc_datetime)
+        await read_ports()
+        heart_beat_spy = mocker.spy(mock_num_port1, "heart_beat_second")
+
+        freezer.move_to(dummy_utc_datetime + timedelta(seconds=1))
+        await read_ports()
+        heart_beat_spy.assert_called_once()
+
+
 class TestHandleChanges:
     async def test_self_port_value_trigger_eval(self, mocker, mock_num_port1):
         """Should trigger a port's expression evaluation if the expression depends on itself through `$`."""
@@ -366,6 +528,27 @@ class TestHandleChanges:
         )
         mock_num_port1.eval_and_push_write.assert_not_called()
 
+    async def test_context_built_with_evaluated_deps(self, mocker, mock_num_port1, mock_num_port2):
+        """Should build the evaluation context only for the deps of the expressions that are about to be evaluated."""
+
+        mock_num_port1.set_expression("ADD($nid2, $nid2:min)")
+        mock_num_port2.set_expression("ADD(#:uptime, 1)")
+        mocker.patch.object(mock_num_port1, "eval_and_push_write")
+        mocker.patch.object(mock_num_port2, "eval_and_push_write")
+        spy = mocker.spy(core_main.expressions_utils, "build_context")
+
+        await _eval_changed_expressions(changes={"$nid2"}, now_ms=0)
+        spy.assert_called_once_with(0, {"$nid2", "$nid2:"})
+        mock_num_port2.eval_and_push_write.assert_not_called()
+
+    async def test_context_not_built_without_evals(self, mocker, mock_num_port1):
+        """Should not build any evaluation context when no expression needs to be evaluated."""
+
+        spy = mocker.spy(core_main.expressions_utils, "build_context")
+
+        await _eval_changed_expressions(changes={"$nid2"}, now_ms=0)
+        spy.assert_not_called()
+
 
 class TestForceEvalExpressions:
     @pytest.fixture(autouse=True)
@@ -952,3 +1135,129 @@ class TestAttrChangeHandler:
         await _eval_changed_expressions(changes={"#slave1:"}, now_ms=0)
 
         mock_num_port1.eval_and_push_write.assert_called_once()
+
+
+class TestScheduler:
+    @pytest.fixture(autouse=True)
+    def reset_scheduler(self):
+        """Start each test with no scheduled deadlines and no pending wake-up."""
+
+        core_main._deadlines.clear()
+        core_main._scheduled_deadlines.clear()
+        core_main._wake_up_event = None
+        core_main._wake_up_requested = False
+        yield
+        core_main._deadlines.clear()
+        core_main._scheduled_deadlines.clear()
+        core_main._wake_up_event = None
+        core_main._wake_up_requested = False
+
+    def test_schedule_dedup(self):
+        """Should keep each deadline once and the earliest one at the top of the heap."""
+
+        core_main.schedule(3000)
+        core_main.schedule(1000)
+        core_main.schedule(3000)
+        core_main.schedule(2000)
+
+        assert sorted(core_main._deadlines) == [1000, 2000, 3000]
+        assert core_main._deadlines[0] == 1000
+
+    def test_due_work_polled_port(self, mocker, mock_num_port1):
+        """Should schedule the next tick while there are enabled ports to read."""
+
+        mocker.patch.object(settings.core, "tick_interval", 50)
+        core_main._schedule_due_work(10_000)
+
+        assert 10_050 in core_main._scheduled_deadlines
+
+    async def test_due_work_tracks_polled_ports(self, mocker, mock_num_port1):
+        """Should only schedule the next tick while polled ports are enabled and present."""
+
+        mocker.patch.object(settings.core, "tick_interval", 50)
+        await mock_num_port1.disable()
+        core_main._schedule_due_work(10_000)
+        assert core_main._scheduled_deadlines == set()
+
+        await mock_num_port1.enable()
+        core_main._schedule_due_work(10_000)
+        assert core_main._scheduled_deadlines == {10_050}
+
+        core_main._scheduled_deadlines.clear()
+        await mock_num_port1.remove(persisted_data=False)
+        core_main._schedule_due_work(10_000)
+        assert core_main._scheduled_deadlines == set()
+
+    async def test_due_work_not_polled_port(self, mocker, mock_num_port1):
+        """Should not schedule the next tick for ports that aren't polled."""
+
+        mocker.patch.object(settings.core, "tick_interval", 50)
+        await mock_num_port1.disable()
+        mocker.patch.object(mock_num_port1, "POLLED", False)
+        await mock_num_port1.enable()
+        core_main._schedule_due_work(10_000)
+
+        assert core_main._scheduled_deadlines == set()
+
+    def test_due_work_read_error(self, freezer, mocker, mock_num_port1):
+        """Should schedule the read retry, not the next tick, for ports that failed to read."""
+
+        freezer.move_to(datetime.fromtimestamp(10.5))
+        mocker.patch.object(settings.core, "tick_interval", 50)
+        mocker.patch.object(core_main, "_ports_with_read_error", core_main.timedset.TimedSet(10))
+        core_main._ports_with_read_error.add(mock_num_port1)
+        core_main._schedule_due_work(10_500)
+
+        assert core_main._scheduled_deadlines == {20_500}
+
+    async def test_due_work_time_deps(self, mock_num_port1):
+        """Should schedule the next second boundary for ports depending on seconds, and the next minute boundary
+        for ports depending on minutes."""
+
+        mock_num_port1.set_writable(True)
+        mock_num_port1.set_expression("SECOND()")
+        await mock_num_port1.disable()
+        core_main._schedule_due_work(10_300)
+        assert core_main._scheduled_deadlines == {11_000}
+
+        core_main._scheduled_deadlines.clear()
+        mock_num_port1.set_expression("MINUTE()")
+        core_main._schedule_due_work(10_300)
+        assert core_main._scheduled_deadlines == {60_000}
+
+    def test_due_work_asap_paused(self, freezer, mocker, mock_num_port1):
+        """Should schedule the end of the asap evaluation pause of an expression."""
+
+        freezer.move_to(datetime.fromtimestamp(20))
+        mock_num_port1.set_writable(True)
+        mock_num_port1.set_expression("TIMEMS()")
+        mocker.patch.object(settings.core, "tick_interval", 50)
+        mocker.patch.object(core_main, "_ports_with_read_error", core_main.timedset.TimedSet(10))
+        core_main._ports_with_read_error.add(mock_num_port1)
+        mock_num_port1.get_expression().pause_asap_eval(12_000)
+        core_main._schedule_due_work(10_000)
+
+        assert core_main._scheduled_deadlines == {12_000, 30_000}
+
+    async def test_wait_until_deadline(self, mocker):
+        """Should return once the earliest deadline is reached, dropping it from the heap."""
+
+        now_ms = int(time.time() * 1000)
+        core_main.schedule(now_ms + 20)
+        core_main.schedule(now_ms + 60_000)
+
+        await asyncio.wait_for(core_main._wait_for_due_work(), timeout=1)
+
+        assert core_main._deadlines == [now_ms + 60_000]
+
+    async def test_wake_up(self):
+        """Should return right away when woken up."""
+
+        core_main.schedule(int(time.time() * 1000) + 60_000)
+        task = asyncio.create_task(core_main._wait_for_due_work())
+        await asyncio.sleep(0.01)
+        assert not task.done()
+
+        core_main.wake_up()
+        await asyncio.wait_for(task, timeout=1)
+        assert not core_main._wake_up_requested
@@ -1,5 +1,6 @@
 import asyncio
 
+from qtoggleserver.conf import settings
 from qtoggleserver.core.expressions.exceptions import ValueUnavailable
 from qtoggleserver.core.ports import WriteRequest
 
@@ -92,6 +93,36 @@ class TestPortPushWrite:
         assert list(mock_num_port1._write_queue)[-1].value == 999
 
 
+class TestPortWriteLoop:
+    async def test_idle_does_not_poll(self, mock_num_port1, mocker):
+        """Should not wake up the write loop while the write queue stays empty."""
+
+        mocker.patch.object(settings.core, "tick_interval", 1)
+        mock_num_port1._write_queue.clear()
+        await asyncio.sleep(0)  # let the write loop reach its idle state
+        mocker.patch.object(mock_num_port1, "transform_and_write_value", new=mocker.AsyncMock())
+        wait_spy = mocker.spy(mock_num_port1._write_queue_event, "wait")
+
+        await asyncio.sleep(0.05)
+
+        wait_spy.assert_not_called()
+        mock_num_port1.transform_and_write_value.assert_not_called()
+
+    async def test_wakes_up_on_push(self, mock_num_port1, mocker):
+        """Should write a pushed value right away, without waiting for a tick."""
+
+        mock_num_port1._write_queue.clear()
+        written = asyncio.Event()
+        mocker.patch.object(
+            mock_num_port1, "transform_and_write_value", new=mocker.AsyncMock(side_effect=lambda v: written.set())
+        )
+
+        mock_num_port1.push_write(100)
+        await asyncio.wait_for(written.wait(), timeout=0.01)
+
+        mock_num_port1.transform_and_write_value.assert_called_once_with(100)
+
+
 class TestPortPushWriteAndWait:
     async def test_resolves_on_success(self, mock_num_port1, mocker):
         """Should return once the pushed value has actually been written, without raising."""
@@ -880,6 +911,57 @@ class TestLoadOne:
             assert e is expected_error
 
 
+class TestSaveMany:
+    async def test_single_batch(self, mock_num_port1, mock_num_port2, mocker):
+        """Should persist all given ports with a single `replace_many` call and clear their pending save flags."""
+        from qtoggleserver.core import ports as core_ports
+
+        replace_many_mock = mocker.patch("qtoggleserver.persist.replace_many", new=mocker.AsyncMock())
+        mock_num_port1.save_asap()
+        mock_num_port2.save_asap()
+
+        await core_ports.save_many([mock_num_port1, mock_num_port2])
+
+        replace_many_mock.assert_called_once()
+        collection, records = replace_many_mock.call_args.args
+        assert collection == "ports"
+        assert set(records) == {"nid1", "nid2"}
+        assert records["nid1"]["id"] == "nid1"
+        assert not mock_num_port1.is_pending_save()
+        assert not mock_num_port2.is_pending_save()
+
+    async def test_failure_marks_pending(self, mock_num_port1, mock_num_port2, mocker):
+        """Should mark ports for saving again when persisting their data fails."""
+        from qtoggleserver.core import ports as core_ports
+
+        mocker.patch("qtoggleserver.persist.replace_many", new=mocker.AsyncMock(side_effect=Exception("dummy")))
+        mock_num_port1.save_asap()
+        mock_num_port2.save_asap()
+
+        await core_ports.save_many([mock_num_port1, mock_num_port2])
+
+        assert mock_num_port1.is_pending_save()
+        assert mock_num_port2.is_pending_save()
+
+    async def test_waits_for_save_lock(self, mock_num_port1, mocker):
+        """Should not gather a port's data while the port is being saved on its own."""
+        from qtoggleserver.core import ports as core_ports
+
+        replace_many_mock = mocker.patch("qtoggleserver.persist.replace_many", new=mocker.AsyncMock())
+        mock_num_port1._save_lock = asyncio.locks.Lock()  # `asyncio.Lock` is mocked by port fixtures
+        mock_num_port1.save_asap()
+
+        async with mock_num_port1._save_lock:
+            task = asyncio.create_task(core_ports.save_many([mock_num_port1]))
+            await asyncio.sleep(0.01)
+            replace_many_mock.assert_not_called()
+            assert mock_num_port1.is_pending_save()
+
+        await task
+        replace_many_mock.assert_called_once()
+        assert not mock_num_port1.is_pending_save()
+
+
 class TestPortToPersisted:
     async def test_includes_id_and_history_timestamp(self, mock_num_port1):
         """to_persisted should always include id and history_last_timestamp."""
@@ -0,0 +1,87 @@
+import asyncio
+
+from qtoggleserver.conf import settings
+from qtoggleserver.core import reverse
+
+
+class TestSlots:
+    async def test_concurrent_requests(self, mocker):
+        """Should handle consumer requests concurrently, answering each of them from the slot that received it."""
+
+        mocker.patch.object(settings.reverse, "concurrency", 2)
+        rev = reverse.Reverse("http", "localhost", 8080, "/reverse", "device", "hash", 5)
+
+        requests = iter([{"session_id": "slow", "path": "/slow"}, {"session_id": "fast", "path": "/fast"}])
+        answers = []
+        blocked = asyncio.Event()
+
+        async def wait(request_dict, response_dict):
+            if response_dict:
+                answers.append((request_dict["session_id"], response_dict["body"]))
+            request = next(requests, None)
+            if request is None:
+                await blocked.wait()
+            return request
+
+        async def process_api_request(request_dict):
+            if request_dict["path"] == "/slow":
+                await asyncio.sleep(0.05)
+            return {"status": 200, "body": request_dict["path"]}
+
+        mocker.patch.object(rev, "_wait", side_effect=wait)
+        mocker.patch.object(rev, "_process_api_request", side_effect=process_api_request)
+
+        rev.enable()
+        await asyncio.sleep(0.01)
+        assert answers == [("fast", "/fast")]
+
+        await asyncio.sleep(0.1)
+        assert answers == [("fast", "/fast"), ("slow", "/slow")]
+
+        await rev.wait_stopped()
+        assert not rev.is_enabled()
+
+    async def test_unauthorized_answered_to_its_request(self, mocker):
+        """Should answer unauthorized consumer requests with 401, correlated to the rejected request."""
+
+        mocker.patch.object(settings.reverse, "concurrency", 1)
+        rev = reverse.Reverse("http", "localhost", 8080, "/reverse", "device", "hash", 5)
+
+        answers = []
+        blocked = asyncio.Event()
+
+        async def wait(request_dict, response_dict):
+            if response_dict:
+                answers.append((request_dict["session_id"], response_dict["status"]))
+                await blocked.wait()
+            raise reverse.UnauthorizedConsumerRequestError("Missing authorization header", {"session_id": "s1"})
+
+        mocker.patch.object(rev, "_wait", side_effect=wait)
+
+        rev.enable()
+        await asyncio.sleep(0.01)
+        assert answers == [("s1", 401)]
+
+        await rev.wait_stopped()
+
+    async def test_at_least_one_slot(self, mocker):
+        """Should run at least one slot, using a dedicated HTTP client that is closed once all slots stop."""
+
+        mocker.patch.object(settings.reverse, "concurrency", 0)
+        rev = reverse.Reverse("http", "localhost", 8080, "/reverse", "device", "hash", 5)
+        blocked = asyncio.Event()
+
+        async def wait(request_dict, response_dict):
+            await blocked.wait()
+
+        mocker.patch.object(rev, "_wait", side_effect=wait)
+
+        rev.enable()
+        assert len(rev._slot_tasks) == 1
+        http_client = rev._http_client
+        assert http_client is not None
+
+        close_spy = mocker.spy(http_client, "close")
+        await rev.wait_stopped()
+        close_spy.assert_called()
+        assert rev._http_client is None
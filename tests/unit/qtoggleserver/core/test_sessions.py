@@ -1,28 +1,25 @@
 import asyncio
 
-from collections import deque
+from collections import OrderedDict
 
 import pytest
 
+from qtoggleserver.core import events as core_events
+from qtoggleserver.core import sessions as core_sessions
 from qtoggleserver.core.sessions import Session
 
 
 class MockEvent:
-    """A simple event stub with configurable duplicate behavior."""
+    """A simple event stub with a configurable dedup key."""
 
     REQUIRED_ACCESS = 0
 
-    def __init__(self, name: str, duplicate_of: MockEvent | list[MockEvent] | None = None) -> None:
+    def __init__(self, name: str, dedup_key: str | None = None) -> None:
         self.name = name
-        if duplicate_of is None:
-            self._duplicate_of: list[MockEvent] = []
-        elif isinstance(duplicate_of, list):
-            self._duplicate_of = duplicate_of
-        else:
-            self._duplicate_of = [duplicate_of]
+        self._dedup_key = dedup_key
 
-    def is_duplicate(self, other: MockEvent) -> bool:
-        return other in self._duplicate_of or self in other._duplicate_of
+    def get_dedup_key(self) -> str | None:
+        return self._dedup_key
 
     def __repr__(self) -> str:
         return f"MockEvent({self.name!r})"
@@ -146,51 +143,45 @@ class TestSessionPush:
 
         e = MockEvent("e1")
         session.push(e)
-        assert e in session.queue
+        assert e in session.queue.values()
 
-    def test_multiple_events_newest_first(self, session):
-        """Should queue events with the newest at the front."""
+    def test_multiple_events_oldest_first(self, session):
+        """Should queue events with the newest at the end."""
 
         e1 = MockEvent("e1")
         e2 = MockEvent("e2")
         session.push(e1)
         session.push(e2)
-        assert list(session.queue) == [e2, e1]
+        assert list(session.queue.values()) == [e1, e2]
 
     def test_duplicate_is_dropped(self, session):
         """Should remove the existing event when a duplicate is pushed."""
 
-        e1 = MockEvent("e1")
-        e2 = MockEvent("e2", duplicate_of=e1)
+        e1 = MockEvent("e1", dedup_key="k")
+        e2 = MockEvent("e2", dedup_key="k")
         session.push(e1)
         session.push(e2)
-        assert len(session.queue) == 1
-        assert e2 in session.queue
-        assert e1 not in session.queue
+        assert list(session.queue.values()) == [e2]
 
-    def test_multiple_duplicates_all_dropped(self, session):
-        """Should remove all existing events that the new event considers duplicates of."""
+    def test_duplicate_moves_to_end(self, session):
+        """Should queue the new event after the other events, in place of its duplicate."""
 
-        e1 = MockEvent("e1")
+        e1 = MockEvent("e1", dedup_key="k")
         e2 = MockEvent("e2")
-        e3 = MockEvent("e3", duplicate_of=[e1, e2])
+        e3 = MockEvent("e3", dedup_key="k")
         session.push(e1)
         session.push(e2)
         session.push(e3)
-        assert len(session.queue) == 1
-        assert e3 in session.queue
-        assert e1 not in session.queue
-        assert e2 not in session.queue
+        assert list(session.queue.values()) == [e2, e3]
 
     def test_non_duplicate_is_not_dropped(self, session):
         """Should keep a non-duplicate event in the queue when a new event is pushed."""
 
-        e1 = MockEvent("e1")
-        e2 = MockEvent("e2")
+        e1 = MockEvent("e1", dedup_key="k1")
+        e2 = MockEvent("e2", dedup_key="k2")
         session.push(e1)
         session.push(e2)
-        assert e1 in session.queue
-        assert e2 in session.queue
+        assert list(session.queue.values()) == [e1, e2]
 
     def test_queue_size_limit_drops_oldest(self, session, mocker):
         """Should drop the oldest event when the queue is full."""
@@ -204,11 +195,122 @@ class TestSessionPush:
         session.push(e2)
         session.push(e3)
         session.push(e4)
-        assert len(session.queue) == 3
-        assert e1 not in session.queue  # e1 is the oldest, dropped first
-        assert e4 in session.queue
+        assert list(session.queue.values()) == [e2, e3, e4]  # e1 is the oldest, dropped first
+
+    def test_queue_uses_ordered_dict(self, session):
+        """Queue should be an ordered dict instance."""
+
+        assert isinstance(session.queue, OrderedDict)
+
 
-    def test_queue_uses_deque(self, session):
-        """Queue should be a deque instance."""
+class TestSessionStreaming:
+    async def test_stream_event_set_on_push(self, session):
+        """Should signal queued events to the streaming connection, and let it take them."""
+
+        e1 = MockEvent("e1")
+        session.push(e1)
+        stream_event = session.start_streaming(timeout=30, access_level=0)
+        assert stream_event.is_set()
+
+        assert session.take_events() == [e1]
+        assert not stream_event.is_set()
+
+        e2 = MockEvent("e2")
+        session.push(e2)
+        assert stream_event.is_set()
+        assert session.take_events() == [e2]
 
-        assert isinstance(session.queue, deque)
+    async def test_responds_to_pending_request(self, session):
+        """Should respond to a pending listening request when starting to stream."""
+
+        future = session.reset_and_wait(timeout=30, access_level=0)
+        session.start_streaming(timeout=30, access_level=0)
+        assert future.done()
+
+    async def test_not_updated_while_streaming(self, session, mocker):
+        """Should neither respond to nor expire streaming sessions upon update."""
+
+        mocker.patch.dict(core_sessions._sessions_by_id, {session.id: session})
+        stream_event = session.start_streaming(timeout=1, access_level=0)
+        session.accessed = 0
+        session.push(MockEvent("e1"))
+
+        core_sessions.update()
+        assert not session.is_empty()
+        assert session.id in core_sessions._sessions_by_id
+        assert core_sessions.get_next_update_time() is None
+
+        session.stop_streaming(stream_event)
+        assert not session.is_streaming()
+        assert core_sessions.get_next_update_time() == session.accessed + 10
+
+    async def test_stop_previous_stream(self, session):
+        """Should keep streaming to a newer connection when an older one stops."""
+
+        old_stream_event = session.start_streaming(timeout=30, access_level=0)
+        new_stream_event = session.start_streaming(timeout=30, access_level=0)
+        session.stop_streaming(old_stream_event)
+        assert session.is_streaming()
+
+        session.push(MockEvent("e1"))
+        assert new_stream_event.is_set()
+
+
+class TestSessionsEventHandler:
+    @pytest.fixture(autouse=True)
+    def reset_sessions(self):
+        core_sessions._sessions_by_id.clear()
+        core_sessions._sessions_by_access_level.clear()
+        yield
+        core_sessions._sessions_by_id.clear()
+        core_sessions._sessions_by_access_level.clear()
+
+    async def test_pushes_by_access_level(self):
+        """Should push events only to sessions whose access level is high enough, following access level changes."""
+
+        handler = core_sessions.SessionsEventHandler(core_sessions._sessions_by_access_level)
+        session1 = core_sessions.get("s1")
+        session2 = core_sessions.get("s2")
+        session1.reset_and_wait(timeout=30, access_level=10)
+        session1.cancel()
+        session2.reset_and_wait(timeout=30, access_level=30)
+        session2.cancel()
+
+        event = MockEvent("e1")
+        event.REQUIRED_ACCESS = 20
+        await handler.handle_event(event)
+        assert session1.is_empty()
+        assert list(session2.queue.values()) == [event]
+
+        session1.reset_and_wait(timeout=30, access_level=30)
+        session1.cancel()
+        session2.reset_and_wait(timeout=30, access_level=10)
+        session2.cancel()
+        session2.queue.clear()
+        await handler.handle_event(event)
+        assert list(session1.queue.values()) == [event]
+        assert session2.is_empty()
+
+
+class TestEventJSONFragment:
+    async def test_encoded_once(self, mocker):
+        """Should encode the event only once, no matter how many sessions it is served to."""
+
+        event = core_events.Event()
+        await event.init_params()
+        to_json_spy = mocker.spy(event, "to_json")
+
+        assert await event.to_json_fragment() == '{"type": "base-event", "params": {}}'
+        assert await event.to_json_fragment() == '{"type": "base-event", "params": {}}'
+        to_json_spy.assert_called_once()
+
+    def test_dedup_key(self):
+        """Should consider events with the same dedup key duplicates, and events without one unique."""
+
+        event1 = core_events.Event()
+        event2 = core_events.Event()
+        assert not event1.is_duplicate(event2)
+
+        event1.get_dedup_key = lambda: "k"
+        event2.get_dedup_key = lambda: "k"
+        assert event1.is_duplicate(event2)
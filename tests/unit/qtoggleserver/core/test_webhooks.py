@@ -0,0 +1,163 @@
+import asyncio
+
+from io import BytesIO
+
+import pytest
+
+from tornado.httpclient import HTTPRequest, HTTPResponse
+
+from qtoggleserver.conf import settings
+from qtoggleserver.core import api as core_api
+from qtoggleserver.core import events as core_events
+from qtoggleserver.core import webhooks
+from qtoggleserver.core.device import attrs as core_device_attrs
+from qtoggleserver.utils import json as json_utils
+
+
+async def make_response(request: HTTPRequest, code: int) -> HTTPResponse:
+    body = b"" if code == 200 else b'{"error": "failed"}'
+    return HTTPResponse(request, code, buffer=BytesIO(body))
+
+
+@pytest.fixture
+async def mock_webhooks(mocker):
+    mocker.patch.object(settings.webhooks, "concurrency", 1)
+    mocker.patch.object(settings.webhooks, "retry_backoff", 1)
+    mocker.patch.object(core_device_attrs, "normal_password_hash", core_device_attrs.EMPTY_PASSWORD_HASH)
+    hooks = webhooks.Webhooks("http", "localhost", 8080, "/hook", 5, 2)
+    hooks.enable()
+    fetch_mock = mocker.patch.object(hooks._http_client, "fetch", autospec=True)
+    fetch_mock.side_effect = lambda request, **kwargs: make_response(request, 200)
+    hooks.fetch_mock = fetch_mock
+
+    yield hooks
+
+    await hooks.wait_stopped()
+
+
+async def wait_idle(hooks: webhooks.Webhooks) -> None:
+    for _ in range(100):
+        await asyncio.sleep(0.005)
+        if not hooks.get_stats()["queue_size"] and hooks.fetch_mock.call_count:
+            await asyncio.sleep(0.005)
+            return
+
+
+class TestDelivery:
+    async def test_single_events(self, mock_webhooks):
+        """Should send each event in its own request, when not batching."""
+
+        mock_webhooks.call({"type": "e1"})
+        mock_webhooks.call('{"type": "e2"}')
+        await wait_idle(mock_webhooks)
+
+        bodies = [c.args[0].body for c in mock_webhooks.fetch_mock.call_args_list]
+        assert bodies == [b'{"type": "e1"}', b'{"type": "e2"}']
+        assert mock_webhooks.get_stats()["sent"] == 2
+
+    async def test_batched_events(self, mock_webhooks, mocker):
+        """Should send events that gather within the batch window in a single request."""
+
+        mocker.patch.object(settings.webhooks, "batch_size", 10)
+        mocker.patch.object(settings.webhooks, "batch_window", 20)
+        await mock_webhooks.wait_stopped()
+        mock_webhooks.enable()
+        mocker.patch.object(mock_webhooks._http_client, "fetch", new=mock_webhooks.fetch_mock)
+
+        for i in range(3):
+            mock_webhooks.call({"type": f"e{i}"})
+        await asyncio.sleep(0.05)
+
+        mock_webhooks.fetch_mock.assert_called_once()
+        body = json_utils.loads(mock_webhooks.fetch_mock.call_args.args[0].body)
+        assert body == [{"type": "e0"}, {"type": "e1"}, {"type": "e2"}]
+
+    async def test_retry(self, mock_webhooks):
+        """Should retry failed requests, up to the configured number of retries."""
+
+        codes = iter([500, 500, 200])
+        mock_webhooks.fetch_mock.side_effect = lambda request, **kwargs: make_response(request, next(codes))
+
+        mock_webhooks.call({"type": "e1"})
+        await asyncio.sleep(0.05)
+
+        assert mock_webhooks.fetch_mock.call_count == 3
+        stats = mock_webhooks.get_stats()
+        assert stats["sent"] == 1
+        assert stats["retried"] == 2
+        assert stats["failed"] == 0
+
+    async def test_connection_error(self, mock_webhooks):
+        """Should retry requests that fail to connect, and count them as failed once out of retries."""
+
+        async def fetch(request, **kwargs):
+            raise ConnectionRefusedError()
+
+        mock_webhooks.fetch_mock.side_effect = fetch
+
+        mock_webhooks.call({"type": "e1"})
+        await asyncio.sleep(0.05)
+
+        assert mock_webhooks.fetch_mock.call_count == 3
+        stats = mock_webhooks.get_stats()
+        assert stats["retried"] == 2
+        assert stats["failed"] == 1
+
+    async def test_queue_full(self, mock_webhooks, mocker):
+        """Should drop events once the queue is full, and count them."""
+
+        mocker.patch.object(settings.core, "event_queue_size", 2)
+        for i in range(4):
+            mock_webhooks.call({"type": f"e{i}"})
+
+        assert mock_webhooks.get_stats()["dropped"] == 2
+
+    async def test_reuses_auth_header(self, mock_webhooks):
+        """Should sign the authorization header once for successive requests."""
+
+        mock_webhooks.call({"type": "e1"})
+        mock_webhooks.call({"type": "e2"})
+        await wait_idle(mock_webhooks)
+
+        headers = [c.args[0].headers["Authorization"] for c in mock_webhooks.fetch_mock.call_args_list]
+        assert headers[0] == headers[1]
+
+    async def test_stats_logged(self, mock_webhooks, mocker):
+        """Should periodically log delivery statistics, but only after some activity."""
+
+        mocker.patch.object(webhooks, "_STATS_LOG_INTERVAL", 0.01)
+        await mock_webhooks.wait_stopped()
+        mock_webhooks.enable()
+        mocker.patch.object(mock_webhooks._http_client, "fetch", new=mock_webhooks.fetch_mock)
+        info_mock = mocker.patch.object(webhooks.logger, "info")
+        await asyncio.sleep(0.02)
+        info_mock.assert_not_called()
+
+        mock_webhooks.call({"type": "e1"})
+        await asyncio.sleep(0.05)
+
+        assert '"sent": 1' in info_mock.call_args.args[-1]
+        call_count = info_mock.call_count
+
+        await asyncio.sleep(0.05)
+        assert info_mock.call_count == call_count
+
+
+class TestEventHandler:
+    async def test_access_level(self, mock_webhooks, mocker):
+        """Should only deliver events accessible to the normal user."""
+
+        mocker.patch.object(webhooks, "_webhooks", mock_webhooks)
+        handler = webhooks.WebhooksEventHandler()
+
+        event = core_events.Event()
+        await event.init_params()
+        await handler.handle_event(event)
+
+        admin_event = core_events.Event()
+        admin_event.REQUIRED_ACCESS = core_api.ACCESS_LEVEL_ADMIN
+        await admin_event.init_params()
+        await handler.handle_event(admin_event)
+
+        await wait_idle(mock_webhooks)
+        mock_webhooks.fetch_mock.assert_called_once()
@@ -34,7 +34,7 @@ class MockPort(Port):
     def set_expression(self, sexpression: str) -> None:
         expression = core_expressions.parse(self.get_id(), sexpression, role=core_expressions.Role.VALUE)
         self._expression = expression
-        expressions_utils.invalidate_deps_map()
+        expressions_utils.update_port_deps(self)
 
 
 class MockBooleanPort(MockPort):
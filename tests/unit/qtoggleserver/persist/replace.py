@@ -109,3 +109,40 @@ async def test_replace_no_match_custom_id(driver: BaseDriver) -> None:
 
     assert results[0] == dict(data.RECORD1, id=id1)
     assert results[1] == dict(data.RECORD2, id=id2)
+
+
+async def test_replace_many(driver: BaseDriver) -> None:
+    id1 = await driver.insert(data.COLL1, data.RECORD1)
+    id2 = await driver.insert(data.COLL1, data.RECORD2)
+
+    new_record = {"field1": "one", "int_key": 0}
+    await driver.replace_many(data.COLL1, records={id1: new_record, data.CUSTOM_ID_SIMPLE: data.RECORD3})
+
+    results = await driver.query(data.COLL1, fields=None, filt={}, sort=[("int_key", False)], limit=None)
+    results = list(results)
+    assert len(results) == 3
+
+    assert results[0] == dict(new_record, id=id1)
+    assert results[1] == dict(data.RECORD2, id=id2)
+    assert results[2] == dict(data.RECORD3, id=data.CUSTOM_ID_SIMPLE)
+
+
+async def test_replace_many_custom_id_complex(driver: BaseDriver) -> None:
+    await driver.insert(data.COLL1, dict(data.RECORD1, id=data.CUSTOM_ID_COMPLEX))
+
+    new_record = {"field1": "one", "int_key": 0}
+    await driver.replace_many(data.COLL1, records={data.CUSTOM_ID_COMPLEX: dict(new_record, id="16384")})
+
+    results = await driver.query(data.COLL1, fields=None, filt={}, sort=[("int_key", False)], limit=None)
+    results = list(results)
+    assert len(results) == 1
+    assert results[0] == dict(new_record, id=data.CUSTOM_ID_COMPLEX)
+
+
+async def test_replace_many_empty(driver: BaseDriver) -> None:
+    id1 = await driver.insert(data.COLL1, data.RECORD1)
+
+    await driver.replace_many(data.COLL1, records={})
+
+    results = await driver.query(data.COLL1, fields=None, filt={}, sort=[], limit=None)
+    assert list(results) == [dict(data.RECORD1, id=id1)]
@@ -253,6 +253,56 @@ async def test_get_samples_slice_obj_id_separation(driver: BaseDriver) -> None:
     assert results == [data.SAMPLE1, data.SAMPLE2]
 
 
+async def test_get_samples_buckets_agg(driver: BaseDriver) -> None:
+    await driver.save_sample(data.COLL1, data.SAMPLE_OBJ_ID1, *data.SAMPLE1)
+    await driver.save_sample(data.COLL1, data.SAMPLE_OBJ_ID1, *data.SAMPLE2)
+    await driver.save_sample(data.COLL1, data.SAMPLE_OBJ_ID1, *data.SAMPLE3)
+    await driver.save_sample(data.COLL1, data.SAMPLE_OBJ_ID1, *data.SAMPLE4)
+    await driver.save_sample(data.COLL1, data.SAMPLE_OBJ_ID2, *data.SAMPLE2)
+
+    expected_values = {
+        "min": [10, 20, 30],
+        "max": [10, 30, 30],
+        "avg": [10, 25, 30],
+        "first": [10, 30, 30],
+        "last": [10, 20, 30],
+        "count": [1, 2, 1],
+    }
+    for agg, values in expected_values.items():
+        results = await driver.get_samples_buckets(
+            collection=data.COLL1,
+            obj_id=data.SAMPLE_OBJ_ID1,
+            from_timestamp=None,
+            to_timestamp=None,
+            bucket=20,
+            agg=agg,
+            limit=None,
+        )
+        results = list(results)
+
+        assert results == list(zip([1600000000000, 1600000000020, 1600000000040], values)), agg
+
+
+async def test_get_samples_buckets_from_to_timestamp_limit(driver: BaseDriver) -> None:
+    await driver.save_sample(data.COLL1, data.SAMPLE_OBJ_ID1, *data.SAMPLE1)
+    await driver.save_sample(data.COLL1, data.SAMPLE_OBJ_ID1, *data.SAMPLE2)
+    await driver.save_sample(data.COLL1, data.SAMPLE_OBJ_ID1, *data.SAMPLE3)
+    await driver.save_sample(data.COLL1, data.SAMPLE_OBJ_ID1, *data.SAMPLE4)
+
+    results = await driver.get_samples_buckets(
+        collection=data.COLL1,
+        obj_id=data.SAMPLE_OBJ_ID1,
+        from_timestamp=data.SAMPLE2[0],
+        to_timestamp=data.SAMPLE4[0] + 1,
+        bucket=10,
+        agg="max",
+        limit=2,
+    )
+    results = list(results)
+
+    assert results == [data.SAMPLE2, data.SAMPLE3]
+
+
 async def test_get_samples_by_timestamp_exact(driver: BaseDriver) -> None:
     await driver.save_sample(data.COLL1, data.SAMPLE_OBJ_ID1, *data.SAMPLE1)
     await driver.save_sample(data.COLL1, data.SAMPLE_OBJ_ID1, *data.SAMPLE2)
@@ -333,6 +383,53 @@ async def test_get_samples_by_timestamp_obj_id_separation(driver: BaseDriver) ->
     assert results == [data.SAMPLE1[1], data.SAMPLE2[1], data.SAMPLE2[1], data.SAMPLE2[1]]
 
 
+async def test_get_samples_by_timestamp_before_first(driver: BaseDriver) -> None:
+    await driver.save_sample(data.COLL1, data.SAMPLE_OBJ_ID1, *data.SAMPLE2)
+    await driver.save_sample(data.COLL1, data.SAMPLE_OBJ_ID1, *data.SAMPLE3)
+
+    results = await driver.get_samples_by_timestamp(
+        collection=data.COLL1,
+        obj_id=data.SAMPLE_OBJ_ID1,
+        timestamps=[data.SAMPLE1[0], data.SAMPLE2[0], data.SAMPLE4[0], data.SAMPLE1[0]],
+    )
+    results = list(results)
+
+    assert results == [None, data.SAMPLE2[1], data.SAMPLE3[1], None]
+
+
+async def test_save_samples(driver: BaseDriver) -> None:
+    await driver.save_samples(
+        data.COLL1,
+        [
+            (data.SAMPLE_OBJ_ID1, *data.SAMPLE1),
+            (data.SAMPLE_OBJ_ID2, *data.SAMPLE2),
+            (data.SAMPLE_OBJ_ID1, *data.SAMPLE3),
+        ],
+    )
+
+    results = await driver.get_samples_slice(
+        collection=data.COLL1,
+        obj_id=data.SAMPLE_OBJ_ID1,
+        from_timestamp=None,
+        to_timestamp=None,
+        limit=None,
+        sort_desc=False,
+    )
+    results = list(results)
+    assert results == [data.SAMPLE1, data.SAMPLE3]
+
+    results = await driver.get_samples_slice(
+        collection=data.COLL1,
+        obj_id=data.SAMPLE_OBJ_ID2,
+        from_timestamp=None,
+        to_timestamp=None,
+        limit=None,
+        sort_desc=False,
+    )
+    results = list(results)
+    assert results == [data.SAMPLE2]
+
+
 async def test_remove_samples_all(driver: BaseDriver) -> None:
     await driver.save_sample(data.COLL1, data.SAMPLE_OBJ_ID1, *data.SAMPLE1)
     await driver.save_sample(data.COLL1, data.SAMPLE_OBJ_ID1, *data.SAMPLE2)
@@ -206,6 +206,18 @@ async def test_replace_no_match_custom_id(driver: BaseDriver) -> None:
     await replace.test_replace_no_match_custom_id(driver)
 
 
+async def test_replace_many(driver: BaseDriver) -> None:
+    await replace.test_replace_many(driver)
+
+
+async def test_replace_many_custom_id_complex(driver: BaseDriver) -> None:
+    await replace.test_replace_many_custom_id_complex(driver)
+
+
+async def test_replace_many_empty(driver: BaseDriver) -> None:
+    await replace.test_replace_many_empty(driver)
+
+
 async def test_update_match_id(driver: BaseDriver) -> None:
     await update.test_update_match_id(driver)
 
@@ -260,3 +272,120 @@ async def test_data_type_dict(driver: BaseDriver) -> None:
 
 async def test_filter_sort_datetime(driver: BaseDriver) -> None:
     await misc.test_filter_sort_datetime(driver)
+
+
+class TestJournal:
+    @pytest.fixture
+    def make_journal_driver(self, tmp_path: pathlib.Path) -> Callable[..., json.JSONDriver]:
+        def driver(**kwargs) -> json.JSONDriver:
+            return json.JSONDriver(str(tmp_path / "dummy.json"), journal=True, **kwargs)
+
+        return driver
+
+    async def test_snapshot_not_rewritten(self, make_journal_driver, tmp_path: pathlib.Path) -> None:
+        """Should append mutations to the journal without touching the data file."""
+
+        driver = make_journal_driver()
+        await driver.insert("coll", {"id": "1", "a": 1})
+        await driver.update("coll", {"a": 2}, {"id": "1"})
+
+        assert not (tmp_path / "dummy.json").exists()
+        assert len((tmp_path / "dummy_journal.json").read_bytes().splitlines()) == 2
+
+    async def test_replay(self, make_journal_driver) -> None:
+        """Should restore data from the journal when reopened."""
+
+        driver = make_journal_driver()
+        await driver.insert("coll", {"id": "1", "a": 1})
+        await driver.insert("coll", {"id": "2", "a": 2})
+        await driver.update("coll", {"a": 3}, {"id": "1"})
+        await driver.replace_many("coll", {"2": {"b": 4}, "3": {"c": 5}})
+        await driver.remove("coll", {"id": "3"})
+
+        driver = make_journal_driver()
+        records = list(await driver.query("coll", fields=None, filt={}, sort=[("id", False)], limit=None))
+        assert records == [{"id": "1", "a": 3}, {"id": "2", "b": 4}]
+        assert await driver.insert("coll", {"a": 6}) == "3"
+
+    async def test_replay_compacts(self, make_journal_driver, tmp_path: pathlib.Path) -> None:
+        """Should fold a replayed journal into the data file and discard it."""
+
+        driver = make_journal_driver()
+        await driver.insert("coll", {"id": "1", "a": 1})
+
+        make_journal_driver()
+        assert not (tmp_path / "dummy_journal.json").exists()
+        assert (tmp_path / "dummy.json").exists()
+
+        driver = make_journal_driver()
+        assert list(await driver.query("coll", fields=None, filt={}, sort=[], limit=None)) == [{"id": "1", "a": 1}]
+
+    async def test_replay_ignores_partial_entry(self, make_journal_driver, tmp_path: pathlib.Path) -> None:
+        """Should ignore a truncated last journal entry."""
+
+        driver = make_journal_driver()
+        await driver.insert("coll", {"id": "1", "a": 1})
+        await driver.insert("coll", {"id": "2", "a": 2})
+        journal_path = tmp_path / "dummy_journal.json"
+        journal_path.write_bytes(journal_path.read_bytes()[:-10])
+
+        driver = make_journal_driver()
+        assert list(await driver.query("coll", fields=None, filt={}, sort=[], limit=None)) == [{"id": "1", "a": 1}]
+
+    async def test_compact_on_size(self, make_journal_driver, tmp_path: pathlib.Path) -> None:
+        """Should fold the journal into the data file once it exceeds the maximum size."""
+
+        driver = make_journal_driver(journal_max_size=100)
+        await driver.insert("coll", {"id": "1", "a": 1})
+        assert (tmp_path / "dummy_journal.json").exists()
+
+        await driver.insert("coll", {"id": "2", "a": "x" * 100})
+        assert not (tmp_path / "dummy_journal.json").exists()
+        assert len(json.json_utils.loads((tmp_path / "dummy.json").read_bytes())["coll"]) == 2
+
+    async def test_compact_on_interval(self, make_journal_driver, tmp_path: pathlib.Path, mocker) -> None:
+        """Should fold the journal into the data file when the compaction interval elapses."""
+
+        driver = make_journal_driver(journal_compact_interval=10)
+        await driver.insert("coll", {"id": "1", "a": 1})
+        assert (tmp_path / "dummy_journal.json").exists()
+
+        mocker.patch("time.monotonic", return_value=driver._last_compact_time + 10)
+        await driver.insert("coll", {"id": "2", "a": 2})
+        assert not (tmp_path / "dummy_journal.json").exists()
+
+    async def test_compact_on_cleanup(self, make_journal_driver, tmp_path: pathlib.Path) -> None:
+        """Should fold the journal into the data file upon cleanup."""
+
+        driver = make_journal_driver()
+        await driver.insert("coll", {"id": "1", "a": 1})
+        await driver.cleanup()
+
+        assert not (tmp_path / "dummy_journal.json").exists()
+        assert json.json_utils.loads((tmp_path / "dummy.json").read_bytes()) == {"coll": [{"id": "1", "a": 1}]}
+
+    async def test_replay_over_backup(self, make_journal_driver, tmp_path: pathlib.Path) -> None:
+        """Should replay the journal on top of the backup file when the data file is corrupted."""
+
+        driver = make_journal_driver()
+        await driver.insert("coll", {"id": "1", "a": 1})
+        await driver.cleanup()
+        await driver.insert("coll", {"id": "2", "a": 2})
+        await driver.cleanup()
+        await driver.insert("coll", {"id": "3", "a": 3})
+        (tmp_path / "dummy.json").write_bytes(b"{corrupted")
+
+        driver = make_journal_driver()
+        records = list(await driver.query("coll", fields=None, filt={}, sort=[("id", False)], limit=None))
+        assert records == [{"id": "1", "a": 1}, {"id": "3", "a": 3}]
+
+
+async def test_save_samples_single_write(driver: json.JSONDriver, mocker) -> None:
+    """Should write the data file only once when saving several samples."""
+
+    save_spy = mocker.spy(driver, "_save")
+    await driver.save_samples("coll", [("oid1", 1000, 1.0), ("oid2", 1000, 2.0), ("oid1", 2000, 3.0)])
+
+    save_spy.assert_called_once()
+    records = list(await driver.query("coll", fields=None, filt={"oid": "oid1"}, sort=[("ts", False)], limit=None))
+    assert [(r["ts"], r["val"]) for r in records] == [(1000, 1.0), (2000, 3.0)]
@@ -5,7 +5,7 @@ import pytest
 from qtoggleserver.drivers.persist import mongo
 from qtoggleserver.persist import BaseDriver
 
-from . import insert, misc, query, remove, replace, samples, update
+from . import data, insert, misc, query, remove, replace, samples, update
 
 
 @pytest.fixture
@@ -196,6 +196,18 @@ async def test_replace_no_match_custom_id(driver: BaseDriver) -> None:
     await replace.test_replace_no_match_custom_id(driver)
 
 
+async def test_replace_many(driver: BaseDriver) -> None:
+    await replace.test_replace_many(driver)
+
+
+async def test_replace_many_custom_id_complex(driver: BaseDriver) -> None:
+    await replace.test_replace_many_custom_id_complex(driver)
+
+
+async def test_replace_many_empty(driver: BaseDriver) -> None:
+    await replace.test_replace_many_empty(driver)
+
+
 async def test_update_match_id(driver: BaseDriver) -> None:
     await update.test_update_match_id(driver)
 
@@ -284,6 +296,14 @@ async def test_get_samples_slice_obj_id_separation(driver: BaseDriver) -> None:
     await samples.test_get_samples_slice_obj_id_separation(driver)
 
 
+async def test_get_samples_buckets_agg(driver: BaseDriver) -> None:
+    await samples.test_get_samples_buckets_agg(driver)
+
+
+async def test_get_samples_buckets_from_to_timestamp_limit(driver: BaseDriver) -> None:
+    await samples.test_get_samples_buckets_from_to_timestamp_limit(driver)
+
+
 async def test_get_samples_by_timestamp_exact(driver: BaseDriver) -> None:
     await samples.test_get_samples_by_timestamp_exact(driver)
 
@@ -304,6 +324,14 @@ async def test_get_samples_by_timestamp_obj_id_separation(driver: BaseDriver) ->
     await samples.test_get_samples_by_timestamp_obj_id_separation(driver)
 
 
+async def test_get_samples_by_timestamp_before_first(driver: BaseDriver) -> None:
+    await samples.test_get_samples_by_timestamp_before_first(driver)
+
+
+async def test_save_samples(driver: BaseDriver) -> None:
+    await samples.test_save_samples(driver)
+
+
 async def test_remove_samples_all(driver: BaseDriver) -> None:
     await samples.test_remove_samples_all(driver)
 
@@ -346,3 +374,10 @@ async def test_data_type_complex(driver: BaseDriver) -> None:
 
 async def test_filter_sort_datetime(driver: BaseDriver) -> None:
     await misc.test_filter_sort_datetime(driver)
+
+
+async def test_ensure_index_samples(driver: mongo.MongoDriver) -> None:
+    await driver.ensure_index(data.COLL1, None)
+
+    index_keys = [index["key"] for index in driver._db[data.COLL1].index_information().values()]  # noqa
+    assert [("oid", pymongo.ASCENDING), ("ts", pymongo.ASCENDING)] in index_keys
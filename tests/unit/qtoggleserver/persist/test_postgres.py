@@ -5,7 +5,7 @@ import testing.postgresql
 from qtoggleserver.drivers.persist import postgres
 from qtoggleserver.persist import BaseDriver
 
-from . import insert, misc, query, remove, replace, samples, update
+from . import data, insert, misc, query, remove, replace, samples, update
 
 
 TestingPostgreSQL = testing.postgresql.PostgresqlFactory(cache_initialized_db=True)
@@ -222,6 +222,18 @@ async def test_replace_no_match_custom_id(driver: BaseDriver) -> None:
     await replace.test_replace_no_match_custom_id(driver)
 
 
+async def test_replace_many(driver: BaseDriver) -> None:
+    await replace.test_replace_many(driver)
+
+
+async def test_replace_many_custom_id_complex(driver: BaseDriver) -> None:
+    await replace.test_replace_many_custom_id_complex(driver)
+
+
+async def test_replace_many_empty(driver: BaseDriver) -> None:
+    await replace.test_replace_many_empty(driver)
+
+
 async def test_update_match_id(driver: BaseDriver) -> None:
     await update.test_update_match_id(driver)
 
@@ -310,6 +322,14 @@ async def test_get_samples_slice_obj_id_separation(driver: BaseDriver) -> None:
     await samples.test_get_samples_slice_obj_id_separation(driver)
 
 
+async def test_get_samples_buckets_agg(driver: BaseDriver) -> None:
+    await samples.test_get_samples_buckets_agg(driver)
+
+
+async def test_get_samples_buckets_from_to_timestamp_limit(driver: BaseDriver) -> None:
+    await samples.test_get_samples_buckets_from_to_timestamp_limit(driver)
+
+
 async def test_get_samples_by_timestamp_exact(driver: BaseDriver) -> None:
     await samples.test_get_samples_by_timestamp_exact(driver)
 
@@ -330,6 +350,14 @@ async def test_get_samples_by_timestamp_obj_id_separation(driver: BaseDriver) ->
     await samples.test_get_samples_by_timestamp_obj_id_separation(driver)
 
 
+async def test_get_samples_by_timestamp_before_first(driver: BaseDriver) -> None:
+    await samples.test_get_samples_by_timestamp_before_first(driver)
+
+
+async def test_save_samples(driver: BaseDriver) -> None:
+    await samples.test_save_samples(driver)
+
+
 async def test_remove_samples_all(driver: BaseDriver) -> None:
     await samples.test_remove_samples_all(driver)
 
@@ -372,3 +400,24 @@ async def test_data_type_complex(driver: BaseDriver) -> None:
 
 async def test_filter_sort_datetime(driver: BaseDriver) -> None:
     await misc.test_filter_sort_datetime(driver)
+
+
+async def test_ensure_index_samples(driver: postgres.PostgresDriver) -> None:
+    await driver.ensure_index(data.COLL1, None)
+
+    results = await driver._execute_query(  # noqa
+        "SELECT indexdef FROM pg_indexes WHERE tablename = $1 AND indexname = $2", [data.COLL1, f"{data.COLL1}_oid_ts"]
+    )
+    assert len(results) == 1
+    assert "(oid, ts)" in results[0][0]
+
+
+async def test_ensure_index_samples_drops_old(driver: postgres.PostgresDriver) -> None:
+    await driver.ensure_index(data.COLL1, None)
+    await driver._execute_statement(f"CREATE INDEX {data.COLL1}_ts ON {data.COLL1}(ts)")  # noqa
+    await driver.ensure_index(data.COLL1, None)
+
+    results = await driver._execute_query(  # noqa
+        "SELECT indexname FROM pg_indexes WHERE tablename = $1", [data.COLL1]
+    )
+    assert f"{data.COLL1}_ts" not in [r[0] for r in results]
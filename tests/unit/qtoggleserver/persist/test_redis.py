@@ -1,22 +1,24 @@
 import fakeredis
 import pytest
 import redis as python_redis
+import redis.asyncio
 
 from qtoggleserver.drivers.persist import redis
 from qtoggleserver.persist import BaseDriver
 
-from . import insert, misc, query, remove, replace, samples, update
+from . import data, insert, misc, query, remove, replace, samples, update
 
 
 @pytest.fixture
 async def driver(monkeypatch) -> BaseDriver:
-    monkeypatch.setattr(python_redis, "StrictRedis", fakeredis.FakeStrictRedis)
+    monkeypatch.setattr(python_redis.asyncio, "Redis", fakeredis.FakeAsyncRedis)
     driver = redis.RedisDriver()
     await driver.init()
     # Make sure we're starting with a clean database
-    assert isinstance(driver._client, fakeredis.FakeStrictRedis)  # noqa
-    driver._client.flushall()  # noqa
-    return driver
+    assert isinstance(driver._client, fakeredis.FakeAsyncRedis)  # noqa
+    await driver._client.flushall()  # noqa
+    yield driver
+    await driver.cleanup()
 
 
 async def test_query_all(driver: BaseDriver) -> None:
@@ -199,6 +201,18 @@ async def test_replace_no_match_custom_id(driver: BaseDriver) -> None:
     await replace.test_replace_no_match_custom_id(driver)
 
 
+async def test_replace_many(driver: BaseDriver) -> None:
+    await replace.test_replace_many(driver)
+
+
+async def test_replace_many_custom_id_complex(driver: BaseDriver) -> None:
+    await replace.test_replace_many_custom_id_complex(driver)
+
+
+async def test_replace_many_empty(driver: BaseDriver) -> None:
+    await replace.test_replace_many_empty(driver)
+
+
 async def test_update_match_id(driver: BaseDriver) -> None:
     await update.test_update_match_id(driver)
 
@@ -287,6 +301,14 @@ async def test_get_samples_slice_obj_id_separation(driver: BaseDriver) -> None:
     await samples.test_get_samples_slice_obj_id_separation(driver)
 
 
+async def test_get_samples_buckets_agg(driver: BaseDriver) -> None:
+    await samples.test_get_samples_buckets_agg(driver)
+
+
+async def test_get_samples_buckets_from_to_timestamp_limit(driver: BaseDriver) -> None:
+    await samples.test_get_samples_buckets_from_to_timestamp_limit(driver)
+
+
 async def test_get_samples_by_timestamp_exact(driver: BaseDriver) -> None:
     await samples.test_get_samples_by_timestamp_exact(driver)
 
@@ -307,6 +329,14 @@ async def test_get_samples_by_timestamp_obj_id_separation(driver: BaseDriver) ->
     await samples.test_get_samples_by_timestamp_obj_id_separation(driver)
 
 
+async def test_get_samples_by_timestamp_before_first(driver: BaseDriver) -> None:
+    await samples.test_get_samples_by_timestamp_before_first(driver)
+
+
+async def test_save_samples(driver: BaseDriver) -> None:
+    await samples.test_save_samples(driver)
+
+
 async def test_remove_samples_all(driver: BaseDriver) -> None:
     await samples.test_remove_samples_all(driver)
 
@@ -349,3 +379,26 @@ async def test_data_type_complex(driver: BaseDriver) -> None:
 
 async def test_filter_sort_datetime(driver: BaseDriver) -> None:
     await misc.test_filter_sort_datetime(driver)
+
+
+def test_samples_supported(driver: redis.RedisDriver) -> None:
+    assert driver.is_samples_supported()
+    assert not redis.RedisDriver(samples_support=False).is_samples_supported()
+
+
+async def test_samples_migrated(driver: redis.RedisDriver) -> None:
+    # Samples saved by older versions, as regular records
+    await driver.insert(data.COLL1, {"oid": data.SAMPLE_OBJ_ID1, "ts": data.SAMPLE2[0], "val": data.SAMPLE2[1]})
+    await driver.insert(data.COLL1, {"oid": data.SAMPLE_OBJ_ID1, "ts": data.SAMPLE1[0], "val": data.SAMPLE1[1]})
+
+    results = await driver.get_samples_slice(data.COLL1, data.SAMPLE_OBJ_ID1, None, None, None, sort_desc=False)
+    assert list(results) == [data.SAMPLE1, data.SAMPLE2]
+    assert list(await driver.query(data.COLL1, None, {}, [], None)) == []
+
+
+async def test_samples_stored_in_sorted_set(driver: redis.RedisDriver) -> None:
+    await driver.save_sample(data.COLL1, data.SAMPLE_OBJ_ID1, *data.SAMPLE2)
+    await driver.save_sample(data.COLL1, data.SAMPLE_OBJ_ID1, *data.SAMPLE1)
+
+    members = await driver._client.zrange(f"{data.COLL1}:{data.SAMPLE_OBJ_ID1}-samples", 0, -1, withscores=True)  # noqa
+    assert [score for _, score in members] == [data.SAMPLE1[0], data.SAMPLE2[0]]
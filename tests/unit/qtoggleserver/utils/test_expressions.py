@@ -83,8 +83,42 @@ class TestGetDepsMap:
 
         assert mock_num_port1 not in expressions.get_deps_map().get("$nid1", [])
 
+    def test_updated_incrementally(self, mocker, mock_num_port1, mock_num_port2):
+        """Should update the entries of a single port, without rebuilding the whole map."""
+
+        mock_num_port1.set_expression("ADD($nid2, $nid2:min)")
+        mock_num_port2.set_expression("MUL($nid1, 2)")
+        deps_map = expressions.get_deps_map()
+
+        get_all_spy = mocker.spy(core_ports, "get_all")
+        mock_num_port1.set_expression("ADD($nid1, #slave1:enabled)")
+
+        assert expressions.get_deps_map() is deps_map
+        assert deps_map == {"$nid1": {mock_num_port1, mock_num_port2}, "#slave1:": {mock_num_port1}}
+        get_all_spy.assert_not_called()
+
+    async def test_port_removed_incrementally(self, mocker, mock_num_port2):
+        """Should drop the entries of a removed port, without rebuilding the whole map."""
+
+        port = await core_ports.load_one(MockNumberPort, {"port_id": "nid_temp", "value": None})
+        port.set_expression("MUL($nid2:max, 2)")
+        deps_map = expressions.get_deps_map()
+        assert deps_map == {"$nid2:": {port}}
+
+        get_all_spy = mocker.spy(core_ports, "get_all")
+        await port.remove(persisted_data=False)
+
+        assert expressions.get_deps_map() == {}
+        get_all_spy.assert_not_called()
+
 
 class TestBuildContext:
+    @pytest.fixture(autouse=True)
+    def reset_port_values(self):
+        expressions.invalidate_port_values()
+        yield
+        expressions.invalidate_port_values()
+
     async def test_basic_context(self, mock_num_port1, mock_num_port2, mocker):
         """Should gather port values and attributes from all ports and create EvalContext."""
 
@@ -263,3 +297,89 @@ class TestBuildContext:
 
         context3 = await expressions.build_context(1234567890000)
         assert context3.timestamp == 1234567890
+
+
+class TestIncrementalContext:
+    @pytest.fixture(autouse=True)
+    def reset_port_values(self):
+        expressions.invalidate_port_values()
+        yield
+        expressions.invalidate_port_values()
+
+    async def test_refreshes_only_changed_ports(self, mock_num_port1, mock_num_port2, mocker):
+        """Should only query the values of ports that changed since the previous context build."""
+
+        await expressions.build_context(0, deps=set())
+        mock_num_port1.set_last_read_value(42)
+        spy1 = mocker.spy(mock_num_port1, "get_last_value")
+        spy2 = mocker.spy(mock_num_port2, "get_last_value")
+
+        context = await expressions.build_context(0, deps=set())
+        assert context.port_values["nid1"] == 42
+        spy1.assert_called_once()
+        spy2.assert_not_called()
+
+    async def test_pending_write_refreshes_value(self, mock_num_port1):
+        """Should pick up a value pushed to the write queue."""
+
+        await expressions.build_context(0, deps=set())
+        mock_num_port1.push_write(16)
+
+        context = await expressions.build_context(0, deps=set())
+        assert context.port_values["nid1"] == 16
+
+    async def test_removed_port_dropped(self, mock_num_port1):
+        """Should drop the value of a port that has been removed."""
+
+        port = await core_ports.load_one(MockNumberPort, {"port_id": "nid_temp", "value": 3})
+        context = await expressions.build_context(0, deps=set())
+        assert context.port_values["nid_temp"] == 3
+
+        await port.remove(persisted_data=False)
+
+        context = await expressions.build_context(0, deps=set())
+        assert "nid_temp" not in context.port_values
+
+    async def test_only_dep_port_attrs_materialized(self, mock_num_port1, mock_num_port2, mocker):
+        """Should only gather attributes of ports referenced through `$port_id:` deps."""
+
+        mocker.patch.object(mock_num_port1, "get_attrs", new_callable=mocker.AsyncMock, return_value={"attr1": "val1"})
+        mocker.patch.object(mock_num_port2, "get_attrs", new_callable=mocker.AsyncMock, return_value={"attr2": "val2"})
+
+        context = await expressions.build_context(0, deps={"$nid1:", "$nid2"})
+        assert context.port_attrs == {"nid1": {"attr1": "val1"}}
+        mock_num_port2.get_attrs.assert_not_called()
+
+    async def test_device_attrs_skipped_without_device_deps(self, mocker):
+        """Should not gather device attributes unless `#:` is among deps."""
+
+        spy = mocker.patch(
+            "qtoggleserver.utils.expressions.core_device_attrs.get_attrs",
+            new_callable=mocker.AsyncMock,
+            return_value={"device_attr": "device_val"},
+        )
+        mocker.patch("qtoggleserver.utils.expressions.settings.slaves.enabled", False)
+
+        context = await expressions.build_context(0, deps={"$nid1"})
+        assert context.device_attrs == {}
+        spy.assert_not_called()
+
+        context = await expressions.build_context(0, deps={"#:"})
+        assert context.device_attrs == {"device_attr": "device_val"}
+
+    async def test_only_dep_slave_attrs_materialized(self, mocker):
+        """Should only merge attributes of slaves referenced through `#slave_name:` deps."""
+
+        mock_slave1 = mocker.Mock()
+        mock_slave1.get_name.return_value = "slave1"
+        mock_slave1.get_cached_attrs.return_value = {"attr1": "val1"}
+        mock_slave2 = mocker.Mock()
+        mock_slave2.get_name.return_value = "slave2"
+        mock_slave2.get_cached_attrs.return_value = {"attr2": "val2"}
+        slaves = {"slave1": mock_slave1, "slave2": mock_slave2}
+        mocker.patch("qtoggleserver.utils.expressions.slaves_devices.get", side_effect=slaves.get)
+        mocker.patch("qtoggleserver.utils.expressions.settings.slaves.enabled", True)
+
+        context = await expressions.build_context(0, deps={"#slave2:"})
+        assert context.device_attrs == {"slave2:attr2": "val2"}
+        mock_slave1.get_cached_attrs.assert_not_called()
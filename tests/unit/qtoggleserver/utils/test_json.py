@@ -221,3 +221,21 @@ class TestEdgeCases:
         # The deserialized value is a string, not the original object
         assert isinstance(deserialized["obj"], str)
         assert deserialized["obj"] == "UnserializableClass(test)"
+
+
+class TestEncoded:
+    """Test already encoded JSON."""
+
+    def test_dumps_as_is(self) -> None:
+        """Should output encoded JSON as is, instead of encoding it as a string."""
+
+        assert json_utils.dumps(json_utils.Encoded('{"a": 1}')) == '{"a": 1}'
+
+    def test_join_encoded(self) -> None:
+        """Should join encoded fragments into an encoded list."""
+
+        fragments = [json_utils.dumps({"a": 1}), json_utils.dumps([2, None])]
+        encoded = json_utils.join_encoded(fragments)
+
+        assert json_utils.loads(json_utils.dumps(encoded)) == [{"a": 1}, [2, None]]
+        assert json_utils.join_encoded([]) == "[]"
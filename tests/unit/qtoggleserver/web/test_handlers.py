@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from tornado.httpclient import HTTPClientError, HTTPRequest
+from tornado.httpserver import HTTPServer
+from tornado.testing import bind_unused_port
+from tornado.web import Application
+from tornado.websocket import websocket_connect
+
+from qtoggleserver.core import events as core_events
+from qtoggleserver.core import sessions as core_sessions
+from qtoggleserver.core.api import auth as core_api_auth
+from qtoggleserver.core.device import attrs as core_device_attrs
+from qtoggleserver.web import handlers
+
+
+@pytest.fixture
+async def listen_ws_url(mocker):
+    mocker.patch.dict(core_sessions._sessions_by_id, clear=True)
+    mocker.patch.dict(core_sessions._sessions_by_access_level, clear=True)
+
+    sock, port = bind_unused_port()
+    server = HTTPServer(Application([(r"/api/listen/ws", handlers.ListenWebSocketHandler)]))
+    server.add_sockets([sock])
+
+    yield f"ws://127.0.0.1:{port}/api/listen/ws"
+
+    server.stop()
+    await server.close_all_connections()
+
+
+@pytest.fixture
+def empty_admin_password(mocker):
+    mocker.patch.object(core_device_attrs, "admin_password_hash", core_device_attrs.EMPTY_PASSWORD_HASH)
+
+
+@pytest.fixture
+def admin_password(mocker) -> str:
+    password_hash = core_device_attrs.EMPTY_PASSWORD_HASH[::-1]
+    mocker.patch.object(core_device_attrs, "admin_password_hash", password_hash)
+
+    return password_hash
+
+
+class TestListenWebSocketHandler:
+    async def test_auth_subprotocol(self, listen_ws_url, admin_password):
+        """Should accept the JWT as a subprotocol, without echoing it back."""
+
+        auth = core_api_auth.make_auth_header(core_api_auth.ORIGIN_CONSUMER, "admin", admin_password)
+        token = auth.split()[1]
+        request = HTTPRequest(f"{listen_ws_url}?session_id=session1")
+        connection = await websocket_connect(request, subprotocols=["qtoggle", f"bearer.{token}"])
+
+        assert connection.selected_subprotocol == "qtoggle"
+        connection.close()
+
+    async def test_auth_query_argument_rejected(self, listen_ws_url, admin_password):
+        """Should not accept the JWT as a query argument, where it would end up in request logs."""
+
+        auth = core_api_auth.make_auth_header(core_api_auth.ORIGIN_CONSUMER, "admin", admin_password)
+        request = HTTPRequest(f"{listen_ws_url}?session_id=session1&authorization={auth.split()[1]}")
+        with pytest.raises(HTTPClientError) as exc_info:
+            await websocket_connect(request)
+
+        assert exc_info.value.code == 401
+
+    async def test_reconnect(self, listen_ws_url, empty_admin_password):
+        """Should keep streaming to a newer connection of a session when an older one is closed."""
+
+        request = HTTPRequest(listen_ws_url, headers={"Session-Id": "session1"})
+        old_connection = await websocket_connect(request)
+        new_connection = await websocket_connect(request)
+        await asyncio.sleep(0.05)
+
+        old_connection.close()
+        await asyncio.sleep(0.05)
+
+        session = core_sessions.get("session1")
+        assert session.is_streaming()
+
+        event = core_events.Event()
+        await event.init_params()
+        session.push(event)
+
+        message = await asyncio.wait_for(new_connection.read_message(), timeout=1)
+        assert message.startswith("[")
+        new_connection.close()